@@ -4,6 +4,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
+from trashtrotreasure.conditional import conditional, object_validators
 from .serializers import UserRegistrationSerializer, UserSerializer
 
 
@@ -48,6 +49,7 @@ def login(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional(lambda request: object_validators(request, request.user))
 def profile(request):
     user = request.user
     return Response(UserSerializer(user).data)
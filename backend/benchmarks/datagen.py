@@ -0,0 +1,234 @@
+"""Synthetic data for benchmarking, written with ``bulk_create`` in batches.
+
+Every generator streams its rows in batches so memory stays flat however large
+the scale; only the ids needed to pick foreign keys are kept. Signals do not
+fire for bulk inserts, so the listing search index, geohashes and conversation
+activity are filled in here explicitly.
+"""
+
+import random
+from array import array
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+
+from accounts.models import User
+from messaging.models import Conversation, ConversationParticipant, Message, Notification
+from waste_management import cache, search
+from waste_management.models import Transaction, WasteImage, WasteListing
+
+USERNAME_PREFIX = "bench_"
+PASSWORD = "benchmark-pass"
+
+# Town centres the listings and users are scattered around.
+TOWNS = [
+    ("Nairobi", -1.2864, 36.8172),
+    ("Mombasa", -4.0435, 39.6682),
+    ("Kisumu", -0.0917, 34.7680),
+    ("Nakuru", -0.3031, 36.0800),
+    ("Eldoret", 0.5143, 35.2698),
+    ("Thika", -1.0333, 37.0693),
+]
+MATERIALS = {
+    "plastic": ["PET bottles", "HDPE containers", "plastic crates", "shrink wrap"],
+    "paper": ["cardboard boxes", "office paper", "newspapers", "paper bags"],
+    "metal": ["aluminium cans", "scrap steel", "copper wire", "tin cans"],
+    "glass": ["clear bottles", "green bottles", "jars", "broken glass"],
+    "electronic": ["old phones", "circuit boards", "laptop batteries", "cables"],
+    "organic": ["food waste", "garden cuttings", "coffee husks", "sawdust"],
+    "textile": ["cotton offcuts", "old clothes", "denim scraps", "sacks"],
+    "other": ["mixed recyclables", "rubber tyres", "wood pallets", "foam"],
+}
+CONDITIONS = ["Clean", "Sorted", "Baled", "Mixed", "Washed", "Crushed"]
+ROLES = [("waste_generator", 6), ("buyer", 3), ("delivery", 1)]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _ids(queryset, *fields):
+    """Column arrays of ``fields`` for ``queryset``, compact enough for millions of rows."""
+    columns = tuple(array("q") for _ in fields)
+    for row in queryset.values_list(*fields).order_by().iterator(chunk_size=10_000):
+        for column, value in zip(columns, row):
+            column.append(value)
+    return columns
+
+
+class Generator:
+    def __init__(self, seed=0, batch_size=5000, log=None):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+
+    def _insert(self, model, rows, total, after_batch=None):
+        created = 0
+        for batch in batched(rows, self.batch_size):
+            with transaction.atomic():
+                objects = model.objects.bulk_create(batch)
+                if after_batch:
+                    after_batch(objects)
+            created += len(objects)
+            self.log(f"  {model.__name__}: {created}/{total}")
+        return created
+
+    def _point(self):
+        town, latitude, longitude = self.random.choice(TOWNS)
+        return town, latitude + self.random.gauss(0, 0.08), longitude + self.random.gauss(0, 0.08)
+
+    def users(self, count):
+        # Hashing is deliberately slow, so every benchmark user shares one hash.
+        password = make_password(PASSWORD)
+        first = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        roles, weights = zip(*ROLES)
+
+        def rows():
+            for number in range(first, first + count):
+                town, _, _ = self._point()
+                yield User(
+                    username=f"{USERNAME_PREFIX}{number}",
+                    email=f"{USERNAME_PREFIX}{number}@example.com",
+                    password=password,
+                    phone=f"+999{number:09d}",
+                    role=self.random.choices(roles, weights)[0],
+                    location=town,
+                )
+
+        return self._insert(User, rows(), count)
+
+    def listings(self, count, images_per_listing=1):
+        (user_ids,) = _ids(User.objects.filter(username__startswith=USERNAME_PREFIX), "id")
+        types = list(MATERIALS)
+
+        def rows():
+            for _ in range(count):
+                waste_type = self.random.choice(types)
+                material = self.random.choice(MATERIALS[waste_type])
+                town, latitude, longitude = self._point()
+                listing = WasteListing(
+                    title=f"{self.random.choice(CONDITIONS)} {material}",
+                    description=f"{material.capitalize()} collected around {town}, ready for pickup.",
+                    type=waste_type,
+                    quantity=round(self.random.uniform(5, 2000), 1),
+                    location=town,
+                    latitude=latitude,
+                    longitude=longitude,
+                    price_per_unit=f"{self.random.uniform(2, 300):.2f}",
+                    status=self.random.choices(["available", "reserved", "sold"], [8, 1, 1])[0],
+                    user_id=self.random.choice(user_ids),
+                )
+                listing.refresh_geohash()
+                yield listing
+
+        def after_batch(listings):
+            search.index_listings(listings)
+            images = [
+                WasteImage(listing=listing, image=f"waste_images/bench_{listing.type}_{index}.jpg")
+                for listing in listings
+                for index in range(images_per_listing)
+            ]
+            WasteImage.objects.bulk_create(images, batch_size=self.batch_size)
+
+        created = self._insert(WasteListing, rows(), count, after_batch)
+        cache.invalidate()
+        return created
+
+    def transactions(self, count):
+        (buyer_ids,) = _ids(User.objects.filter(username__startswith=USERNAME_PREFIX), "id")
+        listing_ids, seller_ids = _ids(WasteListing.objects.all(), "id", "user_id")
+        statuses = [choice for choice, _ in Transaction.STATUS_CHOICES]
+        if not listing_ids:
+            return 0
+
+        def rows():
+            for _ in range(count):
+                index = self.random.randrange(len(listing_ids))
+                quantity = round(self.random.uniform(1, 100), 1)
+                yield Transaction(
+                    listing_id=listing_ids[index],
+                    seller_id=seller_ids[index],
+                    buyer_id=self.random.choice(buyer_ids),
+                    quantity=quantity,
+                    total_amount=f"{quantity * self.random.uniform(2, 300):.2f}",
+                    status=self.random.choice(statuses),
+                )
+
+        return self._insert(Transaction, rows(), count)
+
+    def conversations(self, count, messages):
+        """``count`` direct conversations between distinct user pairs sharing ``messages`` messages."""
+        (user_ids,) = _ids(User.objects.filter(username__startswith=USERNAME_PREFIX), "id")
+        taken = set(Conversation.objects.exclude(direct_key=None).values_list("direct_key", flat=True))
+        count = min(count, len(user_ids) * (len(user_ids) - 1) // 2 - len(taken))
+        pairs = []
+        while len(pairs) < count:
+            low, high = sorted(self.random.sample(user_ids, 2))
+            key = Conversation.direct_key_for(low, high)
+            if key not in taken:
+                taken.add(key)
+                pairs.append((key, low, high))
+
+        conversations = []
+        for batch in batched(pairs, self.batch_size):
+            with transaction.atomic():
+                created = Conversation.objects.bulk_create([Conversation(direct_key=key) for key, _, _ in batch])
+                ConversationParticipant.objects.bulk_create(
+                    ConversationParticipant(conversation=conversation, user_id=user_id)
+                    for conversation, (_, low, high) in zip(created, batch)
+                    for user_id in (low, high)
+                )
+            conversations.extend((conversation.pk, low, high) for conversation, (_, low, high) in zip(created, batch))
+            self.log(f"  Conversation: {len(conversations)}/{count}")
+
+        def rows():
+            for number in range(messages):
+                conversation_id, low, high = conversations[number % len(conversations)]
+                yield Message(
+                    conversation_id=conversation_id,
+                    sender_id=low if self.random.random() < 0.5 else high,
+                    content=f"Message {number}: is the load still available for pickup?",
+                )
+
+        created = self._insert(Message, rows(), messages) if conversations else 0
+        self._refresh_activity()
+        return len(conversations), created
+
+    def _refresh_activity(self):
+        """Fill in each conversation's last message and start readers at it, as the live paths would."""
+        latest = Message.objects.filter(conversation=models.OuterRef("pk")).order_by("-id")
+        Conversation.objects.filter(last_message=None).update(
+            last_message=models.Subquery(latest.values("id")[:1]),
+            last_message_at=models.Subquery(latest.values("created_at")[:1]),
+        )
+        # Leave the newest few messages of each conversation unread.
+        ConversationParticipant.objects.filter(last_read_message_id=0).update(
+            last_read_message_id=Coalesce(
+                models.Subquery(
+                    Message.objects.filter(conversation=models.OuterRef("conversation"))
+                    .order_by("-id")
+                    .values("id")[3:4]
+                ),
+                0,
+            )
+        )
+
+    def notifications(self, count):
+        (user_ids,) = _ids(User.objects.filter(username__startswith=USERNAME_PREFIX), "id")
+        types = [choice for choice, _ in Notification.NOTIFICATION_TYPES]
+
+        def rows():
+            for number in range(count):
+                yield Notification(
+                    user_id=self.random.choice(user_ids),
+                    type=self.random.choice(types),
+                    title=f"Update {number}",
+                    message="Something happened on one of your listings.",
+                    is_read=self.random.random() < 0.7,
+                )
+
+        return self._insert(Notification, rows(), count)
@@ -0,0 +1,477 @@
+"""Repeatable endpoint benchmarks over the app's URL configuration.
+
+Each scenario drives one URL through DRF's test client with a real JWT, the
+way the frontend calls it. Every request runs in a savepoint that is rolled
+back, so every iteration sees the same data, and the fixtures the scenarios
+need (a pending purchase, upload sessions, a staff user) are created inside
+``isolated()``, whose transaction is rolled back at the end too: the database
+is left as it was. Latency comes from timed runs; queries per request and peak Python
+memory (``tracemalloc``) from one extra instrumented run, so neither kind of
+instrumentation skews the timings.
+"""
+
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ListSerializer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from messaging.models import Conversation, Notification
+from waste_management import cache, purchases, storage, uploads
+from waste_management.models import Transaction, WasteListing
+from waste_management.serializers import TransactionSerializer, WasteListingSerializer
+
+from .datagen import PASSWORD, USERNAME_PREFIX
+
+# URL prefixes whose every named route must have a scenario.
+COVERED_URLCONFS = ("accounts.urls", "waste_management.urls", "messaging.urls")
+STAFF_USERNAME = "benchmark_staff"
+HARNESS_SQL = {"BEGIN", "ROLLBACK", "SAVEPOINT", "RELEASE"}
+# Listings per request in the bulk import scenario.
+IMPORT_ROWS = 200
+
+
+@dataclass
+class Scenario:
+    name: str
+    url_name: str
+    path: str
+    method: str = "get"
+    # Sent as JSON, or as they are with ``content_type`` when bytes.
+    data: dict | list | bytes = field(default_factory=dict)
+    user: User | None = None
+    content_type: str | None = None
+    # Extra request headers, as WSGI environ keys (HTTP_...).
+    headers: dict = field(default_factory=dict)
+    # Run once before every iteration, e.g. to start from a cold cache.
+    setup: object = None
+    expected_status: int = 200
+
+
+def covered_url_names():
+    names = set()
+    for pattern in get_resolver().url_patterns:
+        if isinstance(pattern, URLResolver) and getattr(pattern.urlconf_module, "__name__", "") in COVERED_URLCONFS:
+            names.update(p.name for p in pattern.url_patterns if p.name)
+    return names
+
+
+def pick_actors():
+    """The busiest benchmark user in each role the scenarios need, so pages are full."""
+    bench_users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+    seller = (
+        bench_users.annotate(rows=Count("wastelisting")).filter(rows__gt=0).order_by("-rows").first()
+    )
+    buyer = bench_users.annotate(rows=Count("purchases")).filter(rows__gt=0).order_by("-rows").first()
+    talker = (
+        bench_users.annotate(rows=Count("conversation_memberships")).filter(rows__gt=0).order_by("-rows").first()
+    )
+    if not (seller and buyer and talker):
+        raise LookupError("No benchmark data found; run the generate_data command first.")
+    return seller, buyer, talker
+
+
+def benchmark_photo():
+    buffer = BytesIO()
+    Image.new("RGB", (640, 480), "green").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def upload_session(user, listing, photo, received):
+    """A chunked upload of ``photo`` with its first ``received`` bytes sent."""
+    session = uploads.start(user, listing, "benchmark.jpg", len(photo))
+    if received:
+        uploads.append(session, 0, received, BytesIO(photo))
+    return session
+
+
+def _files(directory):
+    return {os.path.join(root, name) for root, _, names in os.walk(directory) for name in names}
+
+
+@contextmanager
+def isolated():
+    """Undo everything built and requested inside: build and run the scenarios in here.
+
+    Database writes are rolled back. Files are not transactional, so upload
+    part files and image blobs written meanwhile are deleted on the way out.
+    """
+    directories = [settings.UPLOAD_SESSION_DIR, os.path.join(settings.MEDIA_ROOT, storage.PREFIX)]
+    before = {directory: _files(directory) for directory in directories}
+    try:
+        with transaction.atomic():
+            yield
+            transaction.set_rollback(True)
+    finally:
+        for directory in directories:
+            for path in _files(directory) - before[directory]:
+                os.unlink(path)
+
+
+def build_scenarios():
+    """The scenarios, with the fixtures they need; call inside ``isolated()`` outside tests."""
+    seller, buyer, talker = pick_actors()
+    conversation = Conversation.objects.filter(participants=talker).order_by("-last_message_at").first()
+    other = conversation.participants.exclude(pk=talker.pk).first()
+    notification = Notification.objects.filter(user=talker).order_by("-id").first() or Notification.objects.create(
+        user=talker, type="system", title="Benchmark", message="Benchmark notification"
+    )
+    for_sale = WasteListing.objects.filter(status="available", quantity__gte=2).exclude(user=buyer).first()
+    if for_sale is None:
+        raise LookupError("No listing available to buy; run the generate_data command first.")
+    held = purchases.reserve(for_sale.pk, buyer, 1)
+    own = WasteListing.objects.filter(user=seller).first()
+    photo = benchmark_photo()
+    started = upload_session(seller, own, photo, 0)
+    sent = upload_session(seller, own, photo, len(photo))
+    staff, _ = User.objects.get_or_create(
+        username=STAFF_USERNAME,
+        defaults={"phone": "+998000000001", "role": "admin", "location": "Nairobi", "is_staff": True},
+    )
+
+    def cold_feed():
+        cache.get_cache().clear()
+
+    feed = "/api/waste/listings/"
+    new_listing = {
+        "title": "Benchmark bottles",
+        "description": "Clean PET bottles",
+        "type": "plastic",
+        "quantity": 40,
+        "location": "Nairobi",
+        "latitude": -1.2864,
+        "longitude": 36.8172,
+        "price_per_unit": "10.00",
+    }
+    return [
+        Scenario(
+            "register",
+            "register",
+            "/api/auth/register/",
+            "post",
+            {
+                "username": "bench_register",
+                "email": "bench_register@example.com",
+                "password": PASSWORD,
+                "confirm_password": PASSWORD,
+                "phone": "+998000000000",
+                "role": "buyer",
+                "location": "Nairobi",
+            },
+            expected_status=201,
+        ),
+        Scenario("login", "login", "/api/auth/login/", "post", {"username": seller.username, "password": PASSWORD}),
+        Scenario("profile", "profile", "/api/auth/profile/", user=seller),
+        Scenario("listings", "waste-listings", feed, setup=cold_feed),
+        Scenario("listings (cached)", "waste-listings", feed),
+        Scenario("listings type filter", "waste-listings", f"{feed}?type=plastic", setup=cold_feed),
+        Scenario("listings cursor", "waste-listings", f"{feed}?pagination=cursor&count=false", setup=cold_feed),
+        Scenario("listings search", "waste-listings", f"{feed}?q=bottles", setup=cold_feed),
+        Scenario(
+            "listings near",
+            "waste-listings",
+            f"{feed}?lat=-1.2864&lng=36.8172&radius_km=5&ordering=distance",
+            setup=cold_feed,
+        ),
+        Scenario("listing cache stats", "listing-cache-stats", f"{feed}cache-stats/", user=staff),
+        Scenario(
+            "create listing", "create-listing", f"{feed}create/", "post", new_listing, user=seller, expected_status=201
+        ),
+        Scenario(
+            "import listings",
+            "import-listings",
+            f"{feed}import/",
+            "post",
+            [{**new_listing, "title": f"Benchmark bottles {index}"} for index in range(IMPORT_ROWS)],
+            user=seller,
+            expected_status=201,
+        ),
+        Scenario("my listings", "my-listings", f"{feed}my/", user=seller),
+        Scenario("export listings", "export-listings", f"{feed}export/", user=seller),
+        Scenario(
+            "purchase",
+            "purchase-listing",
+            f"{feed}{for_sale.pk}/purchase/",
+            "post",
+            {"quantity": 1},
+            user=buyer,
+            expected_status=201,
+        ),
+        Scenario(
+            "start upload",
+            "start-upload",
+            f"{feed}{own.pk}/uploads/",
+            "post",
+            {"filename": "photo.jpg", "size": len(photo)},
+            user=seller,
+            expected_status=201,
+        ),
+        Scenario("upload status", "upload-session", f"/api/waste/uploads/{started.pk}/", user=seller),
+        Scenario(
+            "upload chunk",
+            "upload-session",
+            f"/api/waste/uploads/{started.pk}/",
+            "put",
+            photo,
+            user=seller,
+            content_type="application/octet-stream",
+            headers={"HTTP_CONTENT_RANGE": f"bytes 0-{len(photo) - 1}/{len(photo)}"},
+        ),
+        Scenario(
+            "complete upload",
+            "complete-upload",
+            f"/api/waste/uploads/{sent.pk}/complete/",
+            "post",
+            user=seller,
+            expected_status=201,
+        ),
+        Scenario("my transactions", "my-transactions", "/api/waste/transactions/my/", user=buyer),
+        Scenario(
+            "export transactions",
+            "export-transactions",
+            "/api/waste/transactions/export/?output=ndjson",
+            user=staff,
+        ),
+        Scenario(
+            "confirm purchase",
+            "confirm-transaction",
+            f"/api/waste/transactions/{held.pk}/confirm/",
+            "post",
+            {"payment_reference": "BENCH-1"},
+            user=buyer,
+        ),
+        Scenario("inbox", "my-conversations", "/api/messaging/conversations/", user=talker),
+        Scenario(
+            "conversation messages",
+            "conversation-messages",
+            f"/api/messaging/conversations/{conversation.pk}/messages/",
+            user=talker,
+        ),
+        Scenario(
+            "mark conversation read",
+            "mark-conversation-read",
+            f"/api/messaging/conversations/{conversation.pk}/read/",
+            "post",
+            user=talker,
+        ),
+        Scenario(
+            "send message",
+            "send-message",
+            "/api/messaging/messages/send/",
+            "post",
+            {"receiver_id": other.pk, "content": "Is this still available?"},
+            user=talker,
+            expected_status=201,
+        ),
+        Scenario("notifications", "my-notifications", "/api/messaging/notifications/", user=talker),
+        Scenario(
+            "mark notifications read",
+            "mark-notifications-read",
+            "/api/messaging/notifications/read/",
+            "post",
+            {"ids": [notification.pk]},
+            user=talker,
+        ),
+        Scenario(
+            "mark all notifications read",
+            "mark-all-notifications-read",
+            "/api/messaging/notifications/read-all/",
+            "post",
+            user=talker,
+        ),
+        Scenario(
+            "mark notification read",
+            "mark-notification-read",
+            f"/api/messaging/notifications/{notification.pk}/read/",
+            "post",
+            user=talker,
+        ),
+    ]
+
+
+def missing_scenarios(scenarios):
+    return sorted(covered_url_names() - {scenario.url_name for scenario in scenarios})
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = (len(ordered) - 1) * pct / 100
+    low = int(index)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (index - low)
+
+
+class Runner:
+    def __init__(self, iterations=50, warmup=5):
+        self.iterations = iterations
+        self.warmup = warmup
+        # Outside the test runner "testserver" is not an allowed host.
+        self.client = APIClient(SERVER_NAME="localhost")
+
+    def request(self, scenario):
+        if scenario.setup:
+            scenario.setup()
+        return self._request(scenario)
+
+    def _request(self, scenario):
+        headers = dict(scenario.headers)
+        if scenario.user is not None:
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {AccessToken.for_user(scenario.user)}"
+        if scenario.content_type:
+            headers["content_type"] = scenario.content_type
+        else:
+            headers["format"] = "json"
+        with transaction.atomic():
+            response = getattr(self.client, scenario.method)(scenario.path, scenario.data, **headers)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            else:
+                response.content  # pylint: disable=pointless-statement
+            transaction.set_rollback(True)
+        if response.status_code != scenario.expected_status:
+            raise AssertionError(f"{scenario.name}: {scenario.path} returned {response.status_code}")
+        return response
+
+    def measure(self, scenario):
+        for _ in range(self.warmup):
+            self.request(scenario)
+        timings = []
+        for _ in range(self.iterations):
+            if scenario.setup:
+                scenario.setup()
+            start = time.perf_counter()
+            self._request(scenario)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                self.request(scenario)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # The rolled-back transaction around each request is the harness's, not the endpoint's.
+        endpoint_queries = [q for q in queries.captured_queries if q["sql"].split()[0].upper() not in HARNESS_SQL]
+
+        return {
+            "path": scenario.path,
+            "method": scenario.method.upper(),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "queries": len(endpoint_queries),
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
+
+    def run(self, scenarios, log=None):
+        results = {}
+        for scenario in scenarios:
+            results[scenario.name] = self.measure(scenario)
+            if log:
+                log(scenario.name, results[scenario.name])
+        return {"environment": environment(self.iterations), "results": results}
+
+
+def serializer_benchmarks(iterations=20, rows=100):
+    """Time DRF's field-by-field list serialization against the compiled path on the same rows.
+
+    Rows are fetched once up front, so only serialization is timed. Returns
+    ``{case: {"rows", "drf_ms", "compiled_ms", "speedup"}}`` with median timings.
+    """
+    context = {"request": APIRequestFactory(SERVER_NAME="localhost").get("/")}
+    cases = {
+        "listings": (
+            WasteListingSerializer,
+            WasteListing.objects.select_related("user").prefetch_related("images").order_by("-created_at", "-id"),
+        ),
+        "transactions": (
+            TransactionSerializer,
+            Transaction.objects.select_related("listing__user", "buyer", "seller")
+            .prefetch_related("listing__images")
+            .order_by("-created_at", "-id"),
+        ),
+    }
+    results = {}
+    for name, (serializer_class, queryset) in cases.items():
+        objects = list(queryset[:rows])
+
+        def drf(serializer_class=serializer_class, objects=objects):
+            return ListSerializer(objects, child=serializer_class(), context=context).data
+
+        def compiled(serializer_class=serializer_class, objects=objects):
+            return serializer_class(objects, many=True, context=context).data
+
+        if JSONRenderer().render(drf()) != JSONRenderer().render(compiled()):
+            raise AssertionError(f"{name}: compiled serialization differs from DRF's")
+        timings = {}
+        for label, serialize in (("drf_ms", drf), ("compiled_ms", compiled)):
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                serialize()
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[label] = round(statistics.median(samples), 3)
+        speedup = timings["drf_ms"] / timings["compiled_ms"] if timings["compiled_ms"] else 0.0
+        results[name] = {"rows": len(objects), **timings, "speedup": round(speedup, 2)}
+    return results
+
+
+def environment(iterations):
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "iterations": iterations,
+        "rows": {
+            "users": User.objects.count(),
+            "listings": WasteListing.objects.count(),
+            "conversations": Conversation.objects.count(),
+            "notifications": Notification.objects.count(),
+        },
+    }
+
+
+def compare(current, baseline, threshold):
+    """Rows of ``(name, metric, before, after, change)`` plus the names that regressed past ``threshold``."""
+    rows, regressions = [], []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "queries"):
+            old, new = before[metric], result[metric]
+            change = (new - old) / old if old else (1.0 if new else 0.0)
+            rows.append((name, metric, old, new, change))
+            # More queries is always a regression; timings get ``threshold`` of slack for noise.
+            if (metric == "queries" and new > old) or (metric != "queries" and change > threshold):
+                regressions.append(f"{name} {metric}")
+    return rows, regressions
+
+
+def load(path):
+    with open(path, encoding="utf-8") as baseline:
+        return json.load(baseline)
+
+
+def save(path, report):
+    with open(path, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+        output.write("\n")
@@ -0,0 +1,98 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from benchmarks import harness
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API endpoint against the current database (see generate_data) and report latency "
+        "percentiles, queries per request and peak memory, optionally against a saved JSON baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50, help="Timed requests per scenario.")
+        parser.add_argument("--warmup", type=int, default=5, help="Untimed requests before timing.")
+        parser.add_argument("--only", help="Run only scenarios whose name contains this text.")
+        parser.add_argument("--output", help="Write the results to this JSON file (e.g. to use as a baseline).")
+        parser.add_argument("--baseline", help="Compare against results previously written with --output.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Relative latency increase over the baseline counted as a regression (default 0.25).",
+        )
+        parser.add_argument(
+            "--fail-on-regression", action="store_true", help="Exit with an error if anything regressed."
+        )
+        parser.add_argument(
+            "--serializers",
+            action="store_true",
+            help="Instead of the endpoints, compare DRF list serialization with the compiled fast path.",
+        )
+        parser.add_argument("--rows", type=int, default=100, help="Rows per list with --serializers.")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        # Time with DEBUG off, as in production: query logging and the debug-only middleware would skew the numbers.
+        with override_settings(DEBUG=False):
+            self.run_benchmarks(options)
+
+    def run_benchmarks(self, options):
+        if options["serializers"]:
+            self.benchmark_serializers(options)
+            return
+        # The fixtures the scenarios create are rolled back with the requests.
+        with harness.isolated():
+            try:
+                scenarios = harness.build_scenarios()
+            except LookupError as exc:
+                raise CommandError(str(exc)) from exc
+
+            missing = harness.missing_scenarios(scenarios)
+            if missing:
+                raise CommandError(f"No benchmark scenario for: {', '.join(missing)}")
+            if options["only"]:
+                scenarios = [scenario for scenario in scenarios if options["only"] in scenario.name]
+
+            self.stdout.write(
+                f"{'scenario':32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'peak KiB':>9}"
+            )
+            runner = harness.Runner(iterations=options["iterations"], warmup=options["warmup"])
+            report = runner.run(scenarios, log=self.write_result)
+
+        if options["output"]:
+            harness.save(options["output"], report)
+            self.stdout.write(f"Results written to {options['output']}")
+        if options["baseline"]:
+            self.compare(report, harness.load(options["baseline"]), options)
+
+    def benchmark_serializers(self, options):
+        results = harness.serializer_benchmarks(iterations=options["iterations"], rows=options["rows"])
+        self.stdout.write(f"{'serializer':16} {'rows':>6} {'drf ms':>9} {'compiled ms':>12} {'speedup':>8}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:16} {result['rows']:6d} {result['drf_ms']:9.2f} {result['compiled_ms']:12.2f} "
+                f"{result['speedup']:7.2f}x"
+            )
+
+    def write_result(self, name, result):
+        self.stdout.write(
+            f"{name:32} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} {result['p99_ms']:9.2f} "
+            f"{result['queries']:8d} {result['peak_memory_kb']:9.1f}"
+        )
+
+    def compare(self, report, baseline, options):
+        rows, regressions = harness.compare(report, baseline, options["threshold"])
+        self.stdout.write(f"\n{'scenario':32} {'metric':8} {'baseline':>10} {'current':>10} {'change':>8}")
+        for name, metric, before, after, change in rows:
+            line = f"{name:32} {metric:8} {before:10.2f} {after:10.2f} {change:+8.1%}"
+            self.stdout.write(self.style.ERROR(line) if f"{name} {metric}" in regressions else line)
+        if regressions:
+            message = f"Regressed: {', '.join(regressions)}"
+            if options["fail_on_regression"]:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
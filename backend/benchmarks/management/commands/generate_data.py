@@ -0,0 +1,60 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from benchmarks.datagen import USERNAME_PREFIX, Generator
+
+SCALES = {
+    "small": {"users": 1_000, "listings": 10_000, "transactions": 5_000, "conversations": 2_000, "messages": 50_000},
+    "medium": {
+        "users": 10_000,
+        "listings": 100_000,
+        "transactions": 50_000,
+        "conversations": 20_000,
+        "messages": 1_000_000,
+    },
+    "large": {
+        "users": 100_000,
+        "listings": 1_000_000,
+        "transactions": 500_000,
+        "conversations": 200_000,
+        "messages": 10_000_000,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = "Add synthetic users, listings, transactions, conversations and notifications for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=SCALES, default="small", help="Preset row counts (default: small).")
+        for name in ("users", "listings", "transactions", "conversations", "messages", "notifications"):
+            parser.add_argument(f"--{name}", type=int, help=f"Number of {name}, overriding the preset.")
+        parser.add_argument("--images-per-listing", type=int, default=1)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for reproducible data.")
+        parser.add_argument("--force", action="store_true", help="Allow running with DEBUG off.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("Refusing to add benchmark data with DEBUG off; pass --force if this is intended.")
+
+        counts = dict(SCALES[options["scale"]])
+        counts["notifications"] = counts["users"] * 5
+        counts.update({name: options[name] for name in counts if options.get(name) is not None})
+
+        log = self.stdout.write if options["verbosity"] > 1 else None
+        generator = Generator(seed=options["seed"], batch_size=options["batch_size"], log=log)
+        started = time.perf_counter()
+
+        self.stdout.write(f"Users: {generator.users(counts['users'])}")
+        if not User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError("There are no benchmark users to own the remaining data.")
+        self.stdout.write(f"Listings: {generator.listings(counts['listings'], options['images_per_listing'])}")
+        self.stdout.write(f"Transactions: {generator.transactions(counts['transactions'])}")
+        conversations, messages = generator.conversations(counts["conversations"], counts["messages"])
+        self.stdout.write(f"Conversations: {conversations}, messages: {messages}")
+        self.stdout.write(f"Notifications: {generator.notifications(counts['notifications'])}")
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - started:.1f}s"))
@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from accounts.models import User
+from messaging.models import Conversation, ConversationParticipant, Message, Notification
+from waste_management.models import Transaction, UploadSession, WasteImage, WasteListing
+from . import harness
+
+
+class BenchmarkCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # The upload scenarios write files: keep them out of the project.
+        scratch = cls.scratch = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, scratch)
+        files = override_settings(MEDIA_ROOT=scratch, UPLOAD_SESSION_DIR=os.path.join(scratch, "uploads"))
+        files.enable()
+        cls.addClassCleanup(files.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            "generate_data",
+            users=12,
+            listings=30,
+            transactions=20,
+            conversations=8,
+            messages=40,
+            notifications=20,
+            batch_size=7,
+            force=True,
+            stdout=StringIO(),
+        )
+
+    def test_generated_data_is_consistent(self):
+        self.assertEqual(User.objects.count(), 12)
+        self.assertEqual(WasteListing.objects.exclude(geohash="").count(), 30)
+        self.assertEqual(Message.objects.count(), 40)
+        self.assertFalse(Conversation.objects.filter(last_message=None).exists())
+        self.assertEqual(ConversationParticipant.objects.count(), 16)
+
+    def test_every_url_has_a_scenario(self):
+        with harness.isolated():
+            self.assertEqual(harness.missing_scenarios(harness.build_scenarios()), [])
+
+    @override_settings(DEBUG=True)
+    def test_benchmark_times_with_debug_off(self):
+        seen = []
+        measure = harness.Runner.measure
+
+        def spy(runner, scenario):
+            seen.append(settings.DEBUG)
+            return measure(runner, scenario)
+
+        with mock.patch.object(harness.Runner, "measure", spy):
+            call_command("benchmark", iterations=1, warmup=0, only="notifications", stdout=StringIO())
+        self.assertTrue(seen)
+        self.assertNotIn(True, seen)
+        self.assertTrue(settings.DEBUG)
+
+    def test_benchmark_leaves_the_database_and_files_untouched(self):
+        def state():
+            files = sorted(os.path.relpath(path, self.scratch) for path in harness._files(self.scratch))
+            counts = [model.objects.count() for model in (User, Transaction, UploadSession, Notification, WasteImage)]
+            return counts, list(WasteListing.objects.order_by("pk").values_list("quantity", "status")), files
+
+        before = state()
+        call_command("benchmark", iterations=1, warmup=0, stdout=StringIO())
+        self.assertEqual(state(), before)
+
+    def test_benchmark_writes_and_compares_a_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            call_command("benchmark", iterations=1, warmup=0, output=path, stdout=StringIO())
+            with open(path, encoding="utf-8") as baseline:
+                report = json.load(baseline)
+            output = StringIO()
+            call_command(
+                "benchmark", iterations=1, warmup=0, only="notifications", baseline=path, stdout=output
+            )
+
+        with harness.isolated():
+            self.assertEqual(len(report["results"]), len(harness.build_scenarios()))
+        self.assertEqual(report["results"]["listings (cached)"]["queries"], 0)
+        self.assertIn("mark all notifications read", output.getvalue())
+        # Writes were rolled back.
+        self.assertEqual(Message.objects.count(), 40)
+
+    def test_serializer_benchmark(self):
+        output = StringIO()
+        call_command("benchmark", serializers=True, iterations=2, rows=10, stdout=output)
+        self.assertIn("transactions", output.getvalue())
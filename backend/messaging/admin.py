@@ -1,11 +1,17 @@
 from django.contrib import admin
-from .models import Conversation, Message, Notification
+from .models import Conversation, ConversationParticipant, Message, Notification
+
+
+class ConversationParticipantInline(admin.TabularInline):
+    model = ConversationParticipant
+    extra = 1
+    raw_id_fields = ("user",)
 
 
 @admin.register(Conversation)
 class ConversationAdmin(admin.ModelAdmin):
-    list_display = ("id", "get_participants", "created_at")
-    filter_horizontal = ("participants",)
+    list_display = ("id", "get_participants", "last_message_at", "created_at")
+    inlines = [ConversationParticipantInline]
     readonly_fields = ("created_at", "updated_at")
 
     def get_participants(self, obj):
@@ -16,8 +22,8 @@ class ConversationAdmin(admin.ModelAdmin):
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ("sender", "conversation", "content_preview", "is_read", "created_at")
-    list_filter = ("is_read", "created_at")
+    list_display = ("sender", "conversation", "content_preview", "created_at")
+    list_filter = ("created_at",)
     search_fields = ("sender__username", "content")
     readonly_fields = ("created_at",)
 
@@ -0,0 +1,25 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .realtime import user_group
+
+UNAUTHORIZED_CLOSE_CODE = 4401
+
+
+class UpdatesConsumer(AsyncJsonWebsocketConsumer):
+    """Per-user channel pushing new messages and notifications as they are created."""
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close(code=UNAUTHORIZED_CLOSE_CODE)
+            return
+        self.group_name = user_group(user.pk)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def push(self, event):
+        await self.send_json({"type": event["event"], "data": event["data"]})
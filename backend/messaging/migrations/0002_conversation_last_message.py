@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_last_message(apps, schema_editor):
+    Conversation = apps.get_model("messaging", "Conversation")
+    Message = apps.get_model("messaging", "Message")
+    for conversation in Conversation.objects.only("id").iterator(chunk_size=1000):
+        last = Message.objects.filter(conversation=conversation).order_by("-created_at", "-id").first()
+        if last is not None:
+            Conversation.objects.filter(pk=conversation.pk).update(last_message=last, last_message_at=last.created_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conversation",
+            name="last_message",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="messaging.message",
+            ),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="last_message_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="conversation",
+            index=models.Index(fields=["-last_message_at", "-id"], name="conversation_activity_idx"),
+        ),
+        migrations.RunPython(populate_last_message, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0002_conversation_last_message"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="message",
+            options={"ordering": ["created_at", "id"]},
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["conversation", "id"], name="message_conversation_id_idx"),
+        ),
+    ]
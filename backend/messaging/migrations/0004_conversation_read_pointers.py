@@ -0,0 +1,80 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_read_pointers(apps, schema_editor):
+    """Start each participant after the newest message they sent or that was flagged read."""
+    ConversationParticipant = apps.get_model("messaging", "ConversationParticipant")
+    Message = apps.get_model("messaging", "Message")
+    for membership in ConversationParticipant.objects.iterator(chunk_size=1000):
+        seen = Message.objects.filter(conversation_id=membership.conversation_id).filter(
+            models.Q(is_read=True) | models.Q(sender_id=membership.user_id)
+        )
+        last_seen = seen.aggregate(last=models.Max("id"))["last"]
+        if last_seen:
+            ConversationParticipant.objects.filter(pk=membership.pk).update(last_read_message_id=last_seen)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0003_message_conversation_id_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Adopt the existing auto-created participants table as an explicit model.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="ConversationParticipant",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID"),
+                        ),
+                        (
+                            "conversation",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="memberships",
+                                to="messaging.conversation",
+                            ),
+                        ),
+                        (
+                            "user",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="conversation_memberships",
+                                to=settings.AUTH_USER_MODEL,
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "messaging_conversation_participants",
+                        "unique_together": {("conversation", "user")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="conversation",
+                    name="participants",
+                    field=models.ManyToManyField(
+                        through="messaging.ConversationParticipant", to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="conversationparticipant",
+            name="last_read_message_id",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_read_pointers, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="message",
+            name="is_read",
+        ),
+    ]
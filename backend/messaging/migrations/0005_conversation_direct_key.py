@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+def populate_direct_keys(apps, schema_editor):
+    """Key existing two-person conversations; the oldest thread of a pair wins."""
+    Conversation = apps.get_model("messaging", "Conversation")
+    ConversationParticipant = apps.get_model("messaging", "ConversationParticipant")
+    seen = set()
+    for conversation in Conversation.objects.order_by("id").only("id").iterator(chunk_size=1000):
+        user_ids = sorted(
+            ConversationParticipant.objects.filter(conversation=conversation).values_list("user_id", flat=True)
+        )
+        if len(user_ids) != 2:
+            continue
+        key = f"{user_ids[0]}:{user_ids[1]}"
+        if key in seen:
+            continue
+        seen.add(key)
+        Conversation.objects.filter(pk=conversation.pk).update(direct_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0004_conversation_read_pointers"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conversation",
+            name="direct_key",
+            field=models.CharField(blank=True, editable=False, max_length=41, null=True, unique=True),
+        ),
+        migrations.RunPython(populate_direct_keys, migrations.RunPython.noop),
+    ]
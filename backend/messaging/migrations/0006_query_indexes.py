@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0005_conversation_direct_key"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["conversation", "created_at", "id"], name="message_conversation_time_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(fields=["user", "-created_at", "-id"], name="notification_user_created_idx"),
+        ),
+    ]
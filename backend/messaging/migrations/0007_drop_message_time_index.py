@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:59
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0006_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="message",
+            options={"ordering": ["id"]},
+        ),
+        migrations.RemoveIndex(
+            model_name="message",
+            name="message_conversation_time_idx",
+        ),
+    ]
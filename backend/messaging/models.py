@@ -1,28 +1,94 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
 
 
 class Conversation(models.Model):
-    participants = models.ManyToManyField(settings.AUTH_USER_MODEL)
+    participants = models.ManyToManyField(settings.AUTH_USER_MODEL, through="ConversationParticipant")
+    # "<lower user id>:<higher user id>" for 1:1 threads, so each pair has exactly one.
+    direct_key = models.CharField(max_length=41, null=True, blank=True, unique=True, editable=False)
+    # Denormalized from the newest Message so the inbox never scans message history.
+    last_message = models.ForeignKey(
+        "Message", on_delete=models.SET_NULL, null=True, blank=True, related_name="+", editable=False
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["-last_message_at", "-id"], name="conversation_activity_idx")]
+
     def __str__(self):
         users = list(self.participants.all())
         if len(users) >= 2:
             return f"Conversation: {users[0].username} & {users[1].username}"
         return f"Conversation {self.id}"
 
+    @staticmethod
+    def direct_key_for(user_id, other_user_id):
+        low, high = sorted((int(user_id), int(other_user_id)))
+        return f"{low}:{high}"
+
+    @classmethod
+    def get_or_create_direct(cls, user, other_user):
+        """Return the 1:1 conversation between two users, creating it on first contact.
+
+        One unique-index lookup; concurrent first messages race on the unique
+        key and the loser reads the winner's row.
+        """
+        key = cls.direct_key_for(user.pk, other_user.pk)
+        conversation = cls.objects.filter(direct_key=key).first()
+        if conversation is not None:
+            return conversation, False
+        try:
+            with transaction.atomic():
+                conversation = cls.objects.create(direct_key=key)
+                conversation.participants.add(user, other_user)
+        except IntegrityError:
+            return cls.objects.get(direct_key=key), False
+        return conversation, True
+
+    def record_message(self, message):
+        """Point the conversation at ``message`` unless a newer one is already recorded."""
+        Conversation.objects.filter(
+            models.Q(last_message_at__isnull=True) | models.Q(last_message_at__lte=message.created_at), pk=self.pk
+        ).update(last_message=message, last_message_at=message.created_at, updated_at=message.created_at)
+        self.last_message = message
+        self.last_message_at = message.created_at
+
+
+class ConversationParticipant(models.Model):
+    """Membership of a user in a conversation, with their read position.
+
+    Every message with an id above ``last_read_message_id`` (and not sent by the
+    user) is unread, so marking a conversation read is a one-row UPDATE and the
+    unread count is a range count over the ``(conversation, id)`` message index.
+    """
+
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="memberships")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="conversation_memberships"
+    )
+    last_read_message_id = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = "messaging_conversation_participants"
+        unique_together = [("conversation", "user")]
+
+    def __str__(self):
+        return f"{self.user.username} in conversation {self.conversation_id}"
+
 
 class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="messages")
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
-    is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ["created_at"]
+        # Ids increase with created_at, so one (conversation, id) index serves
+        # both the chronological order and the id ranges.
+        ordering = ["id"]
+        indexes = [models.Index(fields=["conversation", "id"], name="message_conversation_id_idx")]
 
     def __str__(self):
         return f"{self.sender.username}: {self.content[:50]}..."
@@ -45,6 +111,7 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["user", "-created_at", "-id"], name="notification_user_created_idx")]
 
     def __str__(self):
         return f"{self.user.username} - {self.title}"
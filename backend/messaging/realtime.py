@@ -0,0 +1,22 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def user_group(user_id):
+    return f"user.{user_id}"
+
+
+def push_to_users(user_ids, event, data):
+    """Send ``data`` to every open socket of ``user_ids`` once the current transaction commits."""
+    user_ids = list(user_ids)
+
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        group_send = async_to_sync(channel_layer.group_send)
+        for user_id in user_ids:
+            group_send(user_group(user_id), {"type": "push", "event": event, "data": data})
+
+    transaction.on_commit(send)
@@ -1,27 +1,26 @@
 from rest_framework import serializers
+from trashtrotreasure.fieldsets import SparseFieldsMixin
 from .models import Conversation, Message, Notification
 
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sender = serializers.StringRelatedField()
 
     class Meta:
         model = Message
-        fields = ["id", "sender", "content", "is_read", "created_at"]
+        fields = ["id", "sender", "content", "created_at"]
 
 
-class ConversationSerializer(serializers.ModelSerializer):
+class ConversationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Inbox row: the message history itself is only served by ``conversation_messages``."""
+
     participants = serializers.StringRelatedField(many=True)
-    messages = MessageSerializer(many=True, read_only=True)
-    last_message = serializers.SerializerMethodField()
+    last_message = MessageSerializer(read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Conversation
-        fields = ["id", "participants", "messages", "last_message", "created_at", "updated_at"]
-
-    def get_last_message(self, obj):
-        last_msg = obj.messages.last()
-        return MessageSerializer(last_msg).data if last_msg else None
+        fields = ["id", "participants", "last_message", "last_message_at", "unread_count", "created_at", "updated_at"]
 
 
 class MessageCreateSerializer(serializers.ModelSerializer):
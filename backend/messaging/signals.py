@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Message, Notification
+from .realtime import push_to_users
+from .serializers import MessageSerializer, NotificationSerializer
+
+
+@receiver(post_save, sender=Message)
+def push_message(sender, instance, created, **kwargs):
+    if not created:
+        return
+    data = dict(MessageSerializer(instance).data, conversation=instance.conversation_id)
+    participants = instance.conversation.participants.values_list("id", flat=True)
+    push_to_users(participants, "message.created", data)
+
+
+@receiver(post_save, sender=Notification)
+def push_notification(sender, instance, created, **kwargs):
+    if created:
+        push_to_users([instance.user_id], "notification.created", dict(NotificationSerializer(instance).data))
@@ -0,0 +1,473 @@
+import datetime
+import itertools
+import json
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from trashtrotreasure.asgi import application
+from trashtrotreasure.query_plans import FULL_SCAN, capture_selects, plan_problems
+from .models import Conversation, Message, Notification
+
+_phones = itertools.count(710000000)
+
+
+def make_user(username, role="buyer"):
+    return User.objects.create(username=username, phone=f"0{next(_phones)}", role=role, location="Nairobi")
+
+
+class RealtimeTests(TransactionTestCase):
+    def setUp(self):
+        self.sender = make_user("sender")
+        self.receiver = make_user("receiver")
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.sender, self.receiver)
+
+    async def connect(self, user=None, token=None):
+        if user is not None:
+            token = str(await sync_to_async(AccessToken.for_user)(user))
+        path = "/ws/updates/" + (f"?token={token}" if token else "")
+        headers = [(b"host", b"localhost"), (b"origin", b"http://localhost:3000")]
+        communicator = WebsocketCommunicator(application, path, headers=headers)
+        connected, code = await communicator.connect()
+        return communicator, connected, code
+
+    def send_message(self, content):
+        client = APIClient()
+        client.force_authenticate(self.sender)
+        payload = {"conversation_id": self.conversation.id, "content": content}
+        response = client.post("/api/messaging/messages/send/", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    async def test_new_message_is_pushed_to_participants(self):
+        communicator, connected, _ = await self.connect(self.receiver)
+        self.assertTrue(connected)
+        await sync_to_async(self.send_message)("Is the plastic still available?")
+        event = await communicator.receive_json_from(timeout=2)
+        self.assertEqual(event["type"], "message.created")
+        self.assertEqual(event["data"]["content"], "Is the plastic still available?")
+        self.assertEqual(event["data"]["conversation"], self.conversation.id)
+        await communicator.disconnect()
+
+    async def test_new_notification_is_pushed_to_its_user_only(self):
+        receiver, _, _ = await self.connect(self.receiver)
+        sender, _, _ = await self.connect(self.sender)
+        await sync_to_async(Notification.objects.create)(
+            user=self.receiver, type="system", title="Welcome", message="Hello"
+        )
+        event = await receiver.receive_json_from(timeout=2)
+        self.assertEqual(event["type"], "notification.created")
+        self.assertEqual(event["data"]["title"], "Welcome")
+        self.assertTrue(await sender.receive_nothing(timeout=0.2))
+        await receiver.disconnect()
+        await sender.disconnect()
+
+    async def test_rejects_missing_or_invalid_token(self):
+        for token in (None, "not-a-jwt"):
+            communicator, connected, code = await self.connect(token=token)
+            self.assertFalse(connected)
+            self.assertEqual(code, 4401)
+
+
+class MessageRangeTests(TestCase):
+    def setUp(self):
+        self.user = make_user("reader")
+        other = make_user("writer")
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user, other)
+        self.ids = [
+            Message.objects.create(conversation=self.conversation, sender=other, content=f"m{index}").id
+            for index in range(10)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/messaging/conversations/{self.conversation.id}/messages/"
+
+    def fetch(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data["results"]], response.data["has_more"]
+
+    def test_after_id_returns_only_newer_messages(self):
+        self.assertEqual(self.fetch(after_id=self.ids[6]), (self.ids[7:], False))
+        self.assertEqual(self.fetch(after_id=self.ids[2], page_size=3), (self.ids[3:6], True))
+
+    def test_before_id_returns_the_newest_older_messages(self):
+        self.assertEqual(self.fetch(before_id=self.ids[5], page_size=3), (self.ids[2:5], True))
+        self.assertEqual(self.fetch(before_id=self.ids[2]), (self.ids[:2], False))
+
+    def test_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"fields": "id,content", "after_id": self.ids[7]})
+        self.assertEqual(
+            response.data["results"], [{"id": self.ids[8], "content": "m8"}, {"id": self.ids[9], "content": "m9"}]
+        )
+        sql = queries[-1]["sql"]
+        self.assertNotIn("accounts_user", sql)
+        self.assertNotIn('"sender_id"', sql)
+
+    def test_range_scan_uses_conversation_id_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.fetch(after_id=self.ids[0])
+        sql = next(query["sql"] for query in queries if 'FROM "messaging_message"' in query["sql"])
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("message_conversation_id_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+class ReadStateTests(TestCase):
+    def setUp(self):
+        self.reader = make_user("reader")
+        self.writer = make_user("writer")
+        self.client = APIClient()
+        self.client.force_authenticate(self.writer)
+        for index in range(3):
+            self.send(f"offer {index}", receiver_id=self.reader.id)
+        self.conversation = Conversation.objects.get()
+        self.client.force_authenticate(self.reader)
+
+    def send(self, content, **target):
+        response = self.client.post("/api/messaging/messages/send/", {"content": content, **target}, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.data["id"]
+
+    def unread_count(self):
+        return self.client.get("/api/messaging/conversations/").data["results"][0]["unread_count"]
+
+    def test_unread_count_follows_read_pointer(self):
+        self.assertEqual(self.unread_count(), 3)
+        first = self.conversation.messages.first()
+        self.client.post(f"/api/messaging/conversations/{self.conversation.id}/read/", {"message_id": first.id})
+        self.assertEqual(self.unread_count(), 2)
+        self.send("reply", conversation_id=self.conversation.id)
+        self.assertEqual(self.unread_count(), 2)
+
+    def test_mark_conversation_read_is_a_single_update(self):
+        url = f"/api/messaging/conversations/{self.conversation.id}/read/"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([query["sql"].split()[0] for query in queries], ["UPDATE"])
+        self.assertEqual(self.unread_count(), 0)
+
+    def test_mark_conversation_read_requires_membership(self):
+        self.client.force_authenticate(make_user("outsider"))
+        response = self.client.post(f"/api/messaging/conversations/{self.conversation.id}/read/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_notification_updates(self):
+        notifications = [
+            Notification.objects.create(user=self.reader, type="system", title=f"n{index}", message="x")
+            for index in range(4)
+        ]
+        Notification.objects.create(user=self.writer, type="system", title="other", message="x")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/messaging/notifications/read/", {"ids": [notifications[0].id, notifications[1].id]}, format="json"
+            )
+        self.assertEqual(response.data, {"updated": 2})
+        self.assertEqual(len(queries), 1)
+
+        for body in ([notifications[2].id], {"ids": "1"}, {"ids": []}, {"ids": ["1"]}, "ids"):
+            with self.subTest(body=body):
+                response = self.client.post("/api/messaging/notifications/read/", body, format="json")
+                self.assertEqual(response.status_code, 400)
+
+        response = self.client.post("/api/messaging/notifications/read-all/")
+        self.assertEqual(response.data, {"updated": 2})
+        self.assertFalse(Notification.objects.filter(user=self.reader, is_read=False).exists())
+        self.assertTrue(Notification.objects.filter(user=self.writer, is_read=False).exists())
+
+    def test_sparse_inbox(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/messaging/conversations/?fields=id,unread_count,last_message.content")
+        self.assertEqual(
+            response.data["results"],
+            [{"id": self.conversation.id, "unread_count": 3, "last_message": {"content": "offer 2"}}],
+        )
+        # A count and the page: the participants are not prefetched and no user is joined.
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("accounts_user", queries[1]["sql"])
+
+    def test_inbox_expand(self):
+        response = self.client.get("/api/messaging/conversations/?expand=")
+        self.assertEqual(response.data["results"][0]["last_message"], self.conversation.last_message_id)
+        self.assertEqual(self.client.get("/api/messaging/conversations/?expand=participants").status_code, 400)
+
+
+class InboxTests(TestCase):
+    def setUp(self):
+        self.user = make_user("owner")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def send(self, content, receiver):
+        response = self.client.post(
+            "/api/messaging/messages/send/", {"content": content, "receiver_id": receiver.id}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        return Message.objects.get(pk=response.data["id"])
+
+    def inbox(self):
+        return [row["id"] for row in self.client.get("/api/messaging/conversations/").data["results"]]
+
+    def test_sending_records_the_last_message(self):
+        other = make_user("other")
+        self.send("first", other)
+        latest = self.send("second", other)
+        conversation = Conversation.objects.get()
+        self.assertEqual(conversation.last_message_id, latest.id)
+        self.assertEqual(conversation.last_message_at, latest.created_at)
+        row = self.client.get("/api/messaging/conversations/").data["results"][0]
+        self.assertEqual(row["last_message"]["content"], "second")
+
+    def test_an_older_message_does_not_replace_a_newer_one(self):
+        latest = self.send("newer", make_user("other"))
+        conversation = Conversation.objects.get()
+        older = Message.objects.create(conversation=conversation, sender=self.user, content="older")
+        Message.objects.filter(pk=older.pk).update(created_at=latest.created_at - datetime.timedelta(minutes=1))
+        older.refresh_from_db()
+        conversation.record_message(older)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message_id, latest.id)
+
+    def test_latest_activity_first(self):
+        first, second, third = (make_user(name) for name in ("first", "second", "third"))
+        for receiver in (first, second, third):
+            self.send("hello", receiver)
+        self.send("again", first)
+        keys = [Conversation.direct_key_for(self.user.pk, user.pk) for user in (first, third, second)]
+        self.assertEqual(self.inbox(), [Conversation.objects.get(direct_key=key).pk for key in keys])
+
+    def test_conversations_without_messages_are_left_out(self):
+        self.send("hello", make_user("talker"))
+        silent, _ = Conversation.get_or_create_direct(self.user, make_user("silent"))
+        response = self.client.post(
+            "/api/messaging/messages/send/", {"content": "", "receiver_id": make_user("rejected").id}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Conversation.objects.count(), 3)
+        self.assertNotIn(silent.pk, self.inbox())
+        self.assertEqual(len(self.inbox()), 1)
+
+
+class InboxStreamTests(TestCase):
+    def setUp(self):
+        self.user = make_user("owner")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.conversations = []
+        for index in range(3):
+            conversation, _ = Conversation.get_or_create_direct(self.user, make_user(f"contact{index}"))
+            conversation.record_message(
+                Message.objects.create(conversation=conversation, sender=self.user, content=f"hello {index}")
+            )
+            self.conversations.append(conversation.pk)
+
+    def test_paginated_envelope(self):
+        first = self.client.get("/api/messaging/conversations/", {"page_size": 2})
+        self.assertEqual(first.data["count"], 3)
+        self.assertIsNone(first.data["previous"])
+        second = self.client.get(first.data["next"])
+        self.assertIsNone(second.data["next"])
+        self.assertIsNotNone(second.data["previous"])
+        ids = [row["id"] for row in first.data["results"] + second.data["results"]]
+        self.assertEqual(ids, self.conversations[::-1])
+
+    def test_stream_ndjson(self):
+        response = self.client.get("/api/messaging/conversations/", {"stream": "ndjson"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row["id"] for row in rows], self.conversations[::-1])
+        self.assertEqual(rows[0]["last_message"]["content"], "hello 2")
+        self.assertEqual(rows[0]["unread_count"], 0)
+
+
+class DirectConversationTests(TestCase):
+    def setUp(self):
+        self.buyer = make_user("buyer")
+        self.seller = make_user("seller", role="waste_generator")
+
+    def test_both_directions_share_one_conversation(self):
+        first, created = Conversation.get_or_create_direct(self.buyer, self.seller)
+        self.assertTrue(created)
+        second, created = Conversation.get_or_create_direct(self.seller, self.buyer)
+        self.assertFalse(created)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(set(first.participants.all()), {self.buyer, self.seller})
+
+    def test_send_message_reuses_the_pair_conversation(self):
+        client = APIClient()
+        for sender, receiver in [(self.buyer, self.seller), (self.seller, self.buyer), (self.buyer, self.seller)]:
+            client.force_authenticate(sender)
+            payload = {"receiver_id": receiver.id, "content": "hello"}
+            self.assertEqual(client.post("/api/messaging/messages/send/", payload, format="json").status_code, 201)
+        other = make_user("other")
+        client.force_authenticate(other)
+        client.post("/api/messaging/messages/send/", {"receiver_id": self.seller.id, "content": "hi"}, format="json")
+
+        self.assertEqual(Conversation.objects.count(), 2)
+        pair = Conversation.objects.get(direct_key=Conversation.direct_key_for(self.buyer.id, self.seller.id))
+        self.assertEqual(pair.messages.count(), 3)
+        self.assertEqual(pair.participants.count(), 2)
+
+    def test_losing_a_creation_race_returns_the_winner(self):
+        winner, _ = Conversation.get_or_create_direct(self.buyer, self.seller)
+        # Simulate the other request inserting between our lookup and our insert.
+        with mock.patch.object(QuerySet, "first", return_value=None):
+            conversation, created = Conversation.get_or_create_direct(self.seller, self.buyer)
+        self.assertFalse(created)
+        self.assertEqual(conversation.pk, winner.pk)
+
+
+class MessagePaginationTests(TestCase):
+    def setUp(self):
+        self.user = make_user("reader")
+        other = make_user("writer")
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user, other)
+        self.ids = [
+            Message.objects.create(conversation=self.conversation, sender=other, content=f"m{index}").id
+            for index in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/messaging/conversations/{self.conversation.id}/messages/"
+
+    def test_first_page_is_the_newest_messages(self):
+        response = self.client.get(self.url, {"page_size": 2})
+        self.assertEqual([row["id"] for row in response.data["results"]], self.ids[:2:-1])
+        self.assertIsNone(response.data["previous"])
+        self.assertEqual(response.data["count"], 5)
+
+    def test_next_pages_go_back_in_time(self):
+        seen, url = [], f"{self.url}?page_size=2"
+        while url:
+            response = self.client.get(url)
+            seen.extend(row["id"] for row in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(seen, self.ids[::-1])
+
+    def test_stream_ndjson_returns_every_message(self):
+        response = self.client.get(self.url, {"stream": "ndjson", "fields": "id,content"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [{"id": message_id, "content": f"m{index}"} for index, message_id in enumerate(self.ids)],
+        )
+
+    def test_stream_ndjson_requires_membership(self):
+        self.client.force_authenticate(make_user("outsider"))
+        self.assertEqual(self.client.get(self.url, {"stream": "ndjson"}).status_code, 404)
+
+
+class NotificationListTests(TestCase):
+    def test_unread_count_covers_every_page(self):
+        user = make_user("recipient")
+        for index in range(5):
+            Notification.objects.create(
+                user=user, type="system", title=f"Note {index}", message="Hi", is_read=index == 0
+            )
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get("/api/messaging/notifications/", {"page_size": 1})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["unread_count"], 4)
+
+
+class NotificationConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = make_user("recipient")
+        self.notification = Notification.objects.create(user=self.user, type="system", title="Hi", message="Welcome")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_marking_read_changes_the_etag(self):
+        response = self.client.get("/api/messaging/notifications/")
+        etag = response["ETag"]
+        self.assertNotIn("Last-Modified", response)
+        self.assertEqual(self.client.get("/api/messaging/notifications/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.post(f"/api/messaging/notifications/{self.notification.id}/read/")
+        self.assertEqual(self.client.get("/api/messaging/notifications/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_profile_supports_if_modified_since(self):
+        response = self.client.get("/api/auth/profile/")
+        self.assertEqual(response.status_code, 200)
+        since = response["Last-Modified"]
+        self.assertEqual(self.client.get("/api/auth/profile/", HTTP_IF_MODIFIED_SINCE=since).status_code, 304)
+        self.assertEqual(self.client.get("/api/auth/profile/", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+
+@skipUnless(connection.vendor == "sqlite", "checks SQLite's EXPLAIN QUERY PLAN output")
+class QueryPlanTests(TestCase):
+    """Endpoint queries must be answered from indexes: no full table scans, no sorts."""
+
+    def setUp(self):
+        self.reader = make_user("reader")
+        self.writer = make_user("writer")
+        self.client = APIClient()
+        self.client.force_authenticate(self.writer)
+        for index in range(3):
+            self.client.post(
+                "/api/messaging/messages/send/", {"content": f"offer {index}", "receiver_id": self.reader.id}
+            )
+        self.conversation = Conversation.objects.get()
+        for index in range(3):
+            Notification.objects.create(user=self.reader, type="system", title=f"Note {index}", message="Hello")
+        self.client.force_authenticate(self.reader)
+
+    def assertIndexedPlans(self, url, allow_sort=False):
+        with capture_selects() as statements:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(statements)
+        for sql, params in statements:
+            self.assertEqual(plan_problems(sql, params, allow_sort=allow_sort), [], f"{url} ran {sql}")
+        return response
+
+    def test_inbox(self):
+        # The inbox is selected through the user's memberships but ordered by the
+        # conversations' activity, so it sorts that user's conversations.
+        self.assertIndexedPlans("/api/messaging/conversations/", allow_sort=True)
+
+    def test_conversation_messages(self):
+        url = f"/api/messaging/conversations/{self.conversation.id}/messages/"
+        response = self.assertIndexedPlans(f"{url}?page_size=1")
+        self.assertIndexedPlans(response.data["next"])
+        last_id = Message.objects.latest("id").id
+        self.assertIndexedPlans(f"{url}?after_id=0")
+        self.assertIndexedPlans(f"{url}?before_id={last_id}")
+
+    def test_notifications(self):
+        response = self.assertIndexedPlans("/api/messaging/notifications/?page_size=1")
+        self.assertIndexedPlans(response.data["next"])
+
+    def test_only_searches_count_as_indexed(self):
+        full_scans = [
+            "SCAN messaging_message",
+            "SCAN messaging_message USING INDEX message_conversation_id_idx",
+            "SCAN messaging_message USING COVERING INDEX message_conversation_id_idx",
+        ]
+        indexed = [
+            "SEARCH messaging_message USING INDEX message_conversation_id_idx (conversation_id=? AND id>?)",
+            "SCAN waste_listing_fts VIRTUAL TABLE INDEX 0:M4",
+            "SCAN subquery_1",
+            "SCAN CONSTANT ROW",
+        ]
+        for detail in full_scans:
+            self.assertTrue(FULL_SCAN.search(detail), detail)
+        for detail in indexed:
+            self.assertFalse(FULL_SCAN.search(detail), detail)
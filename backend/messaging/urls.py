@@ -4,7 +4,10 @@ from . import views
 urlpatterns = [
     path("conversations/", views.my_conversations, name="my-conversations"),
     path("conversations/<int:conversation_id>/messages/", views.conversation_messages, name="conversation-messages"),
+    path("conversations/<int:conversation_id>/read/", views.mark_conversation_read, name="mark-conversation-read"),
     path("messages/send/", views.send_message, name="send-message"),
     path("notifications/", views.my_notifications, name="my-notifications"),
+    path("notifications/read/", views.mark_notifications_read, name="mark-notifications-read"),
+    path("notifications/read-all/", views.mark_all_notifications_read, name="mark-all-notifications-read"),
     path("notifications/<int:notification_id>/read/", views.mark_notification_read, name="mark-notification-read"),
 ]
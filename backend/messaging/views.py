@@ -1,19 +1,114 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.db import models
-from .models import Conversation, Notification
+from django.db.models.functions import Coalesce, Least
+from trashtrotreasure.conditional import conditional, queryset_validators
+from trashtrotreasure.fieldsets import CONTEXT_KEY, FieldSet, narrow
+from trashtrotreasure.pagination import KeysetPagination, paginated_response
+from .models import Conversation, ConversationParticipant, Message, Notification
 from .serializers import ConversationSerializer, MessageSerializer, MessageCreateSerializer, NotificationSerializer
 
 
+class MessagePagination(KeysetPagination):
+    """Newest messages first: the first page is the latest ones, ``next`` goes back in time."""
+
+    ordering = ("-id",)
+    max_page_size = 200
+
+
+class InboxPagination(KeysetPagination):
+    ordering = ("-last_message_at", "-id")
+
+
+class NotificationPagination(KeysetPagination):
+    """Adds the user's ``unread_count`` over all notifications, not just the page."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.unread_count = queryset.filter(is_read=False).count()
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["unread_count"] = self.unread_count
+        return response
+
+
+MAX_BULK_IDS = 1000
+
+
+def _id_param(params, name):
+    if name not in params:
+        return None
+    try:
+        return int(params[name])
+    except (TypeError, ValueError):
+        raise ValidationError({name: "An integer message id is required."}) from None
+
+
+def _message_range(request, messages, context):
+    """Messages strictly after ``after_id`` and/or before ``before_id``, oldest first.
+
+    Message ids increase with ``created_at``, so each range is a single scan of
+    the ``(conversation, id)`` index. With only ``before_id`` the newest messages
+    below it are returned (scrolling back); otherwise the oldest above ``after_id``
+    (catching up after a reconnect). ``has_more`` tells whether to ask again.
+    """
+    after_id = _id_param(request.query_params, "after_id")
+    before_id = _id_param(request.query_params, "before_id")
+    limit = MessagePagination().get_page_size(request)
+
+    if after_id is not None:
+        messages = messages.filter(id__gt=after_id)
+    if before_id is not None:
+        messages = messages.filter(id__lt=before_id)
+
+    backwards = before_id is not None and after_id is None
+    rows = list(messages.order_by("-id" if backwards else "id")[: limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    return Response({"results": MessageSerializer(rows, many=True, context=context).data, "has_more": has_more})
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def my_conversations(request):
-    conversations = Conversation.objects.filter(participants=request.user)
-    serializer = ConversationSerializer(conversations, many=True)
-    return Response(serializer.data)
+    """The caller's conversations, latest activity first.
+
+    Conversations without a message yet are left out: a direct conversation is
+    created just before its first message is validated and saved, so one whose
+    first message was rejected stays empty and would otherwise be listed.
+    """
+    fieldset = FieldSet.from_request(request, ConversationSerializer)
+    unread = (
+        Message.objects.filter(conversation=models.OuterRef("pk"), id__gt=models.OuterRef("last_read_message_id"))
+        .exclude(sender=request.user)
+        .order_by()
+        .values("conversation")
+        .annotate(count=models.Count("id"))
+        .values("count")
+    )
+    conversations = (
+        Conversation.objects.filter(memberships__user=request.user, last_message_at__isnull=False)
+        .select_related("last_message__sender")
+        .prefetch_related("participants")
+        .annotate(last_read_message_id=models.F("memberships__last_read_message_id"))
+        .annotate(unread_count=Coalesce(models.Subquery(unread), 0))
+        .order_by(*InboxPagination.ordering)
+    )
+    conversations = narrow(conversations, fieldset, keep=InboxPagination.ordering)
+    return paginated_response(
+        request,
+        conversations,
+        ConversationSerializer,
+        pagination_class=InboxPagination,
+        context={CONTEXT_KEY: fieldset},
+    )
 
 
 @api_view(["POST"])
@@ -29,14 +124,16 @@ def send_message(request):
         from accounts.models import User
 
         receiver = get_object_or_404(User, id=receiver_id)
-        conversation, created = Conversation.objects.get_or_create(defaults={"created_at": models.functions.Now()})
-        conversation.participants.add(request.user, receiver)
+        if receiver.pk == request.user.pk:
+            return Response({"error": "You cannot message yourself"}, status=status.HTTP_400_BAD_REQUEST)
+        conversation, _ = Conversation.get_or_create_direct(request.user, receiver)
     else:
         return Response({"error": "conversation_id or receiver_id required"}, status=status.HTTP_400_BAD_REQUEST)
 
     serializer = MessageCreateSerializer(data=request.data)
     if serializer.is_valid():
         message = serializer.save(conversation=conversation, sender=request.user)
+        conversation.record_message(message)
         return Response(MessageSerializer(message).data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -45,23 +142,83 @@ def send_message(request):
 @permission_classes([IsAuthenticated])
 def conversation_messages(request, conversation_id):
     conversation = get_object_or_404(Conversation, id=conversation_id, participants=request.user)
-    messages = conversation.messages.all()
-    serializer = MessageSerializer(messages, many=True)
-    return Response(serializer.data)
+    fieldset = FieldSet.from_request(request, MessageSerializer)
+    messages = narrow(conversation.messages.select_related("sender"), fieldset, keep=MessagePagination.ordering)
+    context = {CONTEXT_KEY: fieldset}
+    if "after_id" in request.query_params or "before_id" in request.query_params:
+        return _message_range(request, messages, context)
+    return paginated_response(
+        request, messages, MessageSerializer, pagination_class=MessagePagination, context=context
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def mark_conversation_read(request, conversation_id):
+    """Move the caller's read pointer up to ``message_id`` (default: the latest message)."""
+    last_message_id = Conversation.objects.filter(pk=conversation_id).values("last_message_id")
+    target = models.Subquery(last_message_id)
+    message_id = _id_param(request.data, "message_id")
+    if message_id is not None:
+        target = Least(models.Value(message_id), target)
+
+    membership = ConversationParticipant.objects.filter(conversation_id=conversation_id, user=request.user)
+    updated = membership.filter(last_read_message_id__lt=target).update(last_read_message_id=target)
+    if not updated and not membership.exists():
+        return Response({"error": "Conversation not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"status": "marked as read"})
+
+
+def _notifications_validators(request):
+    # Marking read is an update() of a flag with no timestamp, so the unread
+    # count carries the change.
+    return queryset_validators(
+        request,
+        Notification.objects.filter(user=request.user),
+        modified=(),
+        latest=models.Max("id"),
+        unread=models.Count("pk", filter=models.Q(is_read=False)),
+    )
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional(_notifications_validators)
 def my_notifications(request):
     notifications = Notification.objects.filter(user=request.user)
-    serializer = NotificationSerializer(notifications, many=True)
-    return Response(serializer.data)
+    return paginated_response(
+        request, notifications, NotificationSerializer, pagination_class=NotificationPagination
+    )
 
 
-@api_view(["PUT"])
+@api_view(["PUT", "POST"])
 @permission_classes([IsAuthenticated])
 def mark_notification_read(request, notification_id):
-    notification = get_object_or_404(Notification, id=notification_id, user=request.user)
-    notification.is_read = True
-    notification.save()
+    if not Notification.objects.filter(id=notification_id, user=request.user).update(is_read=True):
+        return Response({"error": "Notification not found"}, status=status.HTTP_404_NOT_FOUND)
     return Response({"status": "marked as read"})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def mark_notifications_read(request):
+    """Mark the notifications listed in ``ids`` as read with a single UPDATE."""
+    if not isinstance(request.data, dict):
+        return Response({"error": "Expected an object with ids"}, status=status.HTTP_400_BAD_REQUEST)
+    ids = request.data.get("ids")
+    if not isinstance(ids, list) or not ids or len(ids) > MAX_BULK_IDS:
+        return Response(
+            {"error": f"ids must be a list of 1 to {MAX_BULK_IDS} notification ids"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if not all(isinstance(notification_id, int) for notification_id in ids):
+        return Response({"error": "ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+    updated = Notification.objects.filter(user=request.user, id__in=ids, is_read=False).update(is_read=True)
+    return Response({"updated": updated})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def mark_all_notifications_read(request):
+    updated = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    return Response({"updated": updated})
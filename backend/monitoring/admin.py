@@ -0,0 +1,97 @@
+from django.contrib import admin
+from django.db.models.functions import Length
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+from .models import RequestProfile, SlowQuery
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "duration_ms", "view", "method", "short_sql")
+    list_filter = ("view", "database")
+    search_fields = ("sql", "path")
+    ordering = ("-duration_ms",)
+    readonly_fields = (
+        "created_at",
+        "database",
+        "view",
+        "method",
+        "path",
+        "duration_ms",
+        "sql",
+        "params",
+        "stack",
+        "plan",
+    )
+
+    fieldsets = (
+        ("Request", {"fields": ("created_at", "view", "method", "path")}),
+        ("Statement", {"fields": ("database", "duration_ms", "sql", "params")}),
+        ("Diagnosis", {"fields": ("plan", "stack")}),
+    )
+
+    @admin.display(description="SQL")
+    def short_sql(self, obj):
+        return obj.sql[:120]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "method", "path", "status_code", "duration_ms", "user", "downloads")
+    list_filter = ("view", "status_code")
+    list_select_related = ("user",)
+    search_fields = ("path",)
+    fields = ("created_at", "user", "view", "method", "path", "status_code", "duration_ms", "samples", "downloads")
+    readonly_fields = fields
+
+    def get_queryset(self, request):
+        # Listing only needs to know whether each format is present, not the blobs.
+        return (
+            super()
+            .get_queryset(request)
+            .defer("pstats", "collapsed_stacks")
+            .annotate(pstats_size=Length("pstats"), stacks_size=Length("collapsed_stacks"))
+        )
+
+    def get_urls(self):
+        download = self.admin_site.admin_view(self.download)
+        return [
+            path("<int:profile_id>/download/<str:kind>/", download, name="monitoring_requestprofile_download"),
+        ] + super().get_urls()
+
+    @admin.display(description="Download")
+    def downloads(self, obj):
+        formats = (("pstats", "pstats", obj.pstats_size), ("folded", "flame graph", obj.stacks_size))
+        links = [
+            (reverse("admin:monitoring_requestprofile_download", args=[obj.pk, kind]), label)
+            for kind, label, present in formats
+            if present
+        ]
+        return format_html_join(" | ", '<a href="{}">{}</a>', links) or format_html("<em>{}</em>", "empty")
+
+    def download(self, request, profile_id, kind):
+        profile = get_object_or_404(RequestProfile, pk=profile_id)
+        if not self.has_view_permission(request, profile):
+            raise Http404
+        if kind == "pstats":
+            response = HttpResponse(bytes(profile.pstats), content_type="application/octet-stream")
+        elif kind == "folded":
+            response = HttpResponse(profile.collapsed_stacks, content_type="text/plain; charset=utf-8")
+        else:
+            raise Http404
+        response["Content-Disposition"] = f'attachment; filename="profile-{profile.pk}.{kind}"'
+        return response
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
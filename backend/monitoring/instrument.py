@@ -0,0 +1,38 @@
+"""Time DRF serialization without touching every view.
+
+``install()`` wraps the ``data`` property of DRF's ``Serializer`` and
+``ListSerializer`` so the outermost ``.data`` access in a request adds its
+duration (including any queries it triggers) to the request's stats.
+"""
+
+import functools
+import time
+
+from rest_framework.serializers import ListSerializer, Serializer
+
+from . import stats
+
+
+def _timed(getter):
+    @functools.wraps(getter)
+    def data(self):
+        request_stats = stats.current()
+        if request_stats is None or request_stats.serializer_depth:
+            return getter(self)
+        request_stats.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return getter(self)
+        finally:
+            request_stats.serializer_depth -= 1
+            request_stats.serializer_time += time.perf_counter() - start
+
+    data.timed = True
+    return data
+
+
+def install():
+    for serializer_class in (Serializer, ListSerializer):
+        getter = serializer_class.data.fget
+        if not getattr(getter, "timed", False):
+            serializer_class.data = property(_timed(getter))
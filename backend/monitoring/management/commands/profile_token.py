@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from monitoring.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = "Print a signed token; requests sending it as X-Profile-Token are profiled."
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_token())
+        self.stderr.write(f"Valid for {settings.PROFILE_TOKEN_MAX_AGE} seconds.")
@@ -0,0 +1,89 @@
+"""In-process request metrics, exported in the Prometheus text format.
+
+Histograms are kept per view (URL name) in this process only; with several
+worker processes, scrape each one or aggregate in Prometheus. Updating a
+histogram is a bisect and a few integer increments under a lock.
+"""
+
+import threading
+from bisect import bisect_left
+
+# Upper bounds, in seconds, for request, database and serializer time.
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        """``(le, cumulative count)`` pairs, ending with ``+Inf``."""
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    METRICS = {
+        "http_request_duration_seconds": ("Time spent handling the request.", TIME_BUCKETS),
+        "http_request_db_duration_seconds": ("Time spent in database queries.", TIME_BUCKETS),
+        "http_request_db_queries": ("Database queries executed.", QUERY_BUCKETS),
+        "http_request_serializer_duration_seconds": ("Time spent serializing response data.", TIME_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._responses = {}
+
+    def observe(self, view, method, status, stats, duration):
+        values = {
+            "http_request_duration_seconds": duration,
+            "http_request_db_duration_seconds": stats.db_time,
+            "http_request_db_queries": stats.queries,
+            "http_request_serializer_duration_seconds": stats.serializer_time,
+        }
+        with self._lock:
+            for name, value in values.items():
+                histogram = self._histograms.get((name, view))
+                if histogram is None:
+                    histogram = self._histograms[(name, view)] = Histogram(self.METRICS[name][1])
+                histogram.observe(value)
+            key = (view, method, f"{status // 100}xx")
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._responses.clear()
+
+    def render(self, extra=()):
+        """The Prometheus text exposition of every metric, plus ``extra`` ``(name, help, type, value)`` rows."""
+        lines = []
+        with self._lock:
+            lines += ["# HELP http_responses_total Responses sent.", "# TYPE http_responses_total counter"]
+            for (view, method, status), count in sorted(self._responses.items()):
+                lines.append(f'http_responses_total{{view="{view}",method="{method}",status="{status}"}} {count}')
+            for name, (description, _) in self.METRICS.items():
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+                for (metric, view), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in histogram.samples():
+                        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{view="{view}"}} {sum(histogram.counts)}')
+        for name, description, kind, value in extra:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
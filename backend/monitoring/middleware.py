@@ -0,0 +1,97 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import profiling, slow_queries, stats
+from .metrics import registry
+
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+class PerformanceMiddleware:
+    """Measure each request's total, database and serializer time.
+
+    The numbers go into per-view histograms served by the metrics endpoint and,
+    for staff or with DEBUG on, out in a ``Server-Timing`` header. Keep it first
+    in MIDDLEWARE so the total covers the rest of the stack.
+
+    A streaming response is measured up to the point it is returned: the
+    queries and time spent producing its body afterwards are not counted.
+    """
+
+    def __init__(self, get_response):
+        if not settings.MONITORING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_stats = stats.RequestStats()
+        token = stats.activate(request_stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as wrappers:
+                for alias in connections:
+                    wrappers.enter_context(connections[alias].execute_wrapper(_QueryTimer(request_stats, alias)))
+                response = self.get_response(request)
+        finally:
+            stats.deactivate(token)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        method = request.method if request.method in METHODS else "OTHER"
+        registry.observe(view, method, response.status_code, request_stats, duration)
+        if settings.DEBUG or getattr(getattr(request, "user", None), "is_staff", False):
+            response["Server-Timing"] = request_stats.server_timing(duration)
+        if request_stats.slow_queries:
+            slow_queries.save(request_stats.slow_queries, request, view)
+        return response
+
+
+class _QueryTimer:
+    def __init__(self, request_stats, alias):
+        self.stats = request_stats
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stats.db_time += elapsed
+            self.stats.queries += 1
+            if slow_queries.is_slow(elapsed):
+                self.stats.slow_queries.append(
+                    slow_queries.Candidate(self.alias, sql, params, many, elapsed, slow_queries.stack_summary())
+                )
+
+
+class ProfilerMiddleware:
+    """Profile the requests that ask for it (see ``monitoring.profiling``).
+
+    Place it after AuthenticationMiddleware so admin sessions count as staff.
+    The response names the stored profile in ``X-Profile-Id``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wanted, user = profiling.requested_by(request)
+        if not wanted:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with profiling.RequestProfiler() as profiler:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        profile = profiler.save(request, response, match.view_name if match else "unmatched", user, duration)
+        if profile is not None:
+            response["X-Profile-Id"] = str(profile.pk)
+        return response
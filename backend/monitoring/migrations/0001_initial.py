@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SlowQuery",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("database", models.CharField(max_length=50)),
+                ("view", models.CharField(max_length=200)),
+                ("method", models.CharField(max_length=10)),
+                ("path", models.CharField(max_length=500)),
+                ("duration_ms", models.FloatField()),
+                ("sql", models.TextField()),
+                ("params", models.TextField(blank=True)),
+                ("stack", models.TextField(blank=True)),
+                ("plan", models.TextField(blank=True)),
+            ],
+            options={
+                "verbose_name_plural": "slow queries",
+                "ordering": ["-id"],
+            },
+        ),
+    ]
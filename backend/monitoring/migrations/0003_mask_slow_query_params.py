@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:10
+
+from django.db import migrations
+
+
+def forget_param_values(apps, schema_editor):
+    """Rows logged before parameters were masked hold their values; drop them."""
+    SlowQuery = apps.get_model("monitoring", "SlowQuery")
+    SlowQuery.objects.update(params="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0002_requestprofile"),
+    ]
+
+    operations = [
+        migrations.RunPython(forget_param_values, migrations.RunPython.noop),
+    ]
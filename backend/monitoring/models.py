@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db import models
+
+
+class SlowQuery(models.Model):
+    """A sampled SQL statement that took longer than SLOW_QUERY_THRESHOLD_MS.
+
+    The table is a ring buffer: recording a query trims everything older than
+    the newest SLOW_QUERY_LOG_SIZE rows.
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    database = models.CharField(max_length=50)
+    view = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    duration_ms = models.FloatField()
+    sql = models.TextField()
+    params = models.TextField(blank=True)
+    stack = models.TextField(blank=True)
+    plan = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-id"]
+        verbose_name_plural = "slow queries"
+
+    def __str__(self):
+        return f"{self.duration_ms:.0f} ms in {self.view}"
+
+
+class RequestProfile(models.Model):
+    """cProfile statistics and sampled stacks of one request profiled on demand.
+
+    Only the newest PROFILE_MAX_COUNT profiles are kept, each capped at
+    PROFILE_MAX_BYTES per format.
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    view = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    samples = models.PositiveIntegerField()
+    pstats = models.BinaryField(blank=True)
+    collapsed_stacks = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-id"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
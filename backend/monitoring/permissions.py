@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.utils.crypto import constant_time_compare
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.permissions import BasePermission
+
+METRICS_TOKEN = "metrics-token"
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """Accept ``Authorization: Bearer <METRICS_TOKEN>`` for scrapers; anything else falls through to JWT."""
+
+    def authenticate(self, request):
+        expected = settings.METRICS_TOKEN
+        parts = get_authorization_header(request).split()
+        if not expected or len(parts) != 2 or parts[0].lower() != b"bearer":
+            return None
+        if not constant_time_compare(parts[1], expected.encode()):
+            return None
+        return AnonymousUser(), METRICS_TOKEN
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
+
+
+class IsStaffOrMetricsToken(BasePermission):
+    def has_permission(self, request, view):
+        return request.auth == METRICS_TOKEN or bool(request.user and request.user.is_staff)
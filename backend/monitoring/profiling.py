@@ -0,0 +1,171 @@
+"""Profile single requests on demand.
+
+A request is profiled when it carries ``X-Profile: 1`` and comes from a staff
+user (admin session or JWT), or when it carries a valid ``X-Profile-Token``
+made by the ``profile_token`` command. Other requests pay only for a header
+lookup.
+
+Each profile holds cProfile statistics (a ``pstats`` file) and the request
+thread's call stacks sampled every PROFILE_SAMPLE_INTERVAL_MS, in the
+collapsed format flame graph tools read (``flamegraph.pl``, speedscope).
+"""
+
+import cProfile
+import io
+import logging
+import marshal
+import os
+import sys
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.db import DatabaseError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .models import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SALT = "monitoring.profile"
+TOKEN_VALUE = "profile"
+LIBRARY_MARKERS = ("site-packages", "dist-packages")
+
+
+def make_token():
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(TOKEN_VALUE)
+
+
+def _valid_token(token):
+    try:
+        value = signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return value == TOKEN_VALUE
+
+
+def _staff_user(request):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user if user.is_staff else None
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+    if authenticated and authenticated[0].is_staff:
+        return authenticated[0]
+    return None
+
+
+def requested_by(request):
+    """``(wanted, user)``: whether to profile ``request`` and the staff user who asked, if any."""
+    token = request.headers.get("X-Profile-Token")
+    if token:
+        return _valid_token(token), None
+    if request.headers.get("X-Profile"):
+        user = _staff_user(request)
+        return user is not None, user
+    return False, None
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    for marker in LIBRARY_MARKERS:
+        if marker in filename:
+            filename = filename.split(marker, 1)[1].lstrip(os.sep)
+            break
+    else:
+        if filename.startswith(str(settings.BASE_DIR)):
+            filename = os.path.relpath(filename, settings.BASE_DIR)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """Sample one thread's Python stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)  # pylint: disable=protected-access
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self, limit):
+        """The most frequent stacks, one ``stack count`` line each, within ``limit`` bytes."""
+        lines, size = [], 0
+        for stack, count in self.stacks.most_common():
+            line = f"{stack} {count}\n"
+            size += len(line.encode())
+            if size > limit:
+                break
+            lines.append(line)
+        return "".join(lines)
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+
+    def __enter__(self):
+        self.sampler.start()
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one cProfile at a time; concurrent profiles keep only their samples.
+            self.profile = None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.disable()
+        self.sampler.stop()
+
+    def pstats_bytes(self):
+        """The profile in the binary format ``pstats.Stats`` loads (what ``dump_stats`` writes)."""
+        if self.profile is None:
+            return b""
+        self.profile.create_stats()
+        buffer = io.BytesIO()
+        marshal.dump(self.profile.stats, buffer)
+        return buffer.getvalue()
+
+    def save(self, request, response, view, user, duration):
+        """Store the profile and trim old ones; returns the saved ``RequestProfile`` or None."""
+        limit = settings.PROFILE_MAX_BYTES
+        pstats = self.pstats_bytes()
+        try:
+            profile = RequestProfile.objects.create(
+                view=view,
+                method=request.method[:10],
+                path=request.get_full_path()[:500],
+                status_code=response.status_code,
+                user=user,
+                duration_ms=round(duration * 1000, 3),
+                samples=sum(self.sampler.stacks.values()),
+                # A profile too big for the cap keeps only its flame graph.
+                pstats=pstats if len(pstats) <= limit else b"",
+                collapsed_stacks=self.sampler.collapsed(limit),
+            )
+            RequestProfile.objects.filter(id__lte=profile.id - settings.PROFILE_MAX_COUNT).delete()
+        except DatabaseError:
+            logger.exception("Could not store the profile of %s", view)
+            return None
+        return profile
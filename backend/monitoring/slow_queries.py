@@ -0,0 +1,103 @@
+"""Capture and store slow SQL statements seen while handling requests.
+
+The query timer in ``PerformanceMiddleware`` hands over statements that ran
+longer than the threshold (subject to sampling) together with a summary of
+the application frames that issued them. Once the response is ready they are
+EXPLAINed and written to ``SlowQuery``, outside the view's own transactions.
+
+Parameter values can be personal data (phone numbers, messages, tokens), so
+only their types are stored; the SQL keeps its placeholders.
+"""
+
+import logging
+import os
+import random
+import traceback
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from .models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+# Frames from these paths say nothing about which of our code ran the query.
+LIBRARY_PATHS = ("site-packages", "dist-packages", "/lib/python")
+MONITORING_PATH = os.path.dirname(os.path.abspath(__file__))
+MAX_PARAMS_LENGTH = 2000
+STACK_DEPTH = 8
+
+
+@dataclass
+class Candidate:
+    database: str
+    sql: str
+    params: object
+    many: bool
+    duration: float
+    stack: str
+
+
+def mask(params, many=False):
+    """Describe ``params`` without their values, e.g. ``(int, str, NoneType)``."""
+    if many:
+        return f"{len(params)} parameter sets" if hasattr(params, "__len__") else "parameter sets"
+    if params is None:
+        return ""
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{key!r}: {type(value).__name__}" for key, value in params.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in params) + ")"
+
+
+def is_slow(duration):
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if not threshold or duration * 1000 < threshold:
+        return False
+    return random.random() < settings.SLOW_QUERY_SAMPLE_RATE
+
+
+def stack_summary():
+    frames = [
+        frame
+        for frame in traceback.extract_stack()[:-2]
+        if not any(part in frame.filename for part in LIBRARY_PATHS) and not frame.filename.startswith(MONITORING_PATH)
+    ]
+    return "\n".join(f"{frame.filename}:{frame.lineno} in {frame.name}" for frame in frames[-STACK_DEPTH:])
+
+
+def explain(candidate):
+    if candidate.many or not candidate.sql.lstrip().upper().startswith(EXPLAINABLE):
+        return ""
+    connection = connections[candidate.database]
+    prefix = "EXPLAIN QUERY PLAN" if connection.vendor == "sqlite" else "EXPLAIN"
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {candidate.sql}", candidate.params)
+            return "\n".join(str(row[-1]) if connection.vendor == "sqlite" else str(row[0]) for row in cursor)
+    except DatabaseError as exc:
+        return f"EXPLAIN failed: {exc}"
+
+
+def save(candidates, request, view):
+    """Store ``candidates`` and trim the log; never lets a logging failure break the response."""
+    try:
+        rows = [
+            SlowQuery(
+                database=candidate.database,
+                view=view,
+                method=request.method[:10],
+                path=request.get_full_path()[:500],
+                duration_ms=round(candidate.duration * 1000, 3),
+                sql=candidate.sql,
+                params=mask(candidate.params, candidate.many)[:MAX_PARAMS_LENGTH],
+                stack=candidate.stack,
+                plan=explain(candidate),
+            )
+            for candidate in candidates
+        ]
+        newest = SlowQuery.objects.bulk_create(rows)[-1]
+        SlowQuery.objects.filter(id__lte=newest.id - settings.SLOW_QUERY_LOG_SIZE).delete()
+    except DatabaseError:
+        logger.exception("Could not record slow queries for %s", view)
@@ -0,0 +1,37 @@
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+_current = ContextVar("request_stats", default=None)
+
+
+@dataclass
+class RequestStats:
+    """What one request spent its time on; filled in while the request runs."""
+
+    queries: int = 0
+    db_time: float = 0.0
+    serializer_time: float = 0.0
+    # Nesting depth of timed serializer calls, so nested ``.data`` is counted once.
+    serializer_depth: int = 0
+    # Sampled statements over the slow-query threshold, saved after the response.
+    slow_queries: list = field(default_factory=list)
+
+    def server_timing(self, total):
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f"ser;dur={self.serializer_time * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}"
+        )
+
+
+def current():
+    """Stats of the request being handled in this context, or None outside a request."""
+    return _current.get()
+
+
+def activate(stats):
+    return _current.set(stats)
+
+
+def deactivate(token):
+    _current.reset(token)
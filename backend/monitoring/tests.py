@@ -0,0 +1,206 @@
+import itertools
+import os
+import pstats
+import re
+import tempfile
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from waste_management.models import WasteListing
+from . import profiling, slow_queries
+from .metrics import registry
+from .models import RequestProfile, SlowQuery
+
+_phones = itertools.count(750000000)
+
+
+def make_user(username, **fields):
+    return User.objects.create(
+        username=username, phone=f"0{next(_phones)}", role="waste_generator", location="Nairobi", **fields
+    )
+
+
+class PerformanceMiddlewareTests(APITestCase):
+    def setUp(self):
+        registry.reset()
+        self.user = make_user("seller")
+        WasteListing.objects.create(
+            title="Clean PET bottles",
+            description="Washed plastic bottles",
+            type="plastic",
+            quantity=50,
+            location="Westlands",
+            price_per_unit="12.50",
+            user=self.user,
+        )
+
+    def test_server_timing_header(self):
+        staff = make_user("operator", is_staff=True)
+        self.client.force_authenticate(staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/waste/listings/my/")
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", ser;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertIn(f'"{len(queries)} queries"', timing)
+
+    def test_server_timing_is_for_staff_or_debug(self):
+        self.client.force_authenticate(self.user)
+        self.assertNotIn("Server-Timing", self.client.get("/api/waste/listings/my/"))
+        self.client.force_authenticate(None)
+        self.assertNotIn("Server-Timing", self.client.get("/api/waste/listings/"))
+        self.client.force_authenticate(self.user)
+        with override_settings(DEBUG=True):
+            self.assertIn("Server-Timing", self.client.get("/api/waste/listings/my/"))
+
+    def test_histograms_per_view(self):
+        self.client.force_authenticate(self.user)
+        self.client.get("/api/waste/listings/my/")
+        self.client.get("/api/waste/listings/my/")
+        self.client.get("/api/no-such-page/")
+        text = registry.render()
+        self.assertIn('http_request_duration_seconds_count{view="my-listings"} 2', text)
+        self.assertIn('http_responses_total{view="my-listings",method="GET",status="2xx"} 2', text)
+        self.assertIn('http_responses_total{view="unmatched",method="GET",status="4xx"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="my-listings",le="+Inf"} 2', text)
+        serializer_sum = re.search(r'http_request_serializer_duration_seconds_sum\{view="my-listings"\} ([\d.]+)', text)
+        self.assertGreater(float(serializer_sum.group(1)), 0)
+
+    def test_metrics_require_staff_or_token(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 401)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+
+        staff = make_user("staff", is_staff=True)
+        self.client.force_authenticate(staff)
+        response = self.client.get("/api/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn("listing_feed_cache_hits_total", response.content.decode())
+
+    @override_settings(METRICS_TOKEN="scrape-me")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+        response = self.client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer scrape-me")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("# TYPE http_request_db_queries histogram", response.content.decode())
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_SAMPLE_RATE=1.0)
+class SlowQueryLogTests(APITestCase):
+    def setUp(self):
+        self.user = make_user("seller")
+        self.client.force_authenticate(self.user)
+
+    def test_slow_queries_are_logged_with_plan_and_stack(self):
+        self.client.get("/api/waste/listings/my/?page=1")
+        logged = SlowQuery.objects.filter(view="my-listings", sql__contains="waste_management_wastelisting")
+        self.assertTrue(logged.exists())
+        entry = logged.first()
+        self.assertEqual(entry.method, "GET")
+        self.assertEqual(entry.path, "/api/waste/listings/my/?page=1")
+        self.assertRegex(entry.params, r"^\((int|str)(, (int|str))*\)$")
+        self.assertIn("%s", entry.sql)
+        self.assertEqual(slow_queries.mask(["0712345678", 3, None]), "(str, int, NoneType)")
+        self.assertEqual(slow_queries.mask([("a",), ("b",)], many=True), "2 parameter sets")
+        self.assertIn("waste_management_wastelisting", entry.plan)
+        self.assertIn("waste_management/views.py", entry.stack)
+        self.assertNotIn("site-packages", entry.stack)
+
+    @override_settings(SLOW_QUERY_LOG_SIZE=3)
+    def test_log_keeps_only_the_newest_entries(self):
+        for _ in range(3):
+            self.client.get("/api/waste/listings/my/")
+        newest = SlowQuery.objects.order_by("-id").first()
+        self.assertEqual(SlowQuery.objects.count(), 3)
+        ids = list(SlowQuery.objects.values_list("id", flat=True))
+        self.assertEqual(ids, [newest.id, newest.id - 1, newest.id - 2])
+
+    @override_settings(SLOW_QUERY_SAMPLE_RATE=0.0)
+    def test_sampling(self):
+        self.client.get("/api/waste/listings/my/")
+        self.assertFalse(SlowQuery.objects.exists())
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_disabled(self):
+        self.client.get("/api/waste/listings/my/")
+        self.assertFalse(SlowQuery.objects.exists())
+
+
+@override_settings(PROFILE_SAMPLE_INTERVAL_MS=0.5)
+class ProfilerTests(APITestCase):
+    def setUp(self):
+        self.user = make_user("seller")
+        self.staff = make_user("staff", is_staff=True)
+
+    def get(self, user=None, **headers):
+        if user is not None:
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {AccessToken.for_user(user)}"
+        return self.client.get("/api/waste/listings/my/", **headers)
+
+    def test_staff_can_profile_a_request(self):
+        response = self.get(self.staff, HTTP_X_PROFILE="1")
+        profile = RequestProfile.objects.get(pk=response["X-Profile-Id"])
+        self.assertEqual(profile.user, self.staff)
+        self.assertEqual(profile.view, "my-listings")
+        stats = pstats.Stats(self.dump(profile.pstats))
+        self.assertTrue(any(name == "my_listings" for _, _, name in stats.stats))
+
+    def test_collapsed_stacks(self):
+        profile = RequestProfile.objects.get(pk=self.get(self.staff, HTTP_X_PROFILE="1")["X-Profile-Id"])
+        for line in profile.collapsed_stacks.splitlines():
+            self.assertRegex(line, r"^\S.* \d+$")
+
+    def test_other_users_are_not_profiled(self):
+        self.assertNotIn("X-Profile-Id", self.get(self.user, HTTP_X_PROFILE="1"))
+        self.assertNotIn("X-Profile-Id", self.get(HTTP_X_PROFILE="1"))
+        self.assertNotIn("X-Profile-Id", self.get(self.staff))
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_signed_token(self):
+        self.assertNotIn("X-Profile-Id", self.get(self.user, HTTP_X_PROFILE_TOKEN="forged"))
+        response = self.get(self.user, HTTP_X_PROFILE_TOKEN=profiling.make_token())
+        self.assertIsNone(RequestProfile.objects.get(pk=response["X-Profile-Id"]).user)
+
+    @override_settings(PROFILE_MAX_COUNT=2, PROFILE_MAX_BYTES=200)
+    def test_profiles_are_capped(self):
+        for _ in range(3):
+            self.get(self.staff, HTTP_X_PROFILE="1")
+        self.assertEqual(RequestProfile.objects.count(), 2)
+        for profile in RequestProfile.objects.all():
+            self.assertLessEqual(len(profile.pstats), 200)
+            self.assertLessEqual(len(profile.collapsed_stacks.encode()), 200)
+
+    def test_admin_download(self):
+        profile_id = self.get(self.staff, HTTP_X_PROFILE="1")["X-Profile-Id"]
+        admin = make_user("admin", is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        changelist = self.client.get("/admin/monitoring/requestprofile/")
+        self.assertContains(changelist, f"/admin/monitoring/requestprofile/{profile_id}/download/pstats/")
+        response = self.client.get(f"/admin/monitoring/requestprofile/{profile_id}/download/pstats/")
+        self.assertEqual(response["Content-Disposition"], f'attachment; filename="profile-{profile_id}.pstats"')
+        pstats.Stats(self.dump(response.content))
+        self.client.force_login(self.user)
+        response = self.client.get(f"/admin/monitoring/requestprofile/{profile_id}/download/pstats/")
+        self.assertEqual(response.status_code, 302)
+
+    def dump(self, data):
+        path = os.path.join(self.tmp, "profile.pstats")
+        with open(path, "wb") as output:
+            output.write(bytes(data))
+        return path
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.tmp = cls._tmp.name
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp.cleanup()
+        super().tearDownClass()
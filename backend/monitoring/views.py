@@ -0,0 +1,21 @@
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from waste_management import cache
+from .metrics import registry
+from .permissions import IsStaffOrMetricsToken, MetricsTokenAuthentication
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@api_view(["GET"])
+@authentication_classes([MetricsTokenAuthentication, JWTAuthentication])
+@permission_classes([IsStaffOrMetricsToken])
+def metrics(request):
+    feed = cache.stats.snapshot()
+    extra = [
+        ("listing_feed_cache_hits_total", "Listing feed responses served from cache.", "counter", feed["hits"]),
+        ("listing_feed_cache_misses_total", "Listing feed responses built by a query.", "counter", feed["misses"]),
+    ]
+    return HttpResponse(registry.render(extra), content_type=PROMETHEUS_CONTENT_TYPE)
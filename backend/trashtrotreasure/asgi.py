@@ -0,0 +1,21 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "trashtrotreasure.settings")
+
+# Initialise Django before importing anything that touches models.
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402  pylint: disable=wrong-import-position
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402  pylint: disable=wrong-import-position
+
+from messaging.auth import JWTAuthMiddleware  # noqa: E402  pylint: disable=wrong-import-position
+from messaging.routing import websocket_urlpatterns  # noqa: E402  pylint: disable=wrong-import-position
+
+application = ProtocolTypeRouter(
+    {
+        "http": django_asgi_app,
+        "websocket": AllowedHostsOriginValidator(JWTAuthMiddleware(URLRouter(websocket_urlpatterns))),
+    }
+)
@@ -0,0 +1,105 @@
+"""Conditional GET (ETag / Last-Modified) for read endpoints.
+
+A view supplies *validators* computed from a cheap aggregate query instead of
+the serialized body, so an unchanged resource is answered with ``304 Not
+Modified`` without serializing (or fetching) any rows.
+
+Function views::
+
+    @api_view(["GET"])
+    @permission_classes([IsAuthenticated])
+    @conditional(lambda request: queryset_validators(request, Thing.objects.filter(user=request.user)))
+    def my_things(request): ...
+
+Collections get an ETag only: deleting a row changes no remaining timestamp,
+so a ``Last-Modified`` taken from them would let ``If-Modified-Since`` answer
+304 for a list that lost rows. Single objects also send ``Last-Modified``.
+"""
+
+import functools
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+SAFE_METHODS = ("GET", "HEAD")
+
+
+@dataclass(frozen=True)
+class Validators:
+    etag: str
+    # Leave unset when a change can happen without bumping any timestamp
+    # (a deletion, an ``update()`` of a flag), so If-Modified-Since is never trusted.
+    last_modified: datetime | None = None
+
+
+def make_etag(request, *parts):
+    """Hash ``parts`` together with the full URL and the requesting user."""
+    user_id = getattr(request.user, "pk", None)
+    raw = repr((request.get_full_path(), user_id, parts))
+    return quote_etag(hashlib.sha1(raw.encode(), usedforsecurity=False).hexdigest())
+
+
+def queryset_validators(request, queryset, modified=("updated_at",), **aggregates):
+    """An ETag from one aggregate query: row count, the newest of the ``modified`` fields and any extra
+    ``aggregates``.
+
+    Pass ``modified=()`` when rows can change without touching a timestamp;
+    the ETag then relies on the extra aggregates alone.
+    """
+    aggregates["count"] = Count("pk", distinct=True)
+    for index, field in enumerate(modified):
+        aggregates[f"modified_{index}"] = Max(field)
+    values = queryset.order_by().aggregate(**aggregates)
+    return Validators(etag=make_etag(request, sorted(values.items())))
+
+
+def object_validators(request, obj, last_modified="updated_at"):
+    """Validators for a single already-loaded object; costs no query."""
+    timestamp = getattr(obj, last_modified)
+    return Validators(etag=make_etag(request, obj.pk, timestamp), last_modified=timestamp)
+
+
+def evaluate(request, validators):
+    """Return a 304/412 response if the request's preconditions say so, else None."""
+    last_modified = int(validators.last_modified.timestamp()) if validators.last_modified else None
+    response = get_conditional_response(request, etag=validators.etag, last_modified=last_modified)
+    if response is not None:
+        apply_headers(response, validators)
+    return response
+
+
+def apply_headers(response, validators):
+    if response.status_code not in (200, 304):
+        return response
+    response["ETag"] = validators.etag
+    if validators.last_modified:
+        response["Last-Modified"] = http_date(validators.last_modified.timestamp())
+    # Make browsers revalidate every time so the 304 path is actually used.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional(get_validators):
+    """Decorate an ``@api_view`` function; ``get_validators(request, *args, **kwargs)`` returns ``Validators``.
+
+    Place it directly on the function, under ``@api_view`` and ``@permission_classes``.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return view(request, *args, **kwargs)
+            validators = get_validators(request, *args, **kwargs)
+            response = evaluate(request, validators)
+            if response is None:
+                response = apply_headers(view(request, *args, **kwargs), validators)
+            return response
+
+        return wrapped
+
+    return decorator
@@ -0,0 +1,215 @@
+"""Sparse fieldsets: ``?fields=`` and ``?expand=`` for read endpoints.
+
+``?fields=id,title,price_per_unit,images.image`` keeps only the named fields;
+a dotted name picks fields of a nested object (and implies expanding it), a
+plain relation name keeps the whole nested object. ``?expand=listing`` lists
+the nested objects to embed: when given, every other nested object is reduced
+to its primary key (or a list of them). Without either parameter responses
+are unchanged.
+
+The same selection narrows the query: only the needed columns are loaded
+(``.only()``), and relations that are not rendered are neither joined nor
+prefetched. Views use it as::
+
+    fieldset = FieldSet.from_request(request, ThingSerializer)
+    things = narrow(Thing.objects.all(), fieldset)
+    ThingSerializer(things, many=True, context={"fieldset": fieldset})
+
+Serializers opt in with ``SparseFieldsMixin``, which trims their fields
+(including nested serializers') from the ``fieldset`` in their context.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import relations, serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_QUERY_PARAM = "fields"
+EXPAND_QUERY_PARAM = "expand"
+CONTEXT_KEY = "fieldset"
+
+
+def _names(value):
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def _nested(field):
+    """The serializer rendering each related object of ``field``, if it embeds one."""
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    return field if isinstance(field, serializers.Serializer) else None
+
+
+def _paths(serializer, prefix=""):
+    """Every dotted field path of ``serializer``, mapped to whether it is a nested object."""
+    paths = {}
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        nested = _nested(field)
+        paths[prefix + name] = nested is not None
+        if nested is not None:
+            paths.update(_paths(nested, f"{prefix}{name}."))
+    return paths
+
+
+class FieldSet:
+    def __init__(self, serializer_class, fields=None, expand=None):
+        self.serializer_class = serializer_class
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request, serializer_class):
+        """The selection in ``request``'s query string, or None when it asks for everything."""
+        params = request.query_params
+        if FIELDS_QUERY_PARAM not in params and EXPAND_QUERY_PARAM not in params:
+            return None
+        fields = _names(params[FIELDS_QUERY_PARAM]) if FIELDS_QUERY_PARAM in params else None
+        expand = _names(params[EXPAND_QUERY_PARAM]) if EXPAND_QUERY_PARAM in params else None
+
+        paths = _paths(serializer_class())
+        errors = {}
+        unknown = sorted((fields or set()) - set(paths))
+        if unknown:
+            errors[FIELDS_QUERY_PARAM] = f"Unknown fields: {', '.join(unknown)}."
+        unknown = sorted(name for name in expand or () if not paths.get(name))
+        if unknown:
+            errors[EXPAND_QUERY_PARAM] = f"Not expandable: {', '.join(unknown)}."
+        if errors:
+            raise ValidationError(errors)
+        return cls(serializer_class, fields, expand)
+
+    def _below(self, names, path):
+        return any(name.startswith(f"{path}.") for name in names or ())
+
+    def selected(self, prefix, name):
+        """Whether field ``name`` of the object at ``prefix`` (``""`` or ``"listing."``) is rendered."""
+        if self.fields is None:
+            return True
+        # A nested object named without any of its fields keeps all of them.
+        if prefix and not self._below(self.fields, prefix[:-1]):
+            return True
+        path = prefix + name
+        return path in self.fields or self._below(self.fields, path)
+
+    def expanded(self, path):
+        if self.expand is None or path in self.expand or self._below(self.expand, path):
+            return True
+        return self._below(self.fields, path)
+
+    def apply(self, prefix, fields):
+        """Trim the ``fields`` of the serializer at ``prefix``, collapsing unexpanded objects to keys."""
+        trimmed = {}
+        for name, field in fields.items():
+            if not self.selected(prefix, name):
+                continue
+            if _nested(field) is not None and not self.expanded(prefix + name):
+                source = field.source if field.source not in (None, name) else None
+                many = isinstance(field, serializers.ListSerializer)
+                field = relations.PrimaryKeyRelatedField(read_only=True, many=many, source=source)
+            trimmed[name] = field
+        return trimmed
+
+
+def _path(serializer):
+    names = []
+    while serializer.parent is not None:
+        if serializer.field_name:
+            names.append(serializer.field_name)
+        serializer = serializer.parent
+    return "".join(f"{name}." for name in reversed(names))
+
+
+class SparseFieldsMixin:
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.context.get(CONTEXT_KEY)
+        if fieldset is None:
+            return fields
+        return fieldset.apply(_path(self), fields)
+
+
+class _Plan:
+    def __init__(self):
+        self.only = set()
+        self.whole = set()
+        self.select = set()
+        self.prefetch = set()
+
+    def walk(self, fieldset, serializer, model, prefix="", lookup="", prefetched=False):
+        """Collect the columns and relations rendering ``serializer`` needs from ``model``.
+
+        ``lookup`` is the ORM path of ``model`` from the queryset (``"listing__"``);
+        below a prefetched relation only further prefetches are collected.
+        """
+        for name, field in serializer.fields.items():
+            if field.write_only or not fieldset.selected(prefix, name):
+                continue
+            try:
+                if len(field.source_attrs) != 1:
+                    raise FieldDoesNotExist
+                model_field = model._meta.get_field(field.source_attrs[0])
+            except FieldDoesNotExist:
+                # Method fields, dotted sources and properties may read anything on the
+                # instance; anything else is an annotation (distance_km, unread_count).
+                if not field.source_attrs or hasattr(model, field.source_attrs[0]):
+                    self.whole.add(lookup[:-2])
+                continue
+
+            path = lookup + model_field.name
+            nested = _nested(field)
+            many = model_field.many_to_many or model_field.one_to_many
+            if many or (prefetched and model_field.is_relation):
+                self.prefetch.add(path)
+                if nested is not None and fieldset.expanded(prefix + name):
+                    self.walk(fieldset, nested, model_field.related_model, f"{prefix}{name}.", f"{path}__", True)
+            elif prefetched:
+                continue
+            elif not model_field.is_relation or (nested is not None and not fieldset.expanded(prefix + name)):
+                # A forward relation rendered as a primary key is a column of this row.
+                self.only.add(path)
+            elif isinstance(field, relations.RelatedField) and field.use_pk_only_optimization():
+                self.only.add(path)
+            else:
+                self.only.add(path)
+                self.select.add(path)
+                if nested is None:
+                    # Rendered with ``__str__`` or the like: keep the whole related row.
+                    self.whole.add(path)
+                else:
+                    self.walk(fieldset, nested, model_field.related_model, f"{prefix}{name}.", f"{path}__")
+        return self
+
+    def columns(self):
+        """The ``.only()`` names, or None when the queryset's own model must be loaded whole."""
+        if "" in self.whole:
+            return None
+        # Naming a relation without any of its fields loads all of its columns.
+        return sorted(
+            name
+            for name in self.only
+            if not any(name.startswith(f"{whole}__") for whole in self.whole)
+        )
+
+
+def narrow(queryset, fieldset, keep=()):
+    """``queryset`` loading only what ``fieldset`` renders; ``keep`` adds fields pagination reads."""
+    if fieldset is None:
+        return queryset
+    plan = _Plan().walk(fieldset, fieldset.serializer_class(), queryset.model)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if plan.select:
+        queryset = queryset.select_related(*sorted(plan.select))
+    if plan.prefetch:
+        queryset = queryset.prefetch_related(*sorted(plan.prefetch))
+    columns = plan.columns()
+    if columns is None:
+        return queryset
+    # Deferred ordering fields would cost a query per row when paginators read them, and
+    # rows fetched through a related manager (``conversation.messages``) read their key.
+    related = [field.name for field in queryset._known_related_objects]  # pylint: disable=protected-access
+    for name in (*queryset.query.order_by, *queryset.model._meta.ordering, *keep, *related):
+        name = name.lstrip("-") if isinstance(name, str) else None
+        if name and name != "pk" and name not in queryset.query.annotations:
+            columns.append(name)
+    return queryset.only(*columns)
@@ -0,0 +1,173 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .streaming import ndjson_response, wants_ndjson
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over a unique compound ordering such as ``("-created_at", "-id")``.
+
+    Each page is fetched with a ``WHERE (created_at, id) < (...)`` range
+    condition instead of an ``OFFSET``, so deep pages cost the same as the
+    first one and rows inserted meanwhile never shift or duplicate results.
+    The last ordering field must be unique. ``?count=false`` skips the
+    ``COUNT(*)`` query.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, "true").lower() not in ("false", "0", "no"):
+            self.count = queryset.count()
+
+        ordering = [self._invert(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, ordering))
+
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = position is not None, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.next_position = self._position(rows[-1]) if has_next and rows else None
+        self.previous_position = self._position(rows[0]) if has_previous and rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        payload = {"next": self.get_next_link(), "previous": self.get_previous_link()}
+        if self.count is not None:
+            payload["count"] = self.count
+        payload["results"] = data
+        return Response(payload)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor(self.previous_position, reverse=True)
+        )
+
+    def encode_cursor(self, position, reverse=False):
+        values = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in position]
+        payload = json.dumps({"p": values, "r": int(reverse)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+            values = payload["p"]
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+            return position, bool(payload.get("r"))
+        except (binascii.Error, ValueError, TypeError, KeyError, AttributeError, DjangoValidationError) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+
+    def _position(self, obj):
+        return [getattr(obj, field.lstrip("-")) for field in self.ordering]
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def _after(position, ordering):
+        """Build ``(a, b, c) > (x, y, z)`` for the given per-field directions.
+
+        The redundant bound on the leading field gives the planner an index range.
+        """
+        first = ordering[0]
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            term = Q(**{f"{name}__{lookup}": position[index]})
+            for previous, value in zip(ordering[:index], position[:index]):
+                term &= Q(**{previous.lstrip("-"): value})
+            condition |= term
+        bound = "lte" if first.startswith("-") else "gte"
+        return Q(**{f"{first.lstrip('-')}__{bound}": position[0]}) & condition
+
+
+class PageOrKeysetPagination(BasePagination):
+    """Page-number pagination by default; keyset pagination with ``?pagination=cursor``.
+
+    Existing clients keep the ``?page=`` behaviour while infinite-scroll clients
+    opt in to cursors. Following a ``next``/``previous`` cursor link stays in
+    keyset mode. Cursors follow ``ordering`` only, so a queryset the view has
+    ordered otherwise (by search rank or distance) is refused in keyset mode
+    rather than silently re-sorted.
+    """
+
+    mode_query_param = "pagination"
+    ordering = KeysetPagination.ordering
+    unsupported_ordering_message = "Cursor pagination is not available for this ordering; use ?page= instead."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if params.get(self.mode_query_param) == "cursor" or KeysetPagination.cursor_query_param in params:
+            if queryset.query.order_by and tuple(queryset.query.order_by) != tuple(self.ordering):
+                raise ValidationError({self.mode_query_param: self.unsupported_ordering_message})
+            self.paginator = KeysetPagination()
+            self.paginator.ordering = self.ordering
+        else:
+            self.paginator = PageNumberPagination()
+        return self.paginator.paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+
+def paginated_response(request, queryset, serializer_class, pagination_class=PageNumberPagination, context=None):
+    """List response for ``@api_view`` functions: one page, or the whole result streamed as NDJSON."""
+    if wants_ndjson(request):
+        return ndjson_response(queryset, serializer_class, context=context)
+    paginator = pagination_class()
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True, context=context or {})
+    return paginator.get_paginated_response(serializer.data)
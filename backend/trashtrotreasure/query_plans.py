@@ -0,0 +1,49 @@
+"""Inspect SQLite query plans for the queries an endpoint runs.
+
+Used by the query-plan regression tests: ``capture_selects`` records the
+statements a request executes and ``plan_problems`` lists every full table or
+index scan and temporary B-tree sort SQLite chose for one of them.
+"""
+
+import re
+from contextlib import contextmanager
+
+from django.db import connections
+
+# Every "SCAN <table>" reads the whole table, or the whole index after
+# "USING [COVERING] INDEX"; only SEARCH plans use an index to narrow the rows.
+# Scans of a virtual (FTS) table or a materialized subquery are not counted.
+FULL_SCAN = re.compile(r"^SCAN (?!subquery|CONSTANT ROW|\()(?P<table>\S+)(?!.*\bVIRTUAL TABLE\b)")
+# Sorts for ORDER BY/GROUP BY/DISTINCT. "count(DISTINCT)" de-duplicates inside an
+# aggregate (the ETag validators) and is not a sort of the result.
+TEMP_BTREE = re.compile(r"USE TEMP B-TREE FOR (?!count\(DISTINCT\))")
+
+
+def explain(sql, params=(), using="default"):
+    """Return the ``detail`` column of ``EXPLAIN QUERY PLAN`` for one statement."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql, params=(), using="default", allow_sort=False):
+    """Full scans (and, unless ``allow_sort``, temp B-tree sorts) in the plan of ``sql``."""
+    problems = []
+    for detail in explain(sql, params, using):
+        if FULL_SCAN.search(detail) or (not allow_sort and TEMP_BTREE.search(detail)):
+            problems.append(detail)
+    return problems
+
+
+@contextmanager
+def capture_selects(using="default"):
+    """Collect ``(sql, params)`` for every SELECT run on ``using`` inside the block."""
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith("SELECT"):
+            statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connections[using].execute_wrapper(record):
+        yield statements
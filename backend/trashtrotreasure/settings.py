@@ -16,6 +16,7 @@ ALLOWED_HOSTS = ["localhost", "127.0.0.1", "0.0.0.0"]
 
 # Application definition
 INSTALLED_APPS = [
+    "daphne",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -28,15 +29,19 @@ INSTALLED_APPS = [
     "accounts",
     "waste_management",
     "messaging",
+    "benchmarks",
+    "monitoring",
 ]
 
 MIDDLEWARE = [
+    "monitoring.middleware.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "monitoring.middleware.ProfilerMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -60,6 +65,20 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "trashtrotreasure.wsgi.application"
+ASGI_APPLICATION = "trashtrotreasure.asgi.application"
+
+# Channel layer for WebSocket pushes. The in-memory layer only reaches sockets
+# served by the same process; multi-process deployments set CHANNEL_REDIS_URL.
+CHANNEL_REDIS_URL = config("CHANNEL_REDIS_URL", default="")
+if CHANNEL_REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [CHANNEL_REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
 
 # Database
 DATABASES = {
@@ -69,6 +88,63 @@ DATABASES = {
     }
 }
 
+# Caches. The listing feed gets its own bounded LRU cache; point FEED_CACHE_BACKEND
+# at a shared backend (e.g. django.core.cache.backends.redis.RedisCache) when
+# running several processes so they see each other's invalidations.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    "feed": {
+        "BACKEND": config("FEED_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("FEED_CACHE_LOCATION", default="listing-feed"),
+        "OPTIONS": {"MAX_ENTRIES": config("FEED_CACHE_MAX_ENTRIES", default=1000, cast=int)},
+    },
+}
+FEED_CACHE_ALIAS = "feed"
+FEED_CACHE_TIMEOUT = config("FEED_CACHE_TIMEOUT", default=300, cast=int)
+
+# A purchase holds its quantity for this long; `manage.py release_reservations`
+# (run it from cron) returns unconfirmed holds to the listing.
+PURCHASE_RESERVATION_MINUTES = config("PURCHASE_RESERVATION_MINUTES", default=30, cast=int)
+
+# Request metrics (Server-Timing header and /api/metrics/). Prometheus can scrape
+# the metrics endpoint with "Authorization: Bearer <METRICS_TOKEN>"; staff can
+# read it with their normal login.
+MONITORING_ENABLED = config("MONITORING_ENABLED", default=True, cast=bool)
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Statements slower than this (0 disables) are logged with their EXPLAIN output to
+# the SlowQuery admin, keeping the newest SLOW_QUERY_LOG_SIZE. Lower the sample
+# rate to log only a fraction of them on busy production servers.
+SLOW_QUERY_THRESHOLD_MS = config("SLOW_QUERY_THRESHOLD_MS", default=200, cast=float)
+SLOW_QUERY_SAMPLE_RATE = config("SLOW_QUERY_SAMPLE_RATE", default=1.0, cast=float)
+SLOW_QUERY_LOG_SIZE = config("SLOW_QUERY_LOG_SIZE", default=500, cast=int)
+
+# On-demand request profiles (send X-Profile: 1 as staff, or an X-Profile-Token
+# from `manage.py profile_token`), kept under Request profiles in the admin.
+PROFILE_MAX_COUNT = config("PROFILE_MAX_COUNT", default=50, cast=int)
+PROFILE_MAX_BYTES = config("PROFILE_MAX_BYTES", default=5 * 1024 * 1024, cast=int)
+PROFILE_SAMPLE_INTERVAL_MS = config("PROFILE_SAMPLE_INTERVAL_MS", default=5, cast=float)
+PROFILE_TOKEN_MAX_AGE = config("PROFILE_TOKEN_MAX_AGE", default=3600, cast=int)
+
+# Listing photos get thumb/card/full variants rendered by this many background
+# processes; IMAGE_VARIANTS_SYNC renders them inline instead (tests, scripts).
+IMAGE_VARIANT_WORKERS = config("IMAGE_VARIANT_WORKERS", default=2, cast=int)
+IMAGE_VARIANTS_SYNC = config("IMAGE_VARIANTS_SYNC", default=False, cast=bool)
+
+# Chunked image uploads: largest accepted file, where unfinished ones are kept
+# (outside MEDIA_ROOT, so they are never served) and how long an idle one lasts
+# before `manage.py clear_upload_sessions` removes it.
+IMAGE_UPLOAD_MAX_BYTES = config("IMAGE_UPLOAD_MAX_BYTES", default=10 * 1024 * 1024, cast=int)
+UPLOAD_SESSION_DIR = config("UPLOAD_SESSION_DIR", default=os.path.join(BASE_DIR, "upload_sessions"))
+UPLOAD_SESSION_HOURS = config("UPLOAD_SESSION_HOURS", default=24, cast=int)
+
+# Bulk listing imports over the API; larger files go through `manage.py import_listings`.
+IMPORT_MAX_ROWS = config("IMPORT_MAX_ROWS", default=5000, cast=int)
+IMPORT_MAX_BYTES = config("IMPORT_MAX_BYTES", default=5 * 1024 * 1024, cast=int)
+
 # Custom User Model
 AUTH_USER_MODEL = "accounts.User"
 
@@ -119,7 +195,10 @@ CORS_ALLOW_HEADERS = [
     "user-agent",
     "x-csrftoken",
     "x-requested-with",
+    "x-profile",
+    "x-profile-token",
 ]
+CORS_EXPOSE_HEADERS = ["server-timing", "x-cache", "x-profile-id"]
 
 # Internationalization
 LANGUAGE_CODE = "en-us"
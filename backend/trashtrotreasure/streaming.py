@@ -0,0 +1,90 @@
+import csv
+import io
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+CSV_CONTENT_TYPE = "text/csv; charset=utf-8"
+STREAM_QUERY_PARAM = "stream"
+DEFAULT_CHUNK_SIZE = 500
+# Spreadsheets evaluate cells starting with these as formulas (CSV injection).
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def wants_ndjson(request):
+    return request.query_params.get(STREAM_QUERY_PARAM) == "ndjson"
+
+
+def iter_serialized(queryset, serializer_class, chunk_size=DEFAULT_CHUNK_SIZE, context=None):
+    """Yield the serialized rows of ``queryset``, a list of ``chunk_size`` at a time.
+
+    Rows are read with a server-side ``.iterator()`` and serialized a chunk at
+    a time, so memory use does not grow with the size of the result.
+    """
+    batch = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        batch.append(obj)
+        if len(batch) >= chunk_size:
+            yield serializer_class(batch, many=True, context=context or {}).data
+            batch = []
+    if batch:
+        yield serializer_class(batch, many=True, context=context or {}).data
+
+
+def iter_ndjson(queryset, serializer_class, chunk_size=DEFAULT_CHUNK_SIZE, context=None):
+    """Yield one encoded chunk of newline-delimited JSON per ``chunk_size`` rows."""
+    encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    for rows in iter_serialized(queryset, serializer_class, chunk_size=chunk_size, context=context):
+        yield "".join(encoder.encode(row) + "\n" for row in rows).encode("utf-8")
+
+
+def csv_cell(value):
+    """``value`` for a CSV cell; text a spreadsheet would read as a formula is prefixed with ``'``."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def iter_csv(queryset, serializer_class, chunk_size=DEFAULT_CHUNK_SIZE, context=None):
+    """Yield a header line, then one encoded chunk of CSV per ``chunk_size`` rows.
+
+    The columns are the serializer's fields, which should all be flat values.
+    Text cells are escaped with ``csv_cell``.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    fields = [name for name, field in serializer_class().fields.items() if not field.write_only]
+    writer.writerow(fields)
+    yield flush()
+    for rows in iter_serialized(queryset, serializer_class, chunk_size=chunk_size, context=context):
+        writer.writerows([csv_cell(row.get(name)) for name in fields] for row in rows)
+        yield flush()
+
+
+def ndjson_response(queryset, serializer_class, chunk_size=DEFAULT_CHUNK_SIZE, context=None, filename=None):
+    response = StreamingHttpResponse(
+        iter_ndjson(queryset, serializer_class, chunk_size=chunk_size, context=context),
+        content_type=NDJSON_CONTENT_TYPE,
+    )
+    if filename:
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def csv_response(queryset, serializer_class, filename, chunk_size=DEFAULT_CHUNK_SIZE, context=None):
+    response = StreamingHttpResponse(
+        iter_csv(queryset, serializer_class, chunk_size=chunk_size, context=context),
+        content_type=CSV_CONTENT_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,9 +1,14 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.http import JsonResponse
 
+from waste_management.storage import PREFIX as CONTENT_ADDRESSED_PREFIX
+from waste_management.views import serve_blob
+
 
 def api_test_view(request):
     return JsonResponse(
@@ -31,6 +36,13 @@ urlpatterns = [
     path("api/auth/", include("accounts.urls")),
     path("api/waste/", include("waste_management.urls")),
     path("api/messaging/", include("messaging.urls")),
+    path("api/", include("monitoring.urls")),
+    # Content-addressed images, in every environment: immutable, so served with far-future cache headers.
+    re_path(
+        rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<name>{CONTENT_ADDRESSED_PREFIX}/.+)$",
+        serve_blob,
+        name="serve-blob",
+    ),
 ]
 
 # Serve media files during development
@@ -11,6 +11,7 @@ class WasteImageInline(admin.TabularInline):
 class WasteListingAdmin(admin.ModelAdmin):
     list_display = ("title", "type", "quantity", "unit", "price_per_unit", "status", "user", "created_at")
     list_filter = ("type", "status", "created_at")
+    list_select_related = ("user",)
     search_fields = ("title", "description", "location", "user__username")
     inlines = [WasteImageInline]
     readonly_fields = ("created_at", "updated_at")
@@ -28,6 +29,7 @@ class WasteListingAdmin(admin.ModelAdmin):
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ("listing", "buyer", "seller", "quantity", "total_amount", "status", "created_at")
     list_filter = ("status", "created_at")
+    list_select_related = ("listing__user", "buyer", "seller")
     search_fields = ("listing__title", "buyer__username", "seller__username", "payment_reference")
     readonly_fields = ("created_at", "updated_at")
 
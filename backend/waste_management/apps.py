@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WasteManagementConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "waste_management"
+
+    def ready(self):
+        from . import signals  # noqa: F401  pylint: disable=import-outside-toplevel,unused-import
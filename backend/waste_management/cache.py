@@ -0,0 +1,91 @@
+"""Response cache for the public listing feed.
+
+Entries are keyed on the normalized query string plus a feed *version*.
+Saving or deleting a listing or image bumps the version once the transaction
+commits, which orphans every cached page at once; orphans simply age out of
+the bounded cache. Hit/miss counters are per process.
+"""
+
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_KEY = "listing-feed:version"
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_ratio": round(hits / total, 4) if total else None}
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[settings.FEED_CACHE_ALIAS]
+
+
+def current_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted version can never recur and revive old entries.
+        cache.add(VERSION_KEY, time.time_ns() // 1_000_000, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump_version():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        current_version()
+
+
+def invalidate(using=None):
+    """Invalidate every cached feed page after the current transaction commits.
+
+    Call this after queryset ``update()``/``bulk_create()`` calls, which bypass the model signals.
+    """
+    transaction.on_commit(_bump_version, using=using)
+
+
+def key_for(request):
+    params = sorted(
+        (name, sorted(value for value in values if value))
+        for name, values in request.query_params.lists()
+        if any(values)
+    )
+    raw = f"{request.scheme}://{request.get_host()}{request.path}?{params}"
+    digest = hashlib.sha1(raw.encode(), usedforsecurity=False).hexdigest()
+    return f"listing-feed:{current_version()}:{digest}"
+
+
+def get(key):
+    data = get_cache().get(key)
+    stats.record(hit=data is not None)
+    return data
+
+
+def set(key, data):  # pylint: disable=redefined-builtin
+    get_cache().set(key, data, timeout=settings.FEED_CACHE_TIMEOUT)
@@ -0,0 +1,58 @@
+"""Exports of transactions and listings, streamed as CSV or NDJSON.
+
+Rows come from a single ``.iterator()`` over a queryset that joins the
+related rows in (``select_related``), and are serialized and encoded a chunk
+at a time by ``trashtrotreasure.streaming``, so an export of millions of rows
+runs in constant memory. Staff export every row; anyone else only their own
+listings and the transactions they bought or sold in.
+"""
+
+from django.utils import timezone
+
+from trashtrotreasure import streaming
+
+from .models import Transaction, WasteListing
+
+CHUNK_SIZE = 2000
+# Oldest first, so a partial export can be resumed with ``since``.
+ORDERING = ("created_at", "id")
+
+
+def _filtered(queryset, since=None, until=None, status=None):
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset
+
+
+def transactions(user=None, **filters):
+    """Transactions visible to ``user`` (all of them for staff or ``None``) matching ``filters``."""
+    queryset = _filtered(Transaction.objects.select_related("listing", "buyer", "seller"), **filters)
+    if user is None or user.is_staff:
+        return queryset.order_by(*ORDERING)
+    # Filtered before the union: the combined queryset takes no further changes.
+    return queryset.involving(user, ordering=ORDERING)
+
+
+def listings(user=None, **filters):
+    """Listings visible to ``user`` (all of them for staff or ``None``) matching ``filters``."""
+    queryset = _filtered(WasteListing.objects.select_related("user"), **filters)
+    if user is not None and not user.is_staff:
+        queryset = queryset.filter(user=user)
+    return queryset.order_by(*ORDERING)
+
+
+def encode(queryset, serializer_class, output):
+    """The export as an iterator of encoded chunks."""
+    iterate = streaming.iter_csv if output == "csv" else streaming.iter_ndjson
+    return iterate(queryset, serializer_class, chunk_size=CHUNK_SIZE)
+
+
+def response(queryset, serializer_class, output, name):
+    filename = f"{name}-{timezone.localdate():%Y%m%d}.{output}"
+    if output == "csv":
+        return streaming.csv_response(queryset, serializer_class, filename, chunk_size=CHUNK_SIZE)
+    return streaming.ndjson_response(queryset, serializer_class, chunk_size=CHUNK_SIZE, filename=filename)
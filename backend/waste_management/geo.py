@@ -0,0 +1,131 @@
+"""Geohash helpers backing the "near me" listing search.
+
+Listings store a geohash of their coordinates in an indexed column.  A radius
+query is turned into a small set of geohash cells covering the search circle's
+bounding box; each cell becomes an index range scan, and only the surviving
+rows are checked against the exact great-circle distance.
+"""
+
+import math
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+# Precision stored on each listing (~4.8m x 4.8m cells).
+GEOHASH_PRECISION = 9
+# Upper bound on the number of cells a single query may expand into.
+MAX_COVER_CELLS = 16
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """Return the (lat, lng) size in degrees of a geohash cell."""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return (min_lat, max_lat, min_lng, max_lng) enclosing the search circle."""
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    min_lat = max(latitude - lat_delta, -90.0)
+    max_lat = min(latitude + lat_delta, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat < 1e-6:
+        return min_lat, max_lat, -180.0, 180.0
+    lng_delta = min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+    return min_lat, max_lat, longitude - lng_delta, longitude + lng_delta
+
+
+def _cells_in_box(box, precision):
+    min_lat, max_lat, min_lng, max_lng = box
+    lat_step, lng_step = cell_size(precision)
+    lat_start = math.floor((min_lat + 90.0) / lat_step)
+    lat_end = math.floor((min(max_lat, 90.0 - 1e-9) + 90.0) / lat_step)
+    lng_start = math.floor((min_lng + 180.0) / lng_step)
+    lng_end = math.floor((max_lng + 180.0) / lng_step)
+    lng_span = int(360.0 / lng_step)
+    count = (lat_end - lat_start + 1) * min(lng_end - lng_start + 1, lng_span)
+    if count > MAX_COVER_CELLS:
+        return None
+
+    cells = set()
+    for lat_index in range(lat_start, lat_end + 1):
+        center_lat = -90.0 + (lat_index + 0.5) * lat_step
+        for lng_index in range(lng_start, lng_end + 1):
+            center_lng = -180.0 + ((lng_index % lng_span) + 0.5) * lng_step
+            cells.add(encode(center_lat, center_lng, precision))
+    return cells
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """Return the geohash prefixes covering the circle, as few and as fine as possible."""
+    box = bounding_box(latitude, longitude, radius_km)
+    best = {""}
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        cells = _cells_in_box(box, precision)
+        if cells is None:
+            break
+        best = cells
+    return sorted(best)
+
+
+def _successor(cell):
+    index = BASE32.index(cell[-1])
+    if index == len(BASE32) - 1:
+        return None
+    return cell[:-1] + BASE32[index + 1]
+
+
+def covering_ranges(latitude, longitude, radius_km):
+    """Return ``(start, stop)`` geohash ranges covering the circle.
+
+    Cells that are adjacent in sort order are merged so each range maps to a
+    single index range scan.  ``stop`` is exclusive; an empty list means the
+    circle is too large to narrow down.
+    """
+    ranges = []
+    previous = None
+    for cell in covering_cells(latitude, longitude, radius_km):
+        if not cell:
+            return []
+        if previous is not None and _successor(previous) == cell:
+            ranges[-1][1] = cell + "~"
+        else:
+            ranges.append([cell, cell + "~"])
+        previous = cell
+    return [tuple(r) for r in ranges]
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
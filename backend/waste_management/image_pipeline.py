@@ -0,0 +1,165 @@
+"""Generate listing image variants off the request path.
+
+Saving a ``WasteImage`` schedules its variants once the transaction commits;
+they are rendered in a process pool (``imaging.render_variants``) and stored
+in ``WasteImage.variants`` when done, so an upload never waits for encoding.
+With IMAGE_VARIANTS_SYNC they are rendered inline instead (tests, scripts).
+Variants are written next to the original on the local filesystem, so the
+default storage must be filesystem-backed. Variants of a content-addressed
+original are named after its digest and shared by every image using it, so a
+duplicate upload reuses them instead of rendering again.
+"""
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, close_old_connections, connections, transaction
+from django.utils import timezone
+
+from . import cache, imaging, storage
+from .models import WasteImage, WasteListing
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _make_executor(workers):
+    # Spawned, not forked: the web server's threads and open connections stay behind.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def get_executor():
+    global _executor  # pylint: disable=global-statement
+    with _executor_lock:
+        if _executor is None:
+            _executor = _make_executor(settings.IMAGE_VARIANT_WORKERS)
+        return _executor
+
+
+def _key(image):
+    return storage.digest_of(image.image.name) or image.pk
+
+
+def _job(image):
+    """Arguments for ``imaging.render_variants``, or None when the original is missing."""
+    name = image.image.name
+    if not name or not default_storage.exists(name):
+        return None
+    return (default_storage.path(name), str(settings.MEDIA_ROOT), name, _key(image))
+
+
+def _rendered(image):
+    """The variants already on disk for ``image``'s content, or None if any is missing."""
+    if storage.digest_of(image.image.name) is None:
+        return None
+    names = {variant: imaging.variant_name(image.image.name, _key(image), variant) for variant in imaging.VARIANTS}
+    return names if all(default_storage.exists(name) for name in names.values()) else None
+
+
+def store(image_id, name, variants):
+    """Record ``variants`` for the image, unless its file was replaced meanwhile."""
+    updated = WasteImage.objects.filter(pk=image_id, image=name).update(variants=variants)
+    if updated:
+        # Moves the listing's ETag on, and update() sends no signals.
+        listing = WasteImage.objects.filter(pk=image_id).values("listing_id")
+        WasteListing.objects.filter(pk__in=listing).update(updated_at=timezone.now())
+        cache.invalidate()
+    return bool(updated)
+
+
+def _finished(image_id, name):
+    submitter = threading.get_ident()
+
+    def callback(future):
+        # Normally run by the pool's result thread, which no request cycle
+        # cleans up after: its connections are checked before and closed after,
+        # so they never go stale. A future already done when the callback is
+        # added runs it in the submitting thread, whose connections stay.
+        background = threading.get_ident() != submitter
+        if background:
+            close_old_connections()
+        try:
+            store(image_id, name, future.result())
+        except DatabaseError:
+            logger.exception("Could not store the variants of image %s", image_id)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Could not render the variants of image %s", image_id)
+        finally:
+            if background:
+                connections.close_all()
+
+    return callback
+
+
+def schedule(image):
+    """Render ``image``'s variants in the background (inline with IMAGE_VARIANTS_SYNC)."""
+    rendered = _rendered(image)
+    if rendered is not None:
+        store(image.pk, image.image.name, rendered)
+        return
+    job = _job(image)
+    if job is None:
+        return
+    if settings.IMAGE_VARIANTS_SYNC:
+        store(image.pk, image.image.name, imaging.render_variants(*job))
+        return
+    get_executor().submit(imaging.render_variants, *job).add_done_callback(_finished(image.pk, image.image.name))
+
+
+def schedule_on_commit(image, using=None):
+    transaction.on_commit(lambda: schedule(image), using=using)
+
+
+def discard(name, variants):
+    """Drop a removed image's reference to its blob, or delete its own variants.
+
+    Files stored before content addressing are not counted and may be shared,
+    so those originals are left in place.
+    """
+    if storage.digest_of(name) is not None:
+        storage.image_storage.release(name)
+        return
+    for variant in variants.values():
+        default_storage.delete(variant)
+
+
+def backfill(images, workers, log=None):
+    """Render variants for ``images`` with ``workers`` processes; ``(done, failed)``.
+
+    At most two jobs per worker are queued at a time and rows are read with
+    ``.iterator()``, so memory stays flat however many images there are.
+    """
+    done = failed = 0
+    with _make_executor(workers) as executor:
+        pending = {}
+
+        def collect(futures):
+            nonlocal done, failed
+            for future in futures:
+                image_id, name = pending.pop(future)
+                try:
+                    store(image_id, name, future.result())
+                    done += 1
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Could not render the variants of image %s", image_id)
+                    failed += 1
+            if log:
+                log(done, failed)
+
+        for image in images.iterator(chunk_size=500):
+            job = _job(image)
+            if job is None:
+                logger.warning("Image %s has no file to render variants from", image.pk)
+                failed += 1
+                continue
+            pending[executor.submit(imaging.render_variants, *job)] = (image.pk, image.image.name)
+            if len(pending) >= workers * 2:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        collect(list(pending))
+    return done, failed
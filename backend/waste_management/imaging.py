@@ -0,0 +1,64 @@
+"""Resize listing photos into the variants clients download.
+
+Pure Pillow with no Django imports, so the functions can run in spawned worker
+processes (see ``image_pipeline``). Every variant is a progressive JPEG that
+fits inside its box, keeping the aspect ratio; images are never enlarged.
+"""
+
+import os
+import tempfile
+
+from PIL import Image, ImageOps
+
+# name: (longest side in pixels, JPEG quality)
+VARIANTS = {
+    "thumb": (160, 70),
+    "card": (640, 80),
+    "full": (1600, 85),
+}
+VARIANT_DIRECTORY = "variants"
+
+
+def variant_name(source_name, key, variant):
+    """Storage name of ``variant`` for the image stored as ``source_name`` under ``key`` (its pk)."""
+    directory = os.path.dirname(source_name)
+    return "/".join(part for part in (directory, VARIANT_DIRECTORY, f"{key}-{variant}.jpg") if part)
+
+
+def _save_atomically(image, path, quality):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as output:
+            image.save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def render_variants(source_path, root, source_name, key):
+    """Write every variant of ``source_path`` under ``root``; ``{variant: storage name}``."""
+    largest = max(size for size, _ in VARIANTS.values())
+    with Image.open(source_path) as original:
+        # For JPEGs, decode at the smallest scale still covering the largest
+        # variant instead of the full-size (often 12+ megapixel) image.
+        original.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+            # JPEG has no alpha: flatten transparent areas onto white.
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        names = {}
+        # Largest first, each resized from the previous one: cheaper and just as sharp.
+        for variant, (size, quality) in sorted(VARIANTS.items(), key=lambda item: -item[1][0]):
+            image = image.copy()
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            names[variant] = variant_name(source_name, key, variant)
+            _save_atomically(image, os.path.join(root, *names[variant].split("/")), quality)
+    return names
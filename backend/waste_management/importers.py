@@ -0,0 +1,118 @@
+"""Create many listings at once, from JSON objects or CSV rows.
+
+Rows are read lazily and handled ``batch_size`` at a time: each one is
+validated by ``WasteListingCreateSerializer`` (one instance reused for every
+row, rather than a serializer per row), then the valid rows of the batch are
+inserted with a single ``bulk_create`` and indexed for search in one go, all
+in one transaction. An invalid row is reported by number and skipped; the
+rows around it are still imported.
+
+``bulk_create`` sends no model signals, so the search index and the feed
+cache are updated here (and no image variants are due: imports carry none).
+
+``limited`` caps the number of rows; run the import in a transaction so the
+rows inserted before ``TooManyRows`` is raised are rolled back.
+"""
+
+import csv
+import io
+from dataclasses import dataclass, field
+
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ValidationError
+
+from . import cache, search
+from .models import WasteListing
+from .serializers import WasteListingCreateSerializer
+
+BATCH_SIZE = 1000
+
+
+class TooManyRows(Exception):
+    pass
+
+
+@dataclass
+class ImportResult:
+    ids: list = field(default_factory=list)
+    # {"row": 1-based row number, "errors": {field: [messages]}}
+    errors: list = field(default_factory=list)
+
+    @property
+    def created(self):
+        return len(self.ids)
+
+    def id_ranges(self):
+        """The new ids as ``[first, last]`` runs of consecutive ids."""
+        ranges = []
+        for pk in sorted(self.ids):
+            if ranges and pk == ranges[-1][1] + 1:
+                ranges[-1][1] = pk
+            else:
+                ranges.append([pk, pk])
+        return ranges
+
+
+def limited(rows, limit):
+    """``rows``, raising ``TooManyRows`` when there are more than ``limit`` of them."""
+    for number, row in enumerate(rows, 1):
+        if number > limit:
+            raise TooManyRows(f"At most {limit} rows can be imported at once")
+        yield row
+
+
+def csv_rows(file, encoding="utf-8-sig"):
+    """Rows of a CSV file with a header line, read as they are needed; empty cells count as absent."""
+    text = file if isinstance(file, io.TextIOBase) else io.TextIOWrapper(file, encoding=encoding, newline="")
+    for row in csv.DictReader(text):
+        yield {name: value for name, value in row.items() if name and value not in ("", None)}
+
+
+def import_listings(user, rows, batch_size=BATCH_SIZE, using="default"):
+    """Create a listing owned by ``user`` for each valid mapping in ``rows``; an ``ImportResult``."""
+    result = ImportResult()
+    serializer = WasteListingCreateSerializer()
+    batch = []
+    rows, number = iter(rows), 0
+    while True:
+        number += 1
+        try:
+            row = next(rows)
+        except StopIteration:
+            break
+        except (UnicodeDecodeError, csv.Error) as error:
+            # Rows already read are still imported; the rest of the file can't be.
+            result.errors.append({"row": number, "errors": {"non_field_errors": [f"Unreadable row: {error}"]}})
+            break
+        if not isinstance(row, dict):
+            result.errors.append({"row": number, "errors": {"non_field_errors": ["Expected an object."]}})
+            continue
+        try:
+            data = serializer.run_validation(row)
+        except ValidationError as error:
+            result.errors.append({"row": number, "errors": error.detail})
+            continue
+        listing = WasteListing(user=user, **data)
+        listing.refresh_geohash()
+        batch.append((number, listing))
+        if len(batch) >= batch_size:
+            _insert(batch, result, using)
+            batch = []
+    if batch:
+        _insert(batch, result, using)
+    if result.ids:
+        cache.invalidate(using=using)
+    return result
+
+
+def _insert(batch, result, using):
+    listings = [listing for _, listing in batch]
+    try:
+        with transaction.atomic(using=using):
+            WasteListing.objects.using(using).bulk_create(listings)
+            search.index_listings(listings, using=using)
+    except DatabaseError:
+        for number, _ in batch:
+            result.errors.append({"row": number, "errors": {"non_field_errors": ["Could not be saved."]}})
+        return
+    result.ids.extend(listing.pk for listing in listings)
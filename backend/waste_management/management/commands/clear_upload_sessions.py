@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from waste_management import uploads
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads idle for UPLOAD_SESSION_HOURS, with their partial files."
+
+    def handle(self, *args, **options):
+        removed = uploads.clear_stale()
+        self.stdout.write(f"Removed {removed} stale upload(s).")
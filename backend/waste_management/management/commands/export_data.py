@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from waste_management import exports
+from waste_management.models import Transaction, WasteListing
+from waste_management.serializers import ExportFilterSerializer, ListingExportSerializer, TransactionExportSerializer
+
+EXPORTS = {
+    "transactions": (exports.transactions, TransactionExportSerializer, Transaction.STATUS_CHOICES),
+    "listings": (exports.listings, ListingExportSerializer, WasteListing.STATUS_CHOICES),
+}
+
+
+class Command(BaseCommand):
+    help = "Stream every transaction or listing as CSV or NDJSON, optionally by creation date range and status."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=EXPORTS)
+        parser.add_argument("--output", choices=["csv", "ndjson"], default="csv")
+        parser.add_argument("--since", help="Created at or after this ISO date/time.")
+        parser.add_argument("--until", help="Created before this ISO date/time.")
+        parser.add_argument("--status")
+        parser.add_argument("--file", help="Write here instead of to standard output.")
+
+    def handle(self, *args, **options):
+        rows, serializer_class, statuses = EXPORTS[options["kind"]]
+        given = {name: options[name] for name in ("output", "since", "until", "status") if options[name] is not None}
+        filters = ExportFilterSerializer(data=given, statuses=statuses)
+        if not filters.is_valid():
+            raise CommandError(filters.errors)
+        params = dict(filters.validated_data)
+        output = params.pop("output")
+        chunks = exports.encode(rows(**params), serializer_class, output)
+
+        if options["file"]:
+            with open(options["file"], "wb") as destination:
+                for chunk in chunks:
+                    destination.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode("utf-8"), ending="")
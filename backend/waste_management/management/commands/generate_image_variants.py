@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from waste_management import image_pipeline
+from waste_management.models import WasteImage
+
+
+class Command(BaseCommand):
+    help = "Render the thumb/card/full variants of listing images that do not have them yet, in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=settings.IMAGE_VARIANT_WORKERS, help="Rendering processes."
+        )
+        parser.add_argument("--all", action="store_true", help="Re-render images that already have variants.")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+        images = WasteImage.objects.order_by("pk")
+        if not options["all"]:
+            images = images.filter(variants={})
+        total = images.count()
+        self.stdout.write(f"Rendering variants for {total} image(s) with {options['workers']} worker(s).")
+
+        def log(done, failed):
+            if (done + failed) % 100 == 0:
+                self.stdout.write(f"  {done + failed}/{total}")
+
+        done, failed = image_pipeline.backfill(images, options["workers"], log=log)
+        self.stdout.write(f"Rendered {done}, failed {failed}.")
+        if failed:
+            self.stdout.write(self.style.WARNING("See the log for the images that failed."))
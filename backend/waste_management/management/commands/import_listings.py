@@ -0,0 +1,44 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from waste_management import importers
+
+
+class Command(BaseCommand):
+    help = "Create listings for a user from a CSV file (with a header line) or a JSON array of objects."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="A .csv or .json file.")
+        parser.add_argument("--user", required=True, help="Username owning the new listings.")
+        parser.add_argument("--batch-size", type=int, default=importers.BATCH_SIZE, help="Rows per INSERT.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["user"]).first()
+        if user is None:
+            raise CommandError(f"No user named {options['user']!r}.")
+        path = options["path"]
+        started = time.perf_counter()
+        try:
+            if path.lower().endswith(".json"):
+                with open(path, encoding="utf-8") as source:
+                    rows = json.load(source)
+                if not isinstance(rows, list):
+                    raise CommandError("The JSON file must hold an array of listings.")
+                result = importers.import_listings(user, rows, batch_size=options["batch_size"])
+            else:
+                with open(path, "rb") as source:
+                    result = importers.import_listings(
+                        user, importers.csv_rows(source), batch_size=options["batch_size"]
+                    )
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Could not read {path}: {error}") from error
+
+        for error in result.errors:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(
+            f"Imported {result.created} listing(s), {len(result.errors)} row(s) failed, "
+            f"in {time.perf_counter() - started:.1f}s."
+        )
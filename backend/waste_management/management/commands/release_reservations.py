@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from waste_management import purchases
+
+
+class Command(BaseCommand):
+    help = "Cancel pending purchases whose reservation has expired and return their quantity to the listings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Expired purchases read per query.")
+
+    def handle(self, *args, **options):
+        released = purchases.release_expired(batch_size=options["batch_size"])
+        self.stdout.write(f"Released {released} expired reservation(s).")
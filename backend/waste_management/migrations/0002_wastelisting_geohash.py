@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+from waste_management import geo
+
+
+def populate_geohash(apps, schema_editor):
+    WasteListing = apps.get_model("waste_management", "WasteListing")
+    listings = WasteListing.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    batch = []
+    for listing in listings.only("id", "latitude", "longitude").iterator(chunk_size=2000):
+        listing.geohash = geo.encode(listing.latitude, listing.longitude)
+        batch.append(listing)
+        if len(batch) >= 2000:
+            WasteListing.objects.bulk_update(batch, ["geohash"])
+            batch = []
+    if batch:
+        WasteListing.objects.bulk_update(batch, ["geohash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("waste_management", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="wastelisting",
+            name="geohash",
+            field=models.CharField(blank=True, editable=False, max_length=9),
+        ),
+        migrations.AddIndex(
+            model_name="wastelisting",
+            index=models.Index(fields=["geohash"], name="listing_geohash_idx"),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:20
+
+from django.db import migrations
+
+FTS_TABLE = "waste_listing_fts"
+PG_INDEX = "waste_listing_search_idx"
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(title, description, location, tokenize='porter unicode61', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, location) "
+            "SELECT id, title, description, location FROM waste_management_wastelisting"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON waste_management_wastelisting USING GIN ("
+            "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '') || ' ' "
+            "|| coalesce(location, '')))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("waste_management", "0002_wastelisting_geohash"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
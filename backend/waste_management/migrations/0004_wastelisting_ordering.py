@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:53
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("waste_management", "0003_listing_search_index"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="wastelisting",
+            options={"ordering": ["-created_at", "-id"]},
+        ),
+    ]
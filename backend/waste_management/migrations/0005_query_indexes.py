@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def analyze(apps, schema_editor):
+    """Refresh SQLite's planner statistics.
+
+    Without them SQLite prefers the new status indexes (which avoid a sort) even
+    for "near me" searches, where the geohash index narrows far more.
+    """
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("ANALYZE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("waste_management", "0004_wastelisting_ordering"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["buyer", "-created_at", "-id"], name="transaction_buyer_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["seller", "-created_at", "-id"], name="transaction_seller_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="wastelisting",
+            index=models.Index(fields=["status", "-created_at", "-id"], name="listing_status_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="wastelisting",
+            index=models.Index(fields=["status", "type", "-created_at", "-id"], name="listing_status_type_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="wastelisting",
+            index=models.Index(fields=["user", "-created_at", "-id"], name="listing_user_created_idx"),
+        ),
+        migrations.RunPython(analyze, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("waste_management", "0006_transaction_reserved_until"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="wasteimage",
+            name="variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
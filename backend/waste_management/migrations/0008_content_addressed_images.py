@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:30
+
+import waste_management.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("waste_management", "0007_wasteimage_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Blob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("size", models.BigIntegerField()),
+                ("references", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="wasteimage",
+            name="image",
+            field=models.ImageField(storage=waste_management.storage.get_image_storage, upload_to="waste_images/"),
+        ),
+    ]
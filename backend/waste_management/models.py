@@ -1,6 +1,39 @@
+import math
+import uuid
+
 from django.db import models
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
 from django.conf import settings
 
+from . import geo
+from .storage import get_image_storage
+
+
+class WasteListingQuerySet(models.QuerySet):
+    def near(self, latitude, longitude, radius_km):
+        """Listings within ``radius_km`` of a point, annotated with ``distance_km``.
+
+        The geohash cells covering the search area narrow the candidates through
+        the geohash index before the exact distance is computed.
+        """
+        cells = models.Q()
+        for start, stop in geo.covering_ranges(latitude, longitude, radius_km):
+            cells |= models.Q(geohash__gte=start, geohash__lt=stop)
+
+        min_lat, max_lat, min_lng, max_lng = geo.bounding_box(latitude, longitude, radius_km)
+        queryset = self.filter(cells, latitude__gte=min_lat, latitude__lte=max_lat)
+        if min_lng >= -180.0 and max_lng <= 180.0:
+            queryset = queryset.filter(longitude__gte=min_lng, longitude__lte=max_lng)
+
+        # Haversine distance, with the constant half of the formula computed here.
+        origin_lat = math.radians(latitude)
+        row_lat = Radians("latitude")
+        d_lat = row_lat - origin_lat
+        d_lng = Radians("longitude") - math.radians(longitude)
+        a = Power(Sin(d_lat / 2), 2) + Cos(row_lat) * math.cos(origin_lat) * Power(Sin(d_lng / 2), 2)
+        distance = ASin(Sqrt(a)) * (2 * geo.EARTH_RADIUS_KM)
+        return queryset.annotate(distance_km=distance).filter(distance_km__lte=radius_km)
+
 
 class WasteListing(models.Model):
     WASTE_TYPES = [
@@ -34,24 +67,95 @@ class WasteListing(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    geohash = models.CharField(max_length=geo.GEOHASH_PRECISION, blank=True, editable=False)
+
+    objects = WasteListingQuerySet.as_manager()
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["geohash"], name="listing_geohash_idx"),
+            # Public feed: available listings, optionally of one type, newest first.
+            models.Index(fields=["status", "-created_at", "-id"], name="listing_status_created_idx"),
+            models.Index(fields=["status", "type", "-created_at", "-id"], name="listing_status_type_idx"),
+            models.Index(fields=["user", "-created_at", "-id"], name="listing_user_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
+    def refresh_geohash(self):
+        if self.latitude is None or self.longitude is None:
+            self.geohash = ""
+        else:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        self.refresh_geohash()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geohash"}
+        super().save(*args, **kwargs)
+
 
 class WasteImage(models.Model):
     listing = models.ForeignKey(WasteListing, on_delete=models.CASCADE, related_name="images")
-    image = models.ImageField(upload_to="waste_images/")
+    # Stored under its content hash, once however many listings use it (see storage.py).
+    image = models.ImageField(upload_to="waste_images/", storage=get_image_storage)
     caption = models.CharField(max_length=200, blank=True)
+    # Storage names of the resized copies ({"thumb": ..., "card": ..., "full": ...}),
+    # filled in by image_pipeline once they are rendered.
+    variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Image for {self.listing.title}"
 
 
+class Blob(models.Model):
+    """A content-addressed image file and the number of ``WasteImage`` rows using it."""
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.references} references)"
+
+
+class UploadSession(models.Model):
+    """An image being uploaded in chunks for a listing; ``received`` bytes are in its part file (see uploads.py)."""
+
+    # Random, so a session's id cannot be guessed from another's.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="upload_sessions")
+    listing = models.ForeignKey(WasteListing, on_delete=models.CASCADE, related_name="upload_sessions")
+    filename = models.CharField(max_length=255)
+    caption = models.CharField(max_length=200, blank=True)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload of {self.filename} ({self.received}/{self.size} bytes)"
+
+
+class TransactionQuerySet(models.QuerySet):
+    def involving(self, user, ordering=("-created_at", "-id")):
+        """Transactions where ``user`` is the buyer or the seller, in ``ordering``.
+
+        Written as a UNION ALL of two index range scans, which SQLite merges in
+        index order; ``buyer OR seller`` would need a sort of every matching row.
+        The result is a combined queryset: it can be sliced, counted and iterated
+        but not filtered further, so apply filters before calling this.
+        """
+        purchases = self.filter(buyer=user)
+        sales = self.filter(seller=user).exclude(buyer=user)
+        return purchases.union(sales, all=True).order_by(*ordering)
+
+
 class Transaction(models.Model):
     STATUS_CHOICES = [
         ("pending", "Pending"),
@@ -69,8 +173,19 @@ class Transaction(models.Model):
     payment_reference = models.CharField(max_length=100, blank=True)
     delivery_address = models.TextField(blank=True)
     pickup_date = models.DateTimeField(null=True, blank=True)
+    # Pending purchases hold their quantity until then (see purchases.release_expired).
+    reserved_until = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TransactionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["buyer", "-created_at", "-id"], name="transaction_buyer_created_idx"),
+            models.Index(fields=["seller", "-created_at", "-id"], name="transaction_seller_created_idx"),
+            models.Index(fields=["status", "reserved_until"], name="transaction_reservation_idx"),
+        ]
+
     def __str__(self):
         return f"Transaction: {self.listing.title} - {self.buyer.username}"
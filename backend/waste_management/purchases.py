@@ -0,0 +1,118 @@
+"""Buying from a listing without overselling.
+
+Stock is taken with a single conditional ``UPDATE``::
+
+    UPDATE listing SET quantity = quantity - q, status = CASE ... END
+    WHERE id = ? AND status = 'available' AND quantity >= q
+
+so two buyers racing for the last units cannot both succeed, whatever the
+interleaving, and no row or table lock is held beyond that statement's
+transaction. The purchase is a pending ``Transaction`` holding its quantity
+until ``reserved_until``; the buyer confirms it, or ``release_expired`` returns
+the quantity to the listing. A listing whose stock is all held is
+``reserved``, and ``sold`` once every hold on it is confirmed.
+
+Each write comes first in its transaction, so on SQLite no transaction has to
+upgrade a read lock (which fails instead of waiting).
+"""
+
+import datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from . import cache
+from .models import Transaction, WasteListing
+
+# Quantities are floats: leftovers below this are treated as nothing left.
+QUANTITY_EPSILON = 1e-9
+CENTS = Decimal("0.01")
+
+
+def reserve(listing_id, buyer, quantity, **details):
+    """Take ``quantity`` from the listing for ``buyer``; the pending ``Transaction``, or None if it can't be had.
+
+    ``details`` are extra ``Transaction`` fields (``delivery_address``, ``pickup_date``).
+    """
+    now = timezone.now()
+    sold_out = models.Q(quantity__lte=quantity + QUANTITY_EPSILON)
+    with transaction.atomic():
+        taken = (
+            WasteListing.objects.filter(
+                pk=listing_id, status="available", quantity__gte=quantity - QUANTITY_EPSILON
+            )
+            .exclude(user=buyer)
+            .update(
+                # Both expressions read the row as it was before this UPDATE.
+                quantity=Case(When(sold_out, then=Value(0.0)), default=F("quantity") - quantity),
+                status=Case(When(sold_out, then=Value("reserved")), default=F("status")),
+                updated_at=now,
+            )
+        )
+        if not taken:
+            return None
+        listing = WasteListing.objects.only("user", "price_per_unit").get(pk=listing_id)
+        purchase = Transaction.objects.create(
+            listing=listing,
+            buyer=buyer,
+            seller_id=listing.user_id,
+            quantity=quantity,
+            total_amount=(listing.price_per_unit * Decimal(str(quantity))).quantize(CENTS, ROUND_HALF_UP),
+            reserved_until=now + datetime.timedelta(minutes=settings.PURCHASE_RESERVATION_MINUTES),
+            **details,
+        )
+    # update() sends no signals.
+    cache.invalidate()
+    return purchase
+
+
+def confirm(transaction_id, buyer, payment_reference=""):
+    """Confirm ``buyer``'s unexpired pending purchase; the updated ``Transaction``, or None."""
+    now = timezone.now()
+    unexpired = models.Q(reserved_until__isnull=True) | models.Q(reserved_until__gt=now)
+    with transaction.atomic():
+        confirmed = (
+            Transaction.objects.filter(unexpired, pk=transaction_id, buyer=buyer, status="pending")
+            .update(status="confirmed", reserved_until=None, payment_reference=payment_reference, updated_at=now)
+        )
+        if not confirmed:
+            return None
+        purchase = Transaction.objects.select_related("listing__user", "buyer", "seller").get(pk=transaction_id)
+        pending = Transaction.objects.filter(listing=models.OuterRef("pk"), status="pending")
+        sold = (
+            WasteListing.objects.filter(pk=purchase.listing_id, status="reserved", quantity__lte=QUANTITY_EPSILON)
+            .exclude(models.Exists(pending))
+            .update(status="sold", updated_at=now)
+        )
+    if sold:
+        cache.invalidate()
+    return purchase
+
+
+def release_expired(now=None, listing_id=None, batch_size=500):
+    """Cancel pending purchases past ``reserved_until`` and return their quantity; the number released."""
+    now = now or timezone.now()
+    expired = Transaction.objects.filter(status="pending", reserved_until__lte=now).order_by()
+    if listing_id is not None:
+        expired = expired.filter(listing_id=listing_id)
+    released = 0
+    while rows := list(expired.values_list("pk", "listing_id", "quantity")[:batch_size]):
+        for pk, row_listing_id, quantity in rows:
+            with transaction.atomic():
+                # Conditional, so a hold confirmed (or released) meanwhile is not returned twice.
+                if not Transaction.objects.filter(pk=pk, status="pending").update(
+                    status="cancelled", reserved_until=None, updated_at=now
+                ):
+                    continue
+                WasteListing.objects.filter(pk=row_listing_id).update(
+                    quantity=F("quantity") + quantity,
+                    status=Case(When(status="reserved", then=Value("available")), default=F("status")),
+                    updated_at=now,
+                )
+            released += 1
+    if released:
+        cache.invalidate()
+    return released
@@ -0,0 +1,99 @@
+"""Ranked full-text search over listing title, description and location.
+
+SQLite keeps a separate FTS5 table (``waste_listing_fts``) whose rowid is the
+listing id; it is updated from the ``WasteListing`` save/delete signals.
+Queryset ``update()``, ``bulk_create()`` and raw SQL send no signals, so they
+bypass it: whoever changes listings that way must call ``index_listings`` for
+the affected rows (as the importer and the data generator do).
+PostgreSQL matches against a GIN expression index over ``to_tsvector``, which
+the database maintains by itself.  Other backends fall back to ``icontains``.
+
+Every backend annotates matches with ``search_rank`` (higher is better).
+"""
+
+import re
+
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "waste_listing_fts"
+PG_CONFIG = "english"
+PG_DOCUMENT = "coalesce({t}.title, '') || ' ' || coalesce({t}.description, '') || ' ' || coalesce({t}.location, '')"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(query):
+    return _TOKEN_RE.findall(query or "")
+
+
+def fts5_expression(query):
+    """Translate free text into a safe FTS5 query: all terms, last one as a prefix."""
+    terms = [f'"{token}"' for token in _tokens(query)]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(queryset, query):
+    """Filter ``queryset`` to listings matching ``query`` and annotate ``search_rank``."""
+    if not _tokens(query):
+        return queryset.annotate(search_rank=models.Value(0.0, output_field=models.FloatField())).none()
+
+    vendor = connections[queryset.db].vendor
+    table = connections[queryset.db].ops.quote_name(queryset.model._meta.db_table)
+    if vendor == "sqlite":
+        expression = fts5_expression(query)
+        matches = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression])
+        # bm25 ``rank`` is more negative for better matches.
+        rank = RawSQL(
+            f"SELECT -rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id",
+            [expression],
+            output_field=models.FloatField(),
+        )
+        return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+    if vendor == "postgresql":
+        vector = f"to_tsvector('{PG_CONFIG}', {PG_DOCUMENT.format(t=table)})"
+        tsquery = f"plainto_tsquery('{PG_CONFIG}', %s)"
+        matches = RawSQL(f"{vector} @@ {tsquery}", [query], output_field=models.BooleanField())
+        rank = RawSQL(f"ts_rank({vector}, {tsquery})", [query], output_field=models.FloatField())
+        return queryset.filter(matches).annotate(search_rank=rank)
+
+    condition = models.Q()
+    for token in _tokens(query):
+        condition &= (
+            models.Q(title__icontains=token)
+            | models.Q(description__icontains=token)
+            | models.Q(location__icontains=token)
+        )
+    return queryset.filter(condition).annotate(search_rank=models.Value(0.0, output_field=models.FloatField()))
+
+
+def _uses_fts_table(using):
+    return connections[using].vendor == "sqlite"
+
+
+def index_listings(listings, using="default"):
+    """Insert or refresh the search entries of ``listings``."""
+    if not _uses_fts_table(using):
+        return
+    rows = [(listing.pk, listing.title, listing.description, listing.location) for listing in listings]
+    if not rows:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, location) VALUES (%s, %s, %s, %s)", rows
+        )
+
+
+def index_listing(listing, using="default"):
+    index_listings([listing], using=using)
+
+
+def remove_listing(listing_id, using="default"):
+    if not _uses_fts_table(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [listing_id])
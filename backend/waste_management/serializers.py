@@ -1,16 +1,43 @@
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from .models import WasteListing, WasteImage, Transaction
+from trashtrotreasure.fast_serialization import CompiledListSerializer
+from trashtrotreasure.fieldsets import SparseFieldsMixin
+from .models import WasteListing, WasteImage, Transaction, UploadSession
+from .uploads import EXTENSIONS
+
+
+class ImageVariantsField(serializers.Field):
+    """``{"thumb": url, "card": url, "full": url}`` once rendered, ``{}`` until then."""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
 
+    def to_representation(self, value):
+        request = self.context.get("request")
+        urls = {}
+        for variant, name in value.items():
+            url = default_storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
+
+class WasteImageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    variants = ImageVariantsField()
 
-class WasteImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = WasteImage
-        fields = ["id", "image", "caption", "created_at"]
+        fields = ["id", "image", "variants", "caption", "created_at"]
 
 
-class WasteListingSerializer(serializers.ModelSerializer):
+class WasteListingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     images = WasteImageSerializer(many=True, read_only=True)
     user = serializers.StringRelatedField()
+    # Only present when the listing was fetched through a "near me" search.
+    distance_km = serializers.FloatField(read_only=True)
 
     class Meta:
         model = WasteListing
@@ -28,9 +55,11 @@ class WasteListingSerializer(serializers.ModelSerializer):
             "status",
             "user",
             "images",
+            "distance_km",
             "created_at",
             "updated_at",
         ]
+        list_serializer_class = CompiledListSerializer
 
 
 class WasteListingCreateSerializer(serializers.ModelSerializer):
@@ -49,7 +78,7 @@ class WasteListingCreateSerializer(serializers.ModelSerializer):
         ]
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     listing = WasteListingSerializer(read_only=True)
     buyer = serializers.StringRelatedField()
     seller = serializers.StringRelatedField()
@@ -67,6 +96,114 @@ class TransactionSerializer(serializers.ModelSerializer):
             "payment_reference",
             "delivery_address",
             "pickup_date",
+            "reserved_until",
+            "created_at",
+            "updated_at",
+        ]
+        list_serializer_class = CompiledListSerializer
+
+
+class PurchaseSerializer(serializers.Serializer):
+    quantity = serializers.FloatField()
+    delivery_address = serializers.CharField(required=False, allow_blank=True)
+    pickup_date = serializers.DateTimeField(required=False, allow_null=True)
+
+    def validate_quantity(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Must be greater than zero.")
+        return value
+
+
+class ConfirmPurchaseSerializer(serializers.Serializer):
+    payment_reference = serializers.CharField(required=False, allow_blank=True, max_length=100, default="")
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    # Bytes received so far: where the next chunk starts.
+    offset = serializers.IntegerField(source="received", read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ["id", "listing", "filename", "size", "caption", "offset", "created_at", "updated_at"]
+        read_only_fields = ["listing"]
+
+    def validate_filename(self, value):
+        value = os.path.basename(value)
+        if os.path.splitext(value)[1].lower() not in EXTENSIONS:
+            raise serializers.ValidationError(f"Must end in one of {', '.join(sorted(EXTENSIONS))}.")
+        return value
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Must be greater than zero.")
+        if value > settings.IMAGE_UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(f"Must be at most {settings.IMAGE_UPLOAD_MAX_BYTES} bytes.")
+        return value
+
+
+class TransactionExportSerializer(serializers.ModelSerializer):
+    """One flat row per transaction, for CSV and NDJSON exports."""
+
+    listing_title = serializers.CharField(source="listing.title")
+    buyer = serializers.CharField(source="buyer.username")
+    seller = serializers.CharField(source="seller.username")
+
+    class Meta:
+        model = Transaction
+        fields = [
+            "id",
+            "created_at",
+            "updated_at",
+            "status",
+            "listing",
+            "listing_title",
+            "buyer",
+            "seller",
+            "quantity",
+            "total_amount",
+            "payment_reference",
+            "delivery_address",
+            "pickup_date",
+        ]
+        list_serializer_class = CompiledListSerializer
+
+
+class ListingExportSerializer(serializers.ModelSerializer):
+    """One flat row per listing, for CSV and NDJSON exports."""
+
+    user = serializers.CharField(source="user.username")
+
+    class Meta:
+        model = WasteListing
+        fields = [
+            "id",
             "created_at",
             "updated_at",
+            "status",
+            "title",
+            "type",
+            "quantity",
+            "unit",
+            "price_per_unit",
+            "location",
+            "latitude",
+            "longitude",
+            "user",
         ]
+        list_serializer_class = CompiledListSerializer
+
+
+class ExportFilterSerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=["csv", "ndjson"], default="csv")
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    status = serializers.ChoiceField(choices=[], required=False)
+
+    def __init__(self, *args, statuses=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["status"].choices = statuses
+
+    def validate(self, attrs):
+        if "since" in attrs and "until" in attrs and attrs["since"] > attrs["until"]:
+            raise serializers.ValidationError({"until": "Must not be before since."})
+        return attrs
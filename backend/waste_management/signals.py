@@ -0,0 +1,49 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, image_pipeline, search
+from .models import WasteImage, WasteListing
+
+SEARCH_FIELDS = {"title", "description", "location"}
+
+
+# Not called for queryset update()/bulk_create(); see the search module.
+@receiver(post_save, sender=WasteListing)
+def index_listing(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        search.index_listing(instance, using=using)
+
+
+@receiver(post_delete, sender=WasteListing)
+def unindex_listing(sender, instance, using, **kwargs):
+    search.remove_listing(instance.pk, using=using)
+
+
+@receiver(post_save, sender=WasteImage)
+def render_image_variants(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is None or "image" in update_fields:
+        image_pipeline.schedule_on_commit(instance, using=using)
+
+
+@receiver(pre_save, sender=WasteImage)
+def release_replaced_image(sender, instance, using, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None or (update_fields is not None and "image" not in update_fields):
+        return
+    previous = WasteImage.objects.using(using).filter(pk=instance.pk).values_list("image", "variants").first()
+    if previous and previous[0] != instance.image.name:
+        transaction.on_commit(lambda: image_pipeline.discard(*previous), using=using)
+
+
+@receiver(post_delete, sender=WasteImage)
+def release_deleted_image(sender, instance, using, **kwargs):
+    name, variants = instance.image.name, instance.variants
+    transaction.on_commit(lambda: image_pipeline.discard(name, variants), using=using)
+
+
+@receiver(post_save, sender=WasteListing)
+@receiver(post_delete, sender=WasteListing)
+@receiver(post_save, sender=WasteImage)
+@receiver(post_delete, sender=WasteImage)
+def invalidate_feed_cache(sender, using, **kwargs):
+    cache.invalidate(using=using)
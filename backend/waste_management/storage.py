@@ -0,0 +1,119 @@
+"""Content-addressed storage for listing images.
+
+Each upload is streamed to a temporary file while it is hashed, then moved to
+``cas/<aa>/<bb>/<sha256><ext>``. Identical photos uploaded for many listings
+are therefore stored once; a ``Blob`` row counts the ``WasteImage`` rows
+using each file, and the file (with its variants) is deleted when the last
+one goes. A blob's content never changes under its name, so its URL can be
+cached forever (see ``views.serve_blob``).
+
+Counts err on the side of keeping files: an upload rolled back with its row
+can leave an unreferenced file behind, never a referenced one missing.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .imaging import VARIANT_DIRECTORY
+
+# A year: the longest max-age caches are expected to honour.
+CACHE_FOREVER = "public, max-age=31536000, immutable"
+PREFIX = "cas"
+TEMP_DIRECTORY = f"{PREFIX}/tmp"
+BLOB_NAME = re.compile(rf"^{PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})(?:\.\w+)?$")
+# Blobs and the variants rendered from them, named after the blob's digest.
+IMMUTABLE_NAME = re.compile(
+    rf"^{PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?:{VARIANT_DIRECTORY}/)?(?P<digest>[0-9a-f]{{64}})(?:-\w+)?(?:\.\w+)?$"
+)
+
+
+def digest_of(name):
+    """The SHA-256 of a content-addressed blob ``name``, or None for any other file."""
+    match = BLOB_NAME.match(name or "")
+    return match["digest"] if match else None
+
+
+def _blob_model():
+    return apps.get_model("waste_management", "Blob")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def blob_name(self, digest, extension):
+        return f"{PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is the digest (see _save); identical content shares it.
+        return name
+
+    def _save(self, name, content):
+        directory = self.path(TEMP_DIRECTORY)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory)
+        digest, size = hashlib.sha256(), 0
+        try:
+            with os.fdopen(descriptor, "wb") as output:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    output.write(chunk)
+                    size += len(chunk)
+            name = self.blob_name(digest.hexdigest(), os.path.splitext(name)[1].lower())
+            path = self.path(name)
+            with transaction.atomic():
+                # Counted before the file is put in place, inside one transaction, so
+                # a concurrent release of the last reference either sees this one or
+                # has already removed the file, which is then written again below.
+                self.add_reference(name, size)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(temporary, path)
+                    temporary = None
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+        finally:
+            if temporary is not None:
+                os.unlink(temporary)
+        return name
+
+    def add_reference(self, name, size):
+        blobs = _blob_model().objects
+        if blobs.filter(name=name).update(references=F("references") + 1):
+            return
+        try:
+            with transaction.atomic():
+                blobs.create(name=name, size=size, references=1)
+        except IntegrityError:
+            blobs.filter(name=name).update(references=F("references") + 1)
+
+    def release(self, name):
+        """Drop one reference to blob ``name``; delete it and its variants after the last one."""
+        digest = digest_of(name)
+        if digest is None:
+            return False
+        blobs = _blob_model().objects
+        with transaction.atomic():
+            blobs.filter(name=name).update(references=F("references") - 1)
+            deleted, _ = blobs.filter(name=name, references__lte=0).delete()
+            if deleted:
+                # Removed before commit: a concurrent upload of the same content
+                # waits for this transaction, then finds the file gone and rewrites it.
+                variants = self.path(os.path.join(os.path.dirname(name), VARIANT_DIRECTORY))
+                if os.path.isdir(variants):
+                    for entry in os.scandir(variants):
+                        if entry.name.startswith(digest):
+                            os.unlink(entry.path)
+                self.delete(name)
+        return bool(deleted)
+
+
+image_storage = ContentAddressedStorage()
+
+
+def get_image_storage():
+    return image_storage
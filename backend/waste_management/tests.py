@@ -0,0 +1,1228 @@
+import csv
+import datetime
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import UnreadablePostError
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ListSerializer
+from PIL import Image
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from accounts.models import User
+from trashtrotreasure.fast_serialization import CompiledListSerializer
+from trashtrotreasure.query_plans import capture_selects, plan_problems
+from . import cache, geo, image_pipeline, imaging, importers, purchases, search, storage, uploads
+from .models import Blob, WasteListing, WasteImage, Transaction, UploadSession
+from .serializers import TransactionSerializer, WasteListingSerializer
+
+
+_phones = itertools.count(700000000)
+
+
+def make_user(username, role="waste_generator"):
+    return User.objects.create(username=username, phone=f"0{next(_phones)}", role=role, location="Nairobi")
+
+
+def make_listing(user, **kwargs):
+    fields = {
+        "title": "Clean PET bottles",
+        "description": "Washed plastic bottles",
+        "type": "plastic",
+        "quantity": 50,
+        "location": "Westlands",
+        "latitude": -1.2676,
+        "longitude": 36.8108,
+        "price_per_unit": "12.50",
+        "user": user,
+    }
+    fields.update(kwargs)
+    return WasteListing.objects.create(**fields)
+
+
+class QueryCountTests(APITestCase):
+    """List endpoints must cost a fixed number of queries whatever the page size."""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.seller = make_user("seller")
+        self.buyer = make_user("buyer", role="buyer")
+
+    def add_rows(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._add_rows(count)
+
+    def _add_rows(self, count):
+        for index in range(count):
+            seller = make_user(f"seller-{next(_phones)}")
+            listing = make_listing(seller if index % 2 else self.seller, title=f"Listing {index}")
+            WasteImage.objects.create(listing=listing, image=f"waste_images/{index}.jpg")
+            Transaction.objects.create(
+                listing=listing, buyer=self.buyer, seller=listing.user, quantity=1, total_amount="12.50"
+            )
+
+    def count_queries(self, url, user=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    def assertConstantQueries(self, url, user=None):
+        self.add_rows(1)
+        small = self.count_queries(url, user)
+        self.add_rows(19)
+        large = self.count_queries(url, user)
+        self.assertEqual(small, large, f"{url} issues per-row queries ({small} for 1 row, {large} for 20)")
+
+    def test_listing_feed(self):
+        self.assertConstantQueries("/api/waste/listings/")
+
+    def test_listing_feed_cursor(self):
+        self.assertConstantQueries("/api/waste/listings/?pagination=cursor")
+
+    def test_listing_feed_search(self):
+        self.assertConstantQueries("/api/waste/listings/?q=bottles")
+
+    def test_listing_feed_near(self):
+        self.assertConstantQueries("/api/waste/listings/?lat=-1.27&lng=36.81&radius_km=5")
+
+    def test_my_listings(self):
+        self.assertConstantQueries("/api/waste/listings/my/", self.seller)
+
+    def test_my_transactions(self):
+        self.assertConstantQueries("/api/waste/transactions/my/", self.buyer)
+
+
+class FeedCacheTests(APITestCase):
+    url = "/api/waste/listings/"
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.seller = make_user("seller")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing = make_listing(self.seller)
+
+    def get(self, url=None):
+        response = self.client.get(url or self.url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_repeat_request_is_served_from_cache(self):
+        self.assertEqual(self.get()["X-Cache"], "MISS")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get()
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.data["results"][0]["id"], self.listing.id)
+
+    def test_key_ignores_parameter_order_and_blanks(self):
+        self.get("/api/waste/listings/?type=plastic&location=West")
+        self.assertEqual(self.get("/api/waste/listings/?location=West&min_quantity=&type=plastic")["X-Cache"], "HIT")
+        self.assertEqual(self.get("/api/waste/listings/?type=metal")["X-Cache"], "MISS")
+
+    def test_listing_save_invalidates(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.title = "Sorted PET bottles"
+            self.listing.save()
+        response = self.get()
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["title"], "Sorted PET bottles")
+
+    def test_image_changes_invalidate(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            WasteImage.objects.create(listing=self.listing, image="waste_images/new.jpg")
+        response = self.get()
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.data["results"][0]["images"]), 1)
+
+    def test_listing_delete_invalidates(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.delete()
+        self.assertEqual(self.get().data["results"], [])
+
+    def test_stats_are_staff_only(self):
+        self.client.force_authenticate(self.seller)
+        self.assertEqual(self.client.get("/api/waste/listings/cache-stats/").status_code, 403)
+        staff = make_user("staff")
+        staff.is_staff = True
+        staff.save(update_fields=["is_staff"])
+        self.client.force_authenticate(staff)
+        before = self.client.get("/api/waste/listings/cache-stats/").data
+        self.get()
+        self.get()
+        after = self.client.get("/api/waste/listings/cache-stats/").data
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+
+
+@skipUnless(connection.vendor == "sqlite", "exercises the SQLite FTS5 index")
+class SearchTests(APITestCase):
+    url = "/api/waste/listings/"
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.user = make_user("searcher")
+
+    def found(self, query):
+        # The feed cache is invalidated on commit, which these tests never reach.
+        cache.get_cache().clear()
+        response = self.client.get(self.url, {"q": query})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["id"] for row in response.data["results"]]
+
+    def test_better_matches_rank_first(self):
+        passing = make_listing(self.user, title="Scrap metal", description="Some copper wire")
+        strong = make_listing(self.user, title="Copper wire", description="Copper wire offcuts, copper pipes")
+        make_listing(self.user, title="Cardboard", description="Flattened boxes")
+        self.assertEqual(self.found("copper"), [strong.pk, passing.pk])
+        self.assertEqual(self.found("cop"), [strong.pk, passing.pk])
+        self.assertEqual(self.found("copper boxes"), [])
+
+    def test_index_follows_save_and_delete(self):
+        listing = make_listing(self.user, title="Glass jars")
+        self.assertEqual(self.found("jars"), [listing.pk])
+        listing.title = "Glass bottles"
+        listing.save()
+        self.assertEqual(self.found("jars"), [])
+        self.assertEqual(self.found("bottles"), [listing.pk])
+        listing.location = "Kilimani"
+        listing.save(update_fields=["location"])
+        self.assertEqual(self.found("kilimani"), [listing.pk])
+        listing.delete()
+        self.assertEqual(self.found("bottles"), [])
+
+    def test_queryset_update_bypasses_the_index(self):
+        listing = make_listing(self.user, title="Glass jars")
+        WasteListing.objects.filter(pk=listing.pk).update(title="Tin cans")
+        self.assertEqual(self.found("tin"), [])
+        search.index_listings(WasteListing.objects.filter(pk=listing.pk))
+        self.assertEqual(self.found("tin"), [listing.pk])
+
+    def test_query_syntax_is_treated_as_text(self):
+        listing = make_listing(self.user, title="Plastic NEAR bottles", description="Crates (blue)")
+        for query in ('"plastic', "plas*", "NEAR(plastic bottles)", "(crates", "blue)", "plastic AND", "OR"):
+            with self.subTest(query=query):
+                self.found(query)
+        self.assertEqual(self.found('"plastic'), [listing.pk])
+        self.assertEqual(self.found("NEAR(plastic bottles)"), [listing.pk])
+        self.assertEqual(self.found("(crates"), [listing.pk])
+        self.assertEqual(self.found("*"), [])
+
+    def test_fts5_expression(self):
+        self.assertEqual(search.fts5_expression('NEAR("a" b*) OR c'), '"NEAR" "a" "b" "OR" "c"*')
+        self.assertEqual(search.fts5_expression("()*\""), "")
+
+
+class NearbySearchTests(APITestCase):
+    url = "/api/waste/listings/"
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.user = make_user("locator")
+
+    def place(self, latitude, longitude):
+        return make_listing(self.user, latitude=latitude, longitude=longitude)
+
+    def nearby(self, latitude, longitude, radius_km, **params):
+        response = self.client.get(
+            self.url, {"lat": latitude, "lng": longitude, "radius_km": radius_km, "page_size": 100, **params}
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data["results"]
+
+    def assertMatchesHaversine(self, latitude, longitude, radius_km):
+        expected = {
+            listing.pk
+            for listing in WasteListing.objects.all()
+            if geo.haversine_km(latitude, longitude, listing.latitude, listing.longitude) <= radius_km
+        }
+        self.assertEqual({row["id"] for row in self.nearby(latitude, longitude, radius_km)}, expected)
+        return expected
+
+    def test_radius_matches_haversine(self):
+        for offset in (0.0, 0.01, 0.03, 0.05, 0.08, 0.2):
+            self.place(-1.2676 + offset, 36.8108)
+            self.place(-1.2676, 36.8108 - offset * 1.3)
+        for radius_km in (1, 4, 6, 10, 30):
+            self.assertMatchesHaversine(-1.2676, 36.8108, radius_km)
+
+    def test_ordering_by_distance(self):
+        for offset in (0.05, 0.01, 0.03):
+            self.place(-1.2676 + offset, 36.8108)
+        rows = self.nearby(-1.2676, 36.8108, 20, ordering="distance")
+        distances = [row["distance_km"] for row in rows]
+        self.assertEqual(len(distances), 3)
+        self.assertEqual(distances, sorted(distances))
+
+    def test_search_across_the_antimeridian(self):
+        east = self.place(0.0, 179.95)
+        west = self.place(0.0, -179.95)
+        self.place(0.0, 179.5)
+        self.place(0.0, -179.5)
+        self.assertEqual(self.assertMatchesHaversine(0.0, 179.98, 20), {east.pk, west.pk})
+        self.assertEqual(self.assertMatchesHaversine(0.0, -179.98, 20), {east.pk, west.pk})
+
+    def test_search_at_the_poles(self):
+        across = self.place(89.95, 180.0)
+        below = self.place(89.5, 90.0)
+        south = self.place(-89.99, 45.0)
+        self.assertEqual(self.assertMatchesHaversine(89.95, 0.0, 20), {across.pk})
+        self.assertEqual(self.assertMatchesHaversine(90.0, 0.0, 60), {across.pk, below.pk})
+        self.assertEqual(self.assertMatchesHaversine(-90.0, -120.0, 5), {south.pk})
+
+    def test_invalid_coordinates(self):
+        invalid = [
+            {"lat": "1"},
+            {"lng": "36.8"},
+            {"lat": "x", "lng": "36.8"},
+            {"lat": "91", "lng": "0"},
+            {"lat": "0", "lng": "0", "radius_km": "501"},
+        ]
+        for params in invalid:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+class CursorPaginationTests(APITestCase):
+    url = "/api/waste/listings/"
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.user = make_user("pager")
+        self.listings = [make_listing(self.user, title=f"Lot {index}") for index in range(7)]
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["id"] for row in response.data["results"]]
+
+    def walk(self, url, on_page=None):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            seen.extend(self.ids(response))
+            if on_page:
+                on_page()
+            url = response.data["next"]
+        return seen
+
+    def test_pages_are_stable_across_inserts(self):
+        expected = [listing.pk for listing in reversed(self.listings)]
+        seen = self.walk(f"{self.url}?pagination=cursor&page_size=2", lambda: make_listing(self.user))
+        self.assertEqual(seen, expected)
+
+    def test_ties_on_created_at_are_broken_by_id(self):
+        WasteListing.objects.update(created_at=timezone.now())
+        seen = self.walk(f"{self.url}?pagination=cursor&page_size=3")
+        self.assertEqual(seen, sorted((listing.pk for listing in self.listings), reverse=True))
+
+    def test_previous_link_returns_the_page_before(self):
+        first = self.client.get(self.url, {"pagination": "cursor", "page_size": 3})
+        second = self.client.get(first.data["next"])
+        self.assertEqual(self.ids(self.client.get(second.data["previous"])), self.ids(first))
+        self.assertIsNone(first.data["previous"])
+
+    def test_invalid_cursor(self):
+        for cursor in ("not-a-cursor", "eyJwIjpbMV19"):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(self.url, {"cursor": cursor}).status_code, 404)
+
+    def test_cursor_mode_refuses_other_orderings(self):
+        for params in ({"q": "lot"}, {"lat": -1.2676, "lng": 36.8108, "ordering": "distance"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, {**params, "pagination": "cursor"}).status_code, 400)
+                self.assertEqual(self.client.get(self.url, params).status_code, 200)
+        near = {"lat": -1.2676, "lng": 36.8108, "pagination": "cursor"}
+        self.assertEqual(len(self.ids(self.client.get(self.url, near))), 7)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.seller = make_user("seller")
+        self.listing = make_listing(self.seller)
+        self.client.force_authenticate(self.seller)
+
+    def test_unchanged_listings_are_not_modified(self):
+        first = self.client.get("/api/waste/listings/my/")
+        self.assertEqual(first.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get("/api/waste/listings/my/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(len(queries), 1)
+
+    def test_changes_produce_a_new_etag(self):
+        etag = self.client.get("/api/waste/listings/my/")["ETag"]
+        WasteImage.objects.create(listing=self.listing, image="waste_images/new.jpg")
+        response = self.client.get("/api/waste/listings/my/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_depends_on_query_string(self):
+        etag = self.client.get("/api/waste/listings/my/")["ETag"]
+        response = self.client.get("/api/waste/listings/my/?page=1", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_transactions_follow_listing_changes(self):
+        buyer = make_user("buyer", role="buyer")
+        Transaction.objects.create(
+            listing=self.listing, buyer=buyer, seller=self.seller, quantity=1, total_amount="12.50"
+        )
+        self.client.force_authenticate(buyer)
+        etag = self.client.get("/api/waste/transactions/my/")["ETag"]
+        self.assertEqual(
+            self.client.get("/api/waste/transactions/my/", HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        WasteListing.objects.filter(pk=self.listing.pk).update(title="Sorted PET bottles", updated_at=timezone.now())
+        self.assertEqual(
+            self.client.get("/api/waste/transactions/my/", HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_deletions_change_the_etag_and_last_modified_is_not_sent(self):
+        make_listing(self.seller, title="Second lot")
+        first = self.client.get("/api/waste/listings/my/")
+        self.assertNotIn("Last-Modified", first)
+        self.listing.delete()
+        response = self.client.get("/api/waste/listings/my/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 1)
+
+    def test_transactions_follow_renamed_parties(self):
+        buyer = make_user("buyer", role="buyer")
+        Transaction.objects.create(
+            listing=self.listing, buyer=buyer, seller=self.seller, quantity=1, total_amount="12.50"
+        )
+        for party in (buyer, self.seller):
+            with self.subTest(party=party.username):
+                etag = self.client.get("/api/waste/transactions/my/")["ETag"]
+                User.objects.filter(pk=party.pk).update(
+                    username=f"{party.username}-renamed", updated_at=timezone.now() + datetime.timedelta(seconds=1)
+                )
+                response = self.client.get("/api/waste/transactions/my/", HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+
+@skipUnless(connection.vendor == "sqlite", "checks SQLite's EXPLAIN QUERY PLAN output")
+class QueryPlanTests(APITestCase):
+    """Endpoint queries must be answered from indexes: no full table scans, no sorts."""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.seller = make_user("seller")
+        self.buyer = make_user("buyer", role="buyer")
+        for index in range(3):
+            listing = make_listing(self.seller, title=f"Listing {index}")
+            WasteImage.objects.create(listing=listing, image=f"waste_images/{index}.jpg")
+            Transaction.objects.create(
+                listing=listing, buyer=self.buyer, seller=self.seller, quantity=1, total_amount="12.50"
+            )
+
+    def assertIndexedPlans(self, url, user=None, allow_sort=False):
+        self.client.force_authenticate(user)
+        with capture_selects() as statements:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(statements)
+        for sql, params in statements:
+            self.assertEqual(plan_problems(sql, params, allow_sort=allow_sort), [], f"{url} ran {sql}")
+        return response
+
+    def test_listing_feed(self):
+        self.assertIndexedPlans("/api/waste/listings/")
+        self.assertIndexedPlans("/api/waste/listings/?type=plastic")
+        self.assertIndexedPlans("/api/waste/listings/?location=West&min_quantity=10")
+
+    def test_listing_feed_cursor_pages(self):
+        response = self.assertIndexedPlans("/api/waste/listings/?pagination=cursor&page_size=1")
+        self.assertIndexedPlans(response.data["next"])
+        self.assertIndexedPlans("/api/waste/listings/?pagination=cursor&page_size=1&type=plastic&count=false")
+
+    def test_listing_feed_search_and_near(self):
+        # Relevance and distance are computed per row, and a radius covers several
+        # geohash ranges, so these sort their (index-selected) candidates.
+        self.assertIndexedPlans("/api/waste/listings/?q=bottles", allow_sort=True)
+        self.assertIndexedPlans("/api/waste/listings/?lat=-1.27&lng=36.81&radius_km=5", allow_sort=True)
+
+    def test_my_listings(self):
+        self.assertIndexedPlans("/api/waste/listings/my/", self.seller)
+
+    def test_my_transactions(self):
+        self.assertIndexedPlans("/api/waste/transactions/my/", self.buyer)
+        self.assertIndexedPlans("/api/waste/transactions/my/?page=1", self.seller)
+
+    def test_expired_reservation_sweep(self):
+        with capture_selects() as statements:
+            purchases.release_expired()
+        for sql, params in statements:
+            self.assertEqual(plan_problems(sql, params), [], sql)
+
+
+class CompiledSerializerTests(APITestCase):
+    """The compiled list path must render exactly what DRF's field-by-field path renders."""
+
+    def setUp(self):
+        self.seller = make_user("seller")
+        self.buyer = make_user("buyer", role="buyer")
+        plain = make_listing(self.seller, latitude=None, longitude=None, price_per_unit="7")
+        pictured = make_listing(self.seller, title="Crushed cans", type="metal", quantity=12.75)
+        WasteImage.objects.create(listing=pictured, image="waste_images/cans.jpg", caption="Front")
+        WasteImage.objects.create(listing=pictured, image="waste_images/cans-2.jpg")
+        Transaction.objects.create(listing=plain, buyer=self.buyer, seller=self.seller, quantity=2, total_amount="14")
+        Transaction.objects.create(
+            listing=pictured,
+            buyer=self.buyer,
+            seller=self.seller,
+            quantity=1.5,
+            total_amount="99.99",
+            pickup_date=timezone.now(),
+            delivery_address="Ngong Road",
+        )
+        self.context = {"request": APIRequestFactory().get("/api/waste/listings/")}
+
+    def assertSameJSON(self, serializer_class, objects):
+        serializer = serializer_class(objects, many=True, context=self.context)
+        self.assertIsInstance(serializer, CompiledListSerializer)
+        compiled = serializer.data
+        reference = ListSerializer(objects, child=serializer_class(), context=self.context).data
+        self.assertEqual(JSONRenderer().render(compiled), JSONRenderer().render(reference))
+        return compiled
+
+    def test_listings(self):
+        listings = WasteListing.objects.select_related("user").prefetch_related("images").order_by("id")
+        data = self.assertSameJSON(WasteListingSerializer, listings)
+        self.assertEqual(data[0]["price_per_unit"], "7.00")
+        self.assertEqual(len(data[1]["images"]), 2)
+        self.assertNotIn("distance_km", data[0])
+
+    def test_listings_near(self):
+        listings = WasteListing.objects.prefetch_related("images").near(-1.2676, 36.8108, 5)
+        self.assertIn("distance_km", self.assertSameJSON(WasteListingSerializer, list(listings))[0])
+
+    def test_transactions(self):
+        transactions = Transaction.objects.select_related("listing__user", "buyer", "seller").order_by("id")
+        self.assertSameJSON(TransactionSerializer, transactions.prefetch_related("listing__images"))
+        with timezone.override("UTC"):
+            data = self.assertSameJSON(TransactionSerializer, transactions)
+        self.assertTrue(data[1]["pickup_date"].endswith("Z"))
+
+
+class StreamedListTests(APITestCase):
+    """The paginated envelope and ``?stream=ndjson`` body of my listings and my transactions."""
+
+    def setUp(self):
+        self.seller = make_user("seller")
+        self.buyer = make_user("buyer", role="buyer")
+        self.listings = [make_listing(self.seller, title=f"Lot {index}") for index in range(21)]
+        self.transactions = [
+            Transaction.objects.create(
+                listing=listing, buyer=self.buyer, seller=self.seller, quantity=1, total_amount="12.50"
+            )
+            for listing in self.listings[:3]
+        ]
+        make_listing(self.buyer)
+
+    def ndjson(self, url, **params):
+        response = self.client.get(url, {"stream": "ndjson", **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+    def test_my_listings_pages(self):
+        self.client.force_authenticate(self.seller)
+        first = self.client.get("/api/waste/listings/my/")
+        self.assertEqual((first.data["count"], len(first.data["results"])), (21, 20))
+        self.assertIsNone(first.data["previous"])
+        second = self.client.get(first.data["next"])
+        self.assertEqual(len(second.data["results"]), 1)
+        self.assertIsNone(second.data["next"])
+        seen = {row["id"] for row in first.data["results"] + second.data["results"]}
+        self.assertEqual(seen, {listing.pk for listing in self.listings})
+
+    def test_my_listings_ndjson(self):
+        self.client.force_authenticate(self.seller)
+        rows = self.ndjson("/api/waste/listings/my/", fields="id,title")
+        self.assertEqual(len(rows), 21)
+        self.assertEqual({row["id"] for row in rows}, {listing.pk for listing in self.listings})
+        self.assertEqual(set(rows[0]), {"id", "title"})
+
+    def test_my_transactions_pages_and_ndjson(self):
+        for user in (self.buyer, self.seller):
+            with self.subTest(user=user.username):
+                self.client.force_authenticate(user)
+                page = self.client.get("/api/waste/transactions/my/")
+                self.assertEqual((page.data["count"], page.data["next"], page.data["previous"]), (3, None, None))
+                expected = {transaction.pk for transaction in self.transactions}
+                self.assertEqual({row["id"] for row in page.data["results"]}, expected)
+                rows = self.ndjson("/api/waste/transactions/my/")
+                # Newest first, with the listing embedded.
+                self.assertEqual([row["id"] for row in rows], sorted(expected, reverse=True))
+                self.assertEqual(rows[0]["listing"]["title"], self.listings[2].title)
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.seller = make_user("seller")
+        self.buyer = make_user("buyer", role="buyer")
+        listing = make_listing(self.seller)
+        WasteImage.objects.create(listing=listing, image="waste_images/bottles.jpg", caption="Front")
+        Transaction.objects.create(listing=listing, buyer=self.buyer, seller=self.seller, quantity=1, total_amount="9")
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data["results"], [query["sql"] for query in queries]
+
+    def test_feed_fields(self):
+        rows, queries = self.get("/api/waste/listings/?fields=id,title,price_per_unit,images.image")
+        self.assertEqual(list(rows[0]), ["id", "title", "price_per_unit", "images"])
+        self.assertEqual(list(rows[0]["images"][0]), ["image"])
+        self.assertNotIn('"description"', queries[1])
+        self.assertNotIn("accounts_user", queries[1])
+
+    def test_feed_fields_skip_prefetch(self):
+        rows, queries = self.get("/api/waste/listings/?fields=id,title&pagination=cursor")
+        self.assertEqual(rows, [{"id": rows[0]["id"], "title": "Clean PET bottles"}])
+        self.assertEqual(len(queries), 2)
+
+    def test_transactions_collapse_unexpanded_listing(self):
+        self.client.force_authenticate(self.buyer)
+        rows, queries = self.get("/api/waste/transactions/my/?expand=&fields=id,listing,buyer")
+        transaction = Transaction.objects.get()
+        self.assertEqual(rows, [{"id": transaction.id, "listing": transaction.listing_id, "buyer": str(self.buyer)}])
+        self.assertNotIn("waste_management_wastelisting", queries[-1])
+
+        rows, _ = self.get("/api/waste/transactions/my/?fields=id,listing.title,listing.images")
+        self.assertEqual(rows[0]["listing"]["title"], "Clean PET bottles")
+        self.assertEqual(rows[0]["listing"]["images"][0]["caption"], "Front")
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get("/api/waste/listings/?fields=id,secret&expand=title")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {"fields", "expand"})
+
+
+class PurchaseTests(APITestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.seller = make_user("seller")
+        self.buyer = make_user("buyer", role="buyer")
+        self.listing = make_listing(self.seller, quantity=10)
+        self.client.force_authenticate(self.buyer)
+
+    def purchase(self, quantity, listing=None):
+        listing = listing or self.listing
+        return self.client.post(f"/api/waste/listings/{listing.id}/purchase/", {"quantity": quantity}, format="json")
+
+    def test_purchase_reserves_stock(self):
+        response = self.purchase(4)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["status"], "pending")
+        self.assertEqual(response.data["total_amount"], "50.00")
+        self.assertIsNotNone(response.data["reserved_until"])
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.quantity, self.listing.status), (6, "available"))
+
+        self.assertEqual(self.purchase(6).status_code, 201)
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.quantity, self.listing.status), (0, "reserved"))
+
+        response = self.purchase(1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["status"], "reserved")
+
+    def test_purchase_errors(self):
+        self.assertEqual(self.purchase(11).status_code, 409)
+        self.assertEqual(self.purchase(0).status_code, 400)
+        self.assertEqual(self.client.post("/api/waste/listings/999/purchase/", {"quantity": 1}).status_code, 404)
+        self.client.force_authenticate(self.seller)
+        self.assertEqual(self.purchase(1).status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_purchase_invalidates_feed(self):
+        self.assertEqual(self.client.get("/api/waste/listings/")["X-Cache"], "MISS")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purchase(10)
+        response = self.client.get("/api/waste/listings/")
+        self.assertEqual((response["X-Cache"], response.data["count"]), ("MISS", 0))
+
+    def test_confirming_every_hold_sells_the_listing(self):
+        first = self.purchase(3).data["id"]
+        second = self.purchase(7).data["id"]
+        url = "/api/waste/transactions/{}/confirm/"
+        response = self.client.post(url.format(first), {"payment_reference": "MPESA-1"}, format="json")
+        self.assertEqual((response.status_code, response.data["status"]), (200, "confirmed"))
+        self.assertEqual(response.data["payment_reference"], "MPESA-1")
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.status, "reserved")
+
+        self.client.post(url.format(second))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.status, "sold")
+        self.assertEqual(self.client.post(url.format(second)).status_code, 409)
+        self.client.force_authenticate(self.seller)
+        self.assertEqual(self.client.post(url.format(first)).status_code, 404)
+
+    def test_expired_reservations_are_released(self):
+        held = self.purchase(10).data["id"]
+        Transaction.objects.filter(pk=held).update(reserved_until=timezone.now() - datetime.timedelta(minutes=1))
+        self.assertEqual(self.client.post(f"/api/waste/transactions/{held}/confirm/").status_code, 409)
+
+        output = StringIO()
+        call_command("release_reservations", stdout=output)
+        self.assertIn("Released 1", output.getvalue())
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.quantity, self.listing.status), (10, "available"))
+        self.assertEqual(Transaction.objects.get(pk=held).status, "cancelled")
+        self.assertEqual(purchases.release_expired(), 0)
+
+    def test_purchase_releases_expired_holds_first(self):
+        held = self.purchase(10).data["id"]
+        Transaction.objects.filter(pk=held).update(reserved_until=timezone.now() - datetime.timedelta(minutes=1))
+        self.assertEqual(self.purchase(8).status_code, 201)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.quantity, 2)
+
+
+@contextmanager
+def sqlite_on_disk(alias="default"):
+    """Run the block against an on-disk copy of the in-memory SQLite test database.
+
+    Threads sharing an in-memory database fail at once on its table locks,
+    whereas on disk they wait for the write lock as production connections do.
+    Every thread's connection, this one's included, opens the copy.
+    """
+    memory = connections[alias]
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "concurrency.sqlite3")
+    memory.ensure_connection()
+    with sqlite3.connect(path) as target:
+        memory.connection.backup(target)
+    target.close()
+    name = memory.settings_dict["NAME"]
+    # Shared with the connections other threads create for the alias.
+    memory.settings_dict["NAME"] = path
+    connections[alias] = connections.create_connection(alias)
+    try:
+        yield
+    finally:
+        connections[alias].close()
+        connections[alias] = memory
+        memory.settings_dict["NAME"] = name
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@skipUnless(connection.vendor == "sqlite", "copies the in-memory SQLite test database to disk")
+class PurchaseConcurrencyTests(TransactionTestCase):
+    """Many threads buying the same listing at once must never oversell it."""
+
+    BUYERS = 8
+    ATTEMPTS = 5
+
+    def test_concurrent_purchases_do_not_oversell(self):
+        with sqlite_on_disk():
+            self.buy_concurrently()
+
+    def buy_concurrently(self):
+        seller = make_user(f"seller-{next(_phones)}")
+        buyers = [make_user(f"buyer-{next(_phones)}", role="buyer") for _ in range(self.BUYERS)]
+        listing = make_listing(seller, quantity=25)
+        start = threading.Barrier(self.BUYERS)
+        outcomes, errors = [], []
+
+        def buy(buyer):
+            try:
+                start.wait()
+                for _ in range(self.ATTEMPTS):
+                    outcomes.append(purchases.reserve(listing.pk, buyer, 1.0) is not None)
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=buy, args=(buyer,)) for buyer in buyers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        listing.refresh_from_db()
+        self.assertEqual(outcomes.count(True), 25)
+        self.assertEqual(Transaction.objects.filter(listing=listing).count(), 25)
+        self.assertEqual((listing.quantity, listing.status), (0, "reserved"))
+
+
+def make_upload(name="photo.jpg", size=(2000, 1500), mode="RGB", image_format="JPEG"):
+    buffer = BytesIO()
+    Image.new(mode, size, "green").save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f"image/{image_format.lower()}")
+
+
+class ImageVariantTests(APITestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.listing = make_listing(make_user("seller"))
+
+    def variant_sizes(self, image):
+        sizes = {}
+        for variant, name in image.variants.items():
+            with Image.open(os.path.join(self.media_root, name)) as rendered:
+                sizes[variant] = (rendered.format, rendered.size)
+        return sizes
+
+    @override_settings(IMAGE_VARIANTS_SYNC=True)
+    def test_variants_are_rendered_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = WasteImage.objects.create(listing=self.listing, image=make_upload())
+            self.assertEqual(image.variants, {})
+        image.refresh_from_db()
+        self.assertEqual(
+            self.variant_sizes(image),
+            {"thumb": ("JPEG", (160, 120)), "card": ("JPEG", (640, 480)), "full": ("JPEG", (1600, 1200))},
+        )
+
+        row = self.client.get("/api/waste/listings/").data["results"][0]["images"][0]
+        self.assertEqual(set(row["variants"]), {"thumb", "card", "full"})
+        self.assertRegex(row["variants"]["thumb"], r"/media/cas/\w\w/\w\w/variants/[0-9a-f]{64}-thumb\.jpg$")
+
+    @override_settings(IMAGE_VARIANTS_SYNC=True)
+    def test_small_transparent_images(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = WasteImage.objects.create(
+                listing=self.listing, image=make_upload("logo.png", (300, 100), "RGBA", "PNG")
+            )
+        image.refresh_from_db()
+        sizes = self.variant_sizes(image)
+        self.assertEqual(sizes["thumb"], ("JPEG", (160, 53)))
+        # Never enlarged.
+        self.assertEqual(sizes["full"], ("JPEG", (300, 100)))
+
+    def test_backfill_command(self):
+        # Without on-commit callbacks nothing is rendered on save.
+        images = [WasteImage.objects.create(listing=self.listing, image=make_upload()) for _ in range(3)]
+        WasteImage.objects.create(listing=self.listing, image="waste_images/missing.jpg")
+        output = StringIO()
+        with self.assertLogs("waste_management.image_pipeline", "WARNING"):
+            call_command("generate_image_variants", workers=2, stdout=output)
+        self.assertIn("Rendered 3, failed 1.", output.getvalue())
+        for image in images:
+            image.refresh_from_db()
+            self.assertEqual(self.variant_sizes(image)["card"], ("JPEG", (640, 480)))
+
+    def test_background_callback_closes_its_connections(self):
+        image = WasteImage.objects.create(listing=self.listing, image="waste_images/photo.jpg")
+        future = Future()
+        future.set_result({"thumb": "variants/photo-thumb.jpg"})
+        with mock.patch.object(image_pipeline, "connections") as connections_, mock.patch.object(
+            image_pipeline, "close_old_connections"
+        ) as close_old, mock.patch.object(image_pipeline, "store") as store:
+            callback = image_pipeline._finished(image.pk, image.image.name)
+            callback(future)
+            connections_.close_all.assert_not_called()
+            thread = threading.Thread(target=callback, args=(future,))
+            thread.start()
+            thread.join()
+        self.assertEqual(store.call_count, 2)
+        close_old.assert_called_once_with()
+        connections_.close_all.assert_called_once_with()
+
+
+# Inline, so no render outlives the test's MEDIA_ROOT.
+@override_settings(IMAGE_VARIANTS_SYNC=True)
+class ContentAddressedStorageTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.listing = make_listing(make_user("seller"))
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _, names in os.walk(self.media_root)
+            for name in names
+        )
+
+    def test_identical_uploads_are_stored_once(self):
+        first = WasteImage.objects.create(listing=self.listing, image=make_upload("a.jpg"))
+        second = WasteImage.objects.create(listing=self.listing, image=make_upload("b.jpg"))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r"^cas/\w\w/\w\w/[0-9a-f]{64}\.jpg$")
+        self.assertEqual(self.stored_files(), [first.image.name])
+        self.assertEqual(Blob.objects.get().references, 2)
+
+    def test_file_is_deleted_with_its_last_reference(self):
+        images = [WasteImage.objects.create(listing=self.listing, image=make_upload()) for _ in range(2)]
+        name = images[0].image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            images[0].delete()
+        self.assertEqual(self.stored_files(), [name])
+        self.assertEqual(Blob.objects.get().references, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            images[1].delete()
+        self.assertEqual(self.stored_files(), [])
+        self.assertFalse(Blob.objects.exists())
+
+    def test_replaced_image_is_released(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = WasteImage.objects.create(listing=self.listing, image=make_upload())
+        previous = storage.digest_of(image.image.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            image.image = make_upload(size=(800, 600))
+            image.save()
+        self.assertIn(image.image.name, self.stored_files())
+        self.assertFalse([name for name in self.stored_files() if previous in name])
+        self.assertEqual(list(Blob.objects.values_list("name", "references")), [(image.image.name, 1)])
+
+    def test_duplicates_share_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = WasteImage.objects.create(listing=self.listing, image=make_upload())
+        with mock.patch.object(imaging, "render_variants", side_effect=AssertionError("rendered twice")):
+            with self.captureOnCommitCallbacks(execute=True):
+                second = WasteImage.objects.create(listing=self.listing, image=make_upload())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(set(second.variants), {"thumb", "card", "full"})
+        self.assertEqual(first.variants, second.variants)
+
+        # Variants go with the blob, once nothing uses it.
+        with self.captureOnCommitCallbacks(execute=True):
+            WasteImage.objects.all().delete()
+        self.assertEqual(self.stored_files(), [])
+
+    def test_served_with_far_future_cache_headers(self):
+        image = WasteImage.objects.create(listing=self.listing, image=make_upload())
+        response = self.client.get(image.image.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(b"".join(response.streaming_content), image.image.read())
+
+        response = self.client.get(image.image.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get("/media/cas/../../settings.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/cas/00/00/" + "0" * 64 + ".jpg").status_code, 404)
+
+
+class FailingStream:
+    """A request body whose connection drops after ``limit`` bytes."""
+
+    def __init__(self, data, limit):
+        self.data, self.limit, self.position = data, limit, 0
+
+    def read(self, size):
+        if self.position >= self.limit:
+            raise UnreadablePostError("connection reset")
+        chunk = self.data[self.position:min(self.position + size, self.limit)]
+        self.position += len(chunk)
+        return chunk
+
+
+@override_settings(IMAGE_VARIANTS_SYNC=True)
+class ChunkedUploadTests(APITestCase):
+    def setUp(self):
+        scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scratch)
+        self.sessions_dir = os.path.join(scratch, "uploads")
+        files = override_settings(MEDIA_ROOT=os.path.join(scratch, "media"), UPLOAD_SESSION_DIR=self.sessions_dir)
+        files.enable()
+        self.addCleanup(files.disable)
+        self.seller = make_user("seller")
+        self.listing = make_listing(self.seller)
+        self.photo = make_upload(size=(400, 300)).read()
+        self.client.force_authenticate(self.seller)
+
+    def start(self, size=None, listing=None):
+        return self.client.post(
+            f"/api/waste/listings/{(listing or self.listing).pk}/uploads/",
+            {"filename": "../crates.JPG", "size": len(self.photo) if size is None else size, "caption": "Crates"},
+            format="json",
+        )
+
+    def put(self, upload_id, first, data, size=None):
+        return self.client.put(
+            f"/api/waste/uploads/{upload_id}/",
+            data,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {first}-{first + len(data) - 1}/{size or len(self.photo)}",
+        )
+
+    def test_upload_in_chunks_and_resume(self):
+        response = self.start()
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data["filename"], response.data["offset"]), ("crates.JPG", 0))
+        upload_id = response.data["id"]
+
+        self.assertEqual(self.put(upload_id, 0, self.photo[:1000]).data["offset"], 1000)
+        # A repeated chunk is refused with the offset to continue from.
+        response = self.put(upload_id, 0, self.photo[:1000])
+        self.assertEqual((response.status_code, response.data["offset"]), (409, 1000))
+        self.assertEqual(self.client.post(f"/api/waste/uploads/{upload_id}/complete/").status_code, 409)
+
+        offset = self.client.get(f"/api/waste/uploads/{upload_id}/").data["offset"]
+        self.assertEqual(self.put(upload_id, offset, self.photo[offset:]).data["offset"], len(self.photo))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/api/waste/uploads/{upload_id}/complete/")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["caption"], "Crates")
+
+        image = self.listing.images.get()
+        self.assertTrue(image.image.name.startswith("cas/"))
+        self.assertEqual(set(image.variants), {"thumb", "card", "full"})
+        with image.image.open("rb") as stored:
+            self.assertEqual(stored.read(), self.photo)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(self.sessions_dir), [])
+
+    def test_bytes_received_before_a_dropped_connection_are_kept(self):
+        session = uploads.start(self.seller, self.listing, "photo.jpg", len(self.photo))
+        half = len(self.photo) // 2
+        self.assertEqual(uploads.append(session, 0, len(self.photo), FailingStream(self.photo, half)), half)
+        self.assertEqual(self.client.get(f"/api/waste/uploads/{session.pk}/").data["offset"], half)
+        self.assertEqual(self.put(session.pk, half, self.photo[half:]).data["offset"], len(self.photo))
+        self.assertEqual(self.client.post(f"/api/waste/uploads/{session.pk}/complete/").status_code, 201)
+
+    def test_invalid_uploads_are_refused(self):
+        self.assertEqual(self.start(size=0).status_code, 400)
+        with override_settings(IMAGE_UPLOAD_MAX_BYTES=100):
+            self.assertEqual(self.start().status_code, 400)
+        other = make_listing(make_user("other"))
+        self.assertEqual(self.start(listing=other).status_code, 404)
+
+        upload_id = self.start().data["id"]
+        self.assertEqual(self.put(upload_id, 0, self.photo + b"extra").status_code, 413)
+        self.assertEqual(self.put(upload_id, 0, self.photo + b"extra", size=len(self.photo) + 5).status_code, 400)
+        self.client.force_authenticate(other.user)
+        self.assertEqual(self.client.get(f"/api/waste/uploads/{upload_id}/").status_code, 404)
+
+        self.client.force_authenticate(self.seller)
+        # Refused at the first chunk, and the upload is dropped.
+        response = self.put(upload_id, 0, b"%PDF-1.7 not a photo")
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_stale_sessions_are_cleared(self):
+        session = uploads.start(self.seller, self.listing, "photo.jpg", len(self.photo))
+        UploadSession.objects.filter(pk=session.pk).update(updated_at=timezone.now() - datetime.timedelta(days=2))
+        fresh = uploads.start(self.seller, self.listing, "photo.jpg", len(self.photo))
+        output = StringIO()
+        call_command("clear_upload_sessions", stdout=output)
+        self.assertIn("Removed 1 stale upload(s).", output.getvalue())
+        self.assertEqual(list(UploadSession.objects.values_list("pk", flat=True)), [fresh.pk])
+        self.assertEqual(os.listdir(self.sessions_dir), [f"{fresh.pk}.part"])
+
+
+def listing_row(**overrides):
+    return {
+        "title": "Crushed glass",
+        "description": "Sorted cullet",
+        "type": "glass",
+        "quantity": 120,
+        "location": "Westlands",
+        "latitude": -1.2676,
+        "longitude": 36.8108,
+        "price_per_unit": "4.50",
+        **overrides,
+    }
+
+
+class ListingImportTests(APITestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.seller = make_user("seller")
+        self.client.force_authenticate(self.seller)
+
+    def test_json_import_keeps_good_rows(self):
+        rows = [listing_row(title=f"Glass {index}") for index in range(5)]
+        rows[1]["type"] = "uranium"
+        rows[3] = "not an object"
+        self.assertEqual(self.client.get("/api/waste/listings/")["X-Cache"], "MISS")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/waste/listings/import/", rows, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [2, 4])
+        self.assertIn("type", response.data["errors"][0]["errors"])
+
+        ids = [pk for first, last in response.data["id_ranges"] for pk in range(first, last + 1)]
+        listings = WasteListing.objects.filter(pk__in=ids)
+        self.assertEqual(sorted(listings.values_list("title", flat=True)), ["Glass 0", "Glass 2", "Glass 4"])
+        self.assertTrue(all(listing.user_id == self.seller.pk and listing.geohash for listing in listings))
+        # bulk_create sends no signals: the feed cache and search index are updated by the importer.
+        response = self.client.get("/api/waste/listings/?q=glass")
+        self.assertEqual((response["X-Cache"], response.data["count"]), ("MISS", 3))
+
+    def test_csv_import(self):
+        lines = ["title,description,type,quantity,location,latitude,longitude,price_per_unit"]
+        lines += [f"Bottles {index},Clear PET,plastic,{index + 1},Kilimani,,,2.00" for index in range(25)]
+        lines.append("Broken,Missing price,plastic,3,Kilimani,,,")
+        upload = SimpleUploadedFile("listings.csv", "\n".join(lines).encode(), content_type="text/csv")
+        response = self.client.post("/api/waste/listings/import/", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["created"], 25)
+        self.assertEqual(
+            response.data["errors"], [{"row": 26, "errors": {"price_per_unit": ["This field is required."]}}]
+        )
+        self.assertEqual(WasteListing.objects.filter(latitude=None, geohash="").count(), 25)
+
+    @override_settings(IMPORT_MAX_ROWS=10, IMPORT_MAX_BYTES=2000)
+    def test_requests_are_capped(self):
+        rows = [listing_row(title=f"Glass {index}") for index in range(11)]
+        response = self.client.post("/api/waste/listings/import/", rows, format="json")
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(WasteListing.objects.exists())
+        response = self.client.post("/api/waste/listings/import/", rows[:10], format="json")
+        self.assertEqual((response.status_code, response.data["created"]), (201, 10))
+
+        header = "title,description,type,quantity,location,price_per_unit"
+        upload = SimpleUploadedFile("listings.csv", (header + "\n" + "x" * 2000).encode(), content_type="text/csv")
+        response = self.client.post("/api/waste/listings/import/", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 413)
+
+    def test_id_ranges(self):
+        result = importers.ImportResult(ids=[7, 3, 4, 5, 9, 10])
+        self.assertEqual(result.id_ranges(), [[3, 5], [7, 7], [9, 10]])
+
+    def test_one_insert_per_batch(self):
+        rows = [listing_row(title=f"Glass {index}") for index in range(25)]
+        with CaptureQueriesContext(connection) as queries:
+            result = importers.import_listings(self.seller, iter(rows), batch_size=10)
+        self.assertEqual((result.created, result.errors), (25, []))
+        table = WasteListing._meta.db_table
+        inserts = [query for query in queries.captured_queries if query["sql"].startswith(f'INSERT INTO "{table}"')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_nothing_valid(self):
+        response = self.client.post("/api/waste/listings/import/", {"title": "x"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/waste/listings/import/", [listing_row(quantity="lots")], format="json")
+        self.assertEqual((response.status_code, response.data["created"]), (400, 0))
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as source:
+            json.dump([listing_row(), listing_row(price_per_unit="-")], source)
+        self.addCleanup(os.unlink, source.name)
+        output, errors = StringIO(), StringIO()
+        call_command("import_listings", source.name, user=self.seller.username, stdout=output, stderr=errors)
+        self.assertIn("Imported 1 listing(s), 1 row(s) failed", output.getvalue())
+        self.assertIn("Row 2:", errors.getvalue())
+        self.assertEqual(WasteListing.objects.filter(user=self.seller).count(), 1)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.seller = make_user("seller")
+        self.buyer = make_user("buyer", role="buyer")
+        self.other = make_user("other", role="buyer")
+        self.listing = make_listing(self.seller, title="Copper, stripped")
+        self.transactions = [
+            Transaction.objects.create(
+                listing=self.listing, buyer=buyer, seller=self.seller, quantity=2, total_amount="25.00", status=state
+            )
+            for buyer, state in ((self.buyer, "pending"), (self.buyer, "completed"), (self.other, "completed"))
+        ]
+        make_listing(self.other)
+        self.client.force_authenticate(self.buyer)
+
+    def export(self, path, **params):
+        response = self.client.get(f"/api/waste/{path}/export/", params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode(), response
+
+    def test_transactions_as_csv(self):
+        body, response = self.export("transactions")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertRegex(response["Content-Disposition"], r'attachment; filename="transactions-\d{8}\.csv"')
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual([int(row["id"]) for row in rows], [t.pk for t in self.transactions[:2]])
+        self.assertEqual(rows[0]["listing_title"], "Copper, stripped")
+        self.assertEqual((rows[0]["buyer"], rows[0]["total_amount"], rows[0]["pickup_date"]), ("buyer", "25.00", ""))
+
+        body, _ = self.export("transactions", status="completed")
+        self.assertEqual(len(body.splitlines()), 2)
+        # The seller sees both buyers' purchases.
+        self.client.force_authenticate(self.seller)
+        self.assertEqual(len(self.export("transactions")[0].splitlines()), 4)
+
+    def test_csv_cells_cannot_start_formulas(self):
+        titles = ["=HYPERLINK(\"http://x\")", "+1", "-1", "@SUM(A1)", "\tTab", "\rReturn", "Plain - text"]
+        self.client.force_authenticate(self.other)
+        WasteListing.objects.filter(user=self.other).delete()
+        for title in titles:
+            make_listing(self.other, title=title)
+        rows = list(csv.DictReader(StringIO(self.export("listings")[0], newline="")))
+        self.assertEqual(
+            [row["title"] for row in rows], [f"'{title}" for title in titles[:-1]] + [titles[-1]]
+        )
+        ndjson = self.export("listings", output="ndjson")[0]
+        self.assertEqual([json.loads(line)["title"] for line in ndjson.splitlines()], titles)
+
+    def test_listings_as_ndjson(self):
+        self.client.force_authenticate(self.seller)
+        body, response = self.export("listings", output="ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [(row["id"], row["user"], row["price_per_unit"]) for row in rows], [(self.listing.pk, "seller", "12.50")]
+        )
+
+    def test_staff_export_everything_in_one_query(self):
+        staff = make_user("staff")
+        staff.is_staff = True
+        staff.save(update_fields=["is_staff"])
+        self.client.force_authenticate(staff)
+        with CaptureQueriesContext(connection) as queries:
+            body, _ = self.export("transactions", output="ndjson")
+        self.assertEqual(len(body.splitlines()), 3)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(self.export("listings")[0].splitlines()), 3)
+
+    def test_date_range_and_errors(self):
+        Transaction.objects.filter(pk=self.transactions[0].pk).update(
+            created_at=timezone.now() - datetime.timedelta(days=10)
+        )
+        since = (timezone.now() - datetime.timedelta(days=1)).isoformat()
+        rows = list(csv.DictReader(self.export("transactions", since=since)[0].splitlines()))
+        self.assertEqual([int(row["id"]) for row in rows], [self.transactions[1].pk])
+        self.assertEqual(len(self.export("transactions", until=since)[0].splitlines()), 2)
+
+        for params in ({"status": "lost"}, {"output": "xml"}, {"since": "yesterday"}, {"until": "2000-01-01"}):
+            params.setdefault("since", since)
+            self.assertEqual(self.client.get("/api/waste/transactions/export/", params).status_code, 400, params)
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sales.csv")
+            call_command("export_data", "transactions", status="completed", file=path)
+            with open(path, encoding="utf-8") as exported:
+                self.assertEqual(len(list(csv.DictReader(exported))), 2)
+        output = StringIO()
+        call_command("export_data", "listings", output="ndjson", stdout=output)
+        self.assertEqual(len(output.getvalue().splitlines()), 2)
@@ -0,0 +1,171 @@
+"""Chunked, resumable image uploads.
+
+A client opens an ``UploadSession`` for one of its listings with the file's
+name and size, then sends the bytes in as many ``PUT``s as it likes, each
+starting at the offset the server has. Every chunk is streamed from the
+request into the session's part file, so neither a chunk nor the file is
+ever held in memory, and bytes that arrived before a connection dropped are
+kept: after a failure the client asks for the offset and carries on from
+there instead of starting again.
+
+Nothing beyond the announced size is accepted, and the first bytes must be
+a JPEG, PNG, GIF or WebP signature, so a wrong file is refused at its first
+chunk. ``finish`` checks that Pillow can read the image, then attaches it to
+the listing through the image storage like any other upload.
+"""
+
+import datetime
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image
+
+from .models import UploadSession, WasteImage
+
+EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+READ_SIZE = 64 * 1024
+# Enough of the file to recognise every supported format.
+SIGNATURE_BYTES = 12
+
+
+class UploadError(Exception):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, offset):
+        super().__init__(f"The upload continues at byte {offset}")
+        self.offset = offset
+
+
+class TooLarge(UploadError):
+    pass
+
+
+class UnsupportedType(UploadError):
+    pass
+
+
+class Incomplete(UploadError):
+    pass
+
+
+def is_image_signature(head):
+    return (
+        head.startswith(b"\xff\xd8\xff")
+        or head.startswith(b"\x89PNG\r\n\x1a\n")
+        or head[:6] in (b"GIF87a", b"GIF89a")
+        or (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+    )
+
+
+def part_path(session_id):
+    return os.path.join(settings.UPLOAD_SESSION_DIR, f"{session_id}.part")
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def start(user, listing, filename, size, caption=""):
+    """Open an upload of ``size`` bytes for ``listing``; the new ``UploadSession``."""
+    session = UploadSession.objects.create(user=user, listing=listing, filename=filename, size=size, caption=caption)
+    os.makedirs(settings.UPLOAD_SESSION_DIR, exist_ok=True)
+    open(part_path(session.pk), "wb").close()  # pylint: disable=consider-using-with
+    return session
+
+
+def append(session, offset, length, stream):
+    """Write ``length`` bytes read from ``stream`` at ``offset``; the new offset.
+
+    If the stream ends or fails early, whatever arrived is kept and counted, so
+    the client can resume from the returned (or later queried) offset.
+    """
+    if offset != session.received:
+        raise OffsetMismatch(session.received)
+    if offset + length > session.size:
+        raise TooLarge(f"The upload was announced as {session.size} bytes")
+    written = 0
+    with open(part_path(session.pk), "r+b") as part:
+        part.seek(offset)
+        try:
+            while written < length:
+                chunk = stream.read(min(READ_SIZE, length - written))
+                if not chunk:
+                    break
+                part.write(chunk)
+                written += len(chunk)
+        except OSError:
+            # The client went away mid-chunk (UnreadablePostError): keep what arrived.
+            pass
+        end = offset + written
+        signature_end = min(SIGNATURE_BYTES, session.size)
+        if offset < signature_end <= end:
+            part.seek(0)
+            if not is_image_signature(part.read(SIGNATURE_BYTES)):
+                discard(session)
+                raise UnsupportedType("Only JPEG, PNG, GIF and WebP images can be uploaded")
+    # Conditional, so of two requests racing from the same offset only one counts.
+    if not UploadSession.objects.filter(pk=session.pk, received=offset).update(received=end, updated_at=timezone.now()):
+        current = UploadSession.objects.filter(pk=session.pk).values_list("received", flat=True).first()
+        raise OffsetMismatch(offset if current is None else current)
+    session.received = end
+    return end
+
+
+def finish(session):
+    """Attach the completely received upload to its listing; the new ``WasteImage``."""
+    if session.received != session.size:
+        raise Incomplete(f"{session.received} of {session.size} bytes received")
+    path = part_path(session.pk)
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError) as error:
+        discard(session)
+        raise UnsupportedType("The file is not a readable image") from error
+    with open(path, "rb") as part, transaction.atomic():
+        # Deleted first: a second request finishing the same session finds nothing.
+        deleted, _ = UploadSession.objects.filter(pk=session.pk, received=F("size")).delete()
+        if not deleted:
+            raise Incomplete("The upload is no longer available")
+        image = WasteImage.objects.create(
+            listing_id=session.listing_id, caption=session.caption, image=File(part, name=session.filename)
+        )
+        transaction.on_commit(lambda: _remove(path))
+    return image
+
+
+def discard(session):
+    UploadSession.objects.filter(pk=session.pk).delete()
+    _remove(part_path(session.pk))
+
+
+def clear_stale(now=None):
+    """Remove sessions idle for UPLOAD_SESSION_HOURS and part files left without one; the number removed."""
+    cutoff = (now or timezone.now()) - datetime.timedelta(hours=settings.UPLOAD_SESSION_HOURS)
+    removed = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).only("pk").iterator():
+        discard(session)
+        removed += 1
+    if os.path.isdir(settings.UPLOAD_SESSION_DIR):
+        for entry in os.scandir(settings.UPLOAD_SESSION_DIR):
+            stem, extension = os.path.splitext(entry.name)
+            try:
+                session_id = uuid.UUID(stem)
+            except ValueError:
+                continue
+            modified = datetime.datetime.fromtimestamp(entry.stat().st_mtime, tz=datetime.timezone.utc)
+            # Sessions deleted with their listing or user leave their part file behind.
+            if extension == ".part" and modified < cutoff and not UploadSession.objects.filter(pk=session_id).exists():
+                _remove(entry.path)
+                removed += 1
+    return removed
@@ -3,7 +3,16 @@ from . import views
 
 urlpatterns = [
     path("listings/", views.WasteListingListView.as_view(), name="waste-listings"),
+    path("listings/cache-stats/", views.listing_cache_stats, name="listing-cache-stats"),
     path("listings/create/", views.create_listing, name="create-listing"),
+    path("listings/import/", views.import_listings, name="import-listings"),
+    path("listings/export/", views.export_listings, name="export-listings"),
     path("listings/my/", views.my_listings, name="my-listings"),
+    path("listings/<int:listing_id>/purchase/", views.purchase_listing, name="purchase-listing"),
+    path("listings/<int:listing_id>/uploads/", views.start_upload, name="start-upload"),
+    path("uploads/<uuid:upload_id>/", views.upload_session, name="upload-session"),
+    path("uploads/<uuid:upload_id>/complete/", views.complete_upload, name="complete-upload"),
+    path("transactions/export/", views.export_transactions, name="export-transactions"),
     path("transactions/my/", views.my_transactions, name="my-transactions"),
+    path("transactions/<int:transaction_id>/confirm/", views.confirm_transaction, name="confirm-transaction"),
 ]
@@ -1,16 +1,57 @@
+import posixpath
+import re
+
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from django.db import models
-from .models import WasteListing, Transaction
-from .serializers import WasteListingSerializer, WasteListingCreateSerializer, TransactionSerializer
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_safe
+from trashtrotreasure.conditional import conditional, queryset_validators
+from trashtrotreasure.fieldsets import CONTEXT_KEY, FieldSet, narrow
+from trashtrotreasure.pagination import PageOrKeysetPagination, paginated_response
+from . import cache, exports, importers, purchases, search, storage, uploads
+from .models import WasteListing, Transaction, UploadSession
+from .serializers import (
+    ConfirmPurchaseSerializer,
+    ExportFilterSerializer,
+    ListingExportSerializer,
+    PurchaseSerializer,
+    TransactionExportSerializer,
+    TransactionSerializer,
+    UploadSessionSerializer,
+    WasteImageSerializer,
+    WasteListingCreateSerializer,
+    WasteListingSerializer,
+)
+
+
+DEFAULT_RADIUS_KM = 10.0
+MAX_RADIUS_KM = 500.0
+
+
+def _float_param(params, name, minimum, maximum):
+    try:
+        value = float(params[name])
+    except KeyError:
+        raise ValidationError({name: "Required with lat and lng."}) from None
+    except (TypeError, ValueError):
+        raise ValidationError({name: "A number is required."}) from None
+    if not minimum <= value <= maximum:
+        raise ValidationError({name: f"Must be between {minimum:g} and {maximum:g}."})
+    return value
 
 
 class WasteListingListView(generics.ListAPIView):
-    queryset = WasteListing.objects.filter(status="available")
+    queryset = WasteListing.objects.filter(status="available").select_related("user").prefetch_related("images")
     serializer_class = WasteListingSerializer
     permission_classes = [AllowAny]
+    pagination_class = PageOrKeysetPagination
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -25,7 +66,46 @@ class WasteListingListView(generics.ListAPIView):
         if min_quantity:
             queryset = queryset.filter(quantity__gte=min_quantity)
 
-        return queryset
+        params = self.request.query_params
+        query = params.get("q", "").strip()
+        if query:
+            queryset = search.search(queryset, query).order_by("-search_rank", "-created_at")
+
+        if "lat" in params or "lng" in params:
+            latitude = _float_param(params, "lat", -90.0, 90.0)
+            longitude = _float_param(params, "lng", -180.0, 180.0)
+            radius_km = DEFAULT_RADIUS_KM
+            if "radius_km" in params:
+                radius_km = _float_param(params, "radius_km", 0.0, MAX_RADIUS_KM)
+            queryset = queryset.near(latitude, longitude, radius_km)
+            if params.get("ordering") == "distance":
+                queryset = queryset.order_by("distance_km")
+
+        return narrow(queryset, self.get_fieldset(), keep=self.pagination_class.ordering)
+
+    def get_fieldset(self):
+        if not hasattr(self, "_fieldset"):
+            self._fieldset = FieldSet.from_request(self.request, self.get_serializer_class())
+        return self._fieldset
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), CONTEXT_KEY: self.get_fieldset()}
+
+    def list(self, request, *args, **kwargs):
+        key = cache.key_for(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data, headers={"X-Cache": "HIT"})
+        response = super().list(request, *args, **kwargs)
+        cache.set(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def listing_cache_stats(request):
+    return Response({**cache.stats.snapshot(), "version": cache.current_version()})
 
 
 @api_view(["POST"])
@@ -38,17 +118,241 @@ def create_listing(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def import_listings(request):
+    """Create many listings from a JSON array or an uploaded CSV ``file``; invalid rows are reported, not fatal.
+
+    Up to IMPORT_MAX_ROWS rows (and IMPORT_MAX_BYTES of CSV) per request; the
+    ``import_listings`` management command takes larger files.
+    """
+    upload = request.FILES.get("file")
+    if upload is not None:
+        if upload.size > settings.IMPORT_MAX_BYTES:
+            return Response(
+                {"error": f"CSV files are limited to {settings.IMPORT_MAX_BYTES} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        rows = importers.csv_rows(upload)
+    elif isinstance(request.data, list):
+        rows = request.data
+    else:
+        return Response(
+            {"error": "Send a JSON array of listings, or a CSV file as 'file'"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        with transaction.atomic():
+            result = importers.import_listings(request.user, importers.limited(rows, settings.IMPORT_MAX_ROWS))
+    except importers.TooManyRows as error:
+        return Response({"error": str(error)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    return Response(
+        {"created": result.created, "id_ranges": result.id_ranges(), "errors": result.errors},
+        status=status.HTTP_201_CREATED if result.created else status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def _my_listings_validators(request):
+    return queryset_validators(
+        request,
+        WasteListing.objects.filter(user=request.user),
+        modified=("updated_at", "images__created_at", "user__updated_at"),
+        image_count=Count("images", distinct=True),
+    )
+
+
+def _my_transactions_validators(request):
+    return queryset_validators(
+        request,
+        Transaction.objects.filter(models.Q(buyer=request.user) | models.Q(seller=request.user)),
+        # The serialized rows embed the listing with its owner, the buyer and the seller.
+        modified=(
+            "updated_at",
+            "listing__updated_at",
+            "listing__images__created_at",
+            "listing__user__updated_at",
+            "buyer__updated_at",
+            "seller__updated_at",
+        ),
+        image_count=Count("listing__images", distinct=True),
+    )
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional(_my_listings_validators)
 def my_listings(request):
-    listings = WasteListing.objects.filter(user=request.user)
-    serializer = WasteListingSerializer(listings, many=True)
-    return Response(serializer.data)
+    fieldset = FieldSet.from_request(request, WasteListingSerializer)
+    listings = WasteListing.objects.filter(user=request.user).select_related("user").prefetch_related("images")
+    listings = narrow(listings, fieldset)
+    return paginated_response(request, listings, WasteListingSerializer, context={CONTEXT_KEY: fieldset})
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional(_my_transactions_validators)
 def my_transactions(request):
-    transactions = Transaction.objects.filter(models.Q(buyer=request.user) | models.Q(seller=request.user))
-    serializer = TransactionSerializer(transactions, many=True)
-    return Response(serializer.data)
+    fieldset = FieldSet.from_request(request, TransactionSerializer)
+    transactions = Transaction.objects.select_related("listing__user", "buyer", "seller").prefetch_related(
+        "listing__images"
+    )
+    # Narrowed before the union: the combined queryset takes no further changes.
+    transactions = narrow(transactions, fieldset, keep=("created_at", "id")).involving(request.user)
+    return paginated_response(request, transactions, TransactionSerializer, context={CONTEXT_KEY: fieldset})
+
+
+def _export(request, rows, serializer_class, statuses, name):
+    filters = ExportFilterSerializer(data=request.query_params, statuses=statuses)
+    if not filters.is_valid():
+        return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+    params = dict(filters.validated_data)
+    output = params.pop("output")
+    return exports.response(rows(request.user, **params), serializer_class, output, name)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_transactions(request):
+    """Stream my transactions (every transaction, for staff) as ``?output=csv`` or ``ndjson``."""
+    return _export(
+        request, exports.transactions, TransactionExportSerializer, Transaction.STATUS_CHOICES, "transactions"
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_listings(request):
+    """Stream my listings (every listing, for staff) as ``?output=csv`` or ``ndjson``."""
+    return _export(request, exports.listings, ListingExportSerializer, WasteListing.STATUS_CHOICES, "listings")
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def purchase_listing(request, listing_id):
+    """Reserve ``quantity`` of a listing: a pending transaction holding the stock until ``reserved_until``."""
+    serializer = PurchaseSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    purchase = purchases.reserve(listing_id, request.user, **serializer.validated_data)
+    if purchase is None and purchases.release_expired(listing_id=listing_id):
+        # Expired holds were still counted against the stock.
+        purchase = purchases.reserve(listing_id, request.user, **serializer.validated_data)
+    if purchase is not None:
+        return Response(TransactionSerializer(purchase).data, status=status.HTTP_201_CREATED)
+
+    listing = WasteListing.objects.filter(pk=listing_id).values("user_id", "status", "quantity").first()
+    if listing is None:
+        return Response({"error": "Listing not found"}, status=status.HTTP_404_NOT_FOUND)
+    if listing["user_id"] == request.user.pk:
+        return Response({"error": "You cannot buy your own listing"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(
+        {"error": "Not enough quantity available", "status": listing["status"], "available": listing["quantity"]},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def confirm_transaction(request, transaction_id):
+    """Confirm my pending purchase before its reservation expires."""
+    serializer = ConfirmPurchaseSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    purchase = purchases.confirm(transaction_id, request.user, **serializer.validated_data)
+    if purchase is not None:
+        return Response(TransactionSerializer(purchase).data)
+    current = Transaction.objects.filter(pk=transaction_id, buyer=request.user).values_list("status", flat=True).first()
+    if current is None:
+        return Response({"error": "Transaction not found"}, status=status.HTTP_404_NOT_FOUND)
+    message = "The reservation has expired" if current in ("pending", "cancelled") else f"Transaction is {current}"
+    return Response({"error": message, "status": current}, status=status.HTTP_409_CONFLICT)
+
+
+CONTENT_RANGE = re.compile(r"^bytes (?P<first>\d+)-(?P<last>\d+)/(?P<size>\d+|\*)$")
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def start_upload(request, listing_id):
+    """Open a chunked upload of an image for my listing; its bytes then go to ``uploads/<id>/``."""
+    listing = WasteListing.objects.filter(pk=listing_id, user=request.user).first()
+    if listing is None:
+        return Response({"error": "Listing not found"}, status=status.HTTP_404_NOT_FOUND)
+    serializer = UploadSessionSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    session = uploads.start(request.user, listing, **serializer.validated_data)
+    return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(["GET", "PUT", "DELETE"])
+@permission_classes([IsAuthenticated])
+def upload_session(request, upload_id):
+    """``GET`` the offset to resume from, ``PUT`` the next chunk, ``DELETE`` to abandon the upload.
+
+    A chunk is the raw request body with ``Content-Range: bytes <first>-<last>/<size>``,
+    where ``first`` must be the current offset.
+    """
+    session = UploadSession.objects.filter(pk=upload_id, user=request.user).first()
+    if session is None:
+        return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+    if request.method == "GET":
+        return Response(UploadSessionSerializer(session).data)
+    if request.method == "DELETE":
+        uploads.discard(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    match = CONTENT_RANGE.match(request.headers.get("Content-Range", ""))
+    if match is None or int(match["last"]) < int(match["first"]):
+        return Response(
+            {"error": "Send Content-Range: bytes <first>-<last>/<size>", "offset": session.received},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    first, length = int(match["first"]), int(match["last"]) - int(match["first"]) + 1
+    if match["size"] not in ("*", str(session.size)) or request.stream is None:
+        return Response(
+            {"error": "The range does not match the upload or the body", "offset": session.received},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        # Streamed from the request into the part file, never read into memory whole.
+        uploads.append(session, first, length, request.stream)
+    except uploads.OffsetMismatch as error:
+        return Response({"error": str(error), "offset": error.offset}, status=status.HTTP_409_CONFLICT)
+    except uploads.TooLarge as error:
+        return Response({"error": str(error)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except uploads.UnsupportedType as error:
+        return Response({"error": str(error)}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    return Response(UploadSessionSerializer(session).data)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def complete_upload(request, upload_id):
+    """Attach a fully sent upload to its listing as a new image."""
+    session = UploadSession.objects.filter(pk=upload_id, user=request.user).first()
+    if session is None:
+        return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        image = uploads.finish(session)
+    except uploads.Incomplete as error:
+        return Response({"error": str(error), "offset": session.received}, status=status.HTTP_409_CONFLICT)
+    except uploads.UnsupportedType as error:
+        return Response({"error": str(error)}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    return Response(WasteImageSerializer(image, context={"request": request}).data, status=status.HTTP_201_CREATED)
+
+
+@require_safe
+def serve_blob(request, name):
+    """Serve a content-addressed image or variant; its name changes with its content, so caches keep it forever."""
+    if not storage.IMMUTABLE_NAME.match(name):
+        raise Http404("Not a content-addressed file")
+    # The digest, plus the variant for a resized copy.
+    etag = quote_etag(posixpath.splitext(posixpath.basename(name))[0])
+    headers = {"ETag": etag, "Cache-Control": storage.CACHE_FOREVER}
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        return HttpResponseNotModified(headers=headers)
+    try:
+        blob = storage.image_storage.open(name)
+    except FileNotFoundError as error:
+        raise Http404("No such file") from error
+    return FileResponse(blob, headers=headers)
@@ -1,74 +1,85 @@
 import { useEffect, useRef } from 'react';
-import { io } from 'socket.io-client';
-import { fetchMyListings, fetchUserStats } from '../store/slices/wasteSlice';
-import { fetchConversations } from '../store/slices/messageSlice';
+import { addMessage, fetchConversations } from '../store/slices/messageSlice';
+import { addNotification } from '../store/slices/notificationSlice';
 
-// Simple hook that attempts to connect to a Socket.IO server and dispatches
-// updates on listing/stat events. If no server exists it will fail silently
-// and the app's polling fallback continues to operate.
+const RECONNECT_DELAYS_MS = [1000, 2000, 5000, 10000, 30000];
+
+// Connects to the backend's per-user WebSocket (/ws/updates/) and dispatches
+// new messages and notifications as they arrive. If no socket URL is
+// configured or the connection keeps failing, the app's polling fallback
+// continues to operate.
 export default function useSocket(store) {
   const socketRef = useRef(null);
 
   useEffect(() => {
     if (!store) return undefined;
 
-    // Try connect to the backend socket namespace.
     // Priority: explicit SOCKET URL -> API base URL -> window-injected URL
-    const SOCKET_URL =
+    const baseUrl =
       process.env.REACT_APP_SOCKET_URL ||
       process.env.REACT_APP_API_URL ||
       window.__API_SOCKET_URL__ ||
       null;
 
-    // If no explicit socket/API URL is configured, skip connecting.
-    // Connecting to '/' (the frontend dev server origin) causes repeated
-    // /socket.io polling requests against the dev server which returns 500/404
-    // and spams the console while no real socket server exists.
-    if (!SOCKET_URL || SOCKET_URL === '/') {
+    // Connecting to '/' (the frontend dev server origin) would hit the dev
+    // server, which has no WebSocket endpoint.
+    if (!baseUrl || baseUrl === '/') {
       console.info('useSocket: no SOCKET URL configured; skipping socket connection');
       return undefined;
     }
 
-    const opts = { autoConnect: true, reconnectionAttempts: 5 };
-    try {
-      console.info('Attempting socket.io connection to', SOCKET_URL);
-      socketRef.current = io(SOCKET_URL, opts);
-    } catch (e) {
-      // If socket.io-client throws, bail out and rely on polling
-      console.warn('Socket connection failed (falling back to polling):', e.message || e);
-      return undefined;
-    }
+    let attempt = 0;
+    let reconnectTimer = null;
+    let closedByUs = false;
 
-    const socket = socketRef.current;
+    const connect = () => {
+      const token = localStorage.getItem('token');
+      if (!token) return;
 
-    socket.on('connect', () => {
-      console.info('Socket connected:', socket.id);
-    });
+      const url = `${baseUrl.replace(/^http/, 'ws').replace(/\/$/, '')}/ws/updates/?token=${encodeURIComponent(token)}`;
+      const socket = new WebSocket(url);
+      socketRef.current = socket;
 
-    socket.on('listing_created', (data) => {
-      // Server can send a payload; we simply refresh lists and stats
-      store.dispatch(fetchMyListings());
-      store.dispatch(fetchUserStats());
-    });
+      socket.onopen = () => {
+        attempt = 0;
+      };
 
-    socket.on('stats_updated', (data) => {
-      store.dispatch(fetchUserStats());
-    });
+      socket.onmessage = (event) => {
+        let payload;
+        try {
+          payload = JSON.parse(event.data);
+        } catch (e) {
+          return;
+        }
 
-    socket.on('conversation_update', (data) => {
-      store.dispatch(fetchConversations());
-    });
+        if (payload.type === 'message.created') {
+          const { currentConversation, messages } = store.getState().messages;
+          const isOpen = currentConversation && currentConversation.id === payload.data.conversation;
+          // Our own messages are already appended when the send request returns.
+          if (isOpen && !messages.some((message) => message.id === payload.data.id)) {
+            store.dispatch(addMessage(payload.data));
+          }
+          store.dispatch(fetchConversations());
+        } else if (payload.type === 'notification.created') {
+          store.dispatch(addNotification(payload.data));
+        }
+      };
+
+      socket.onclose = (event) => {
+        // 4401: token missing or expired; wait for the next login instead.
+        if (closedByUs || event.code === 4401 || attempt >= RECONNECT_DELAYS_MS.length) return;
+        reconnectTimer = setTimeout(connect, RECONNECT_DELAYS_MS[attempt]);
+        attempt += 1;
+      };
+    };
 
-    socket.on('connect_error', (err) => {
-      console.warn('Socket connect_error:', err.message || err);
-    });
+    connect();
 
     return () => {
-      try {
-        socket.off();
-        socket.close();
-      } catch (e) {
-        // ignore
+      closedByUs = true;
+      clearTimeout(reconnectTimer);
+      if (socketRef.current) {
+        socketRef.current.close();
       }
     };
   }, [store]);
@@ -106,8 +106,8 @@ export const messageAPI = {
   getConversations: () =>
     api.get('/api/messaging/conversations/'),
   
-  getMessages: (conversationId) =>
-    api.get(`/api/messaging/conversations/${conversationId}/messages/`),
+  getMessages: (conversationId, params = {}) =>
+    api.get(`/api/messaging/conversations/${conversationId}/messages/`, { params }),
   
   sendMessage: (messageData) =>
     api.post('/api/messaging/messages/send/', messageData),
@@ -117,6 +117,15 @@ export const messageAPI = {
   
   markNotificationRead: (notificationId) =>
     api.post(`/api/messaging/notifications/${notificationId}/read/`),
+
+  markNotificationsRead: (ids) =>
+    api.post('/api/messaging/notifications/read/', { ids }),
+
+  markAllNotificationsRead: () =>
+    api.post('/api/messaging/notifications/read-all/'),
+
+  markConversationRead: (conversationId, messageId) =>
+    api.post(`/api/messaging/conversations/${conversationId}/read/`, messageId ? { message_id: messageId } : {}),
 };
 
 // File upload API
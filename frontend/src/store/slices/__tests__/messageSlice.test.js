@@ -0,0 +1,49 @@
+// Mock the API module so importing the slice doesn't pull in axios (ESM) during Jest run
+jest.mock('../../../services/api', () => ({
+  messageAPI: {
+    getConversations: jest.fn(),
+    getMessages: jest.fn(),
+    sendMessage: jest.fn(),
+    markConversationRead: jest.fn(),
+  },
+}));
+
+import reducer from '../messageSlice';
+
+describe('messageSlice reducers', () => {
+  const initialState = {
+    conversations: [],
+    currentConversation: null,
+    messages: [],
+    olderCursor: null,
+    loading: false,
+    error: null,
+  };
+
+  it('shows the newest page oldest first and keeps the cursor to older messages', () => {
+    const action = {
+      type: 'messages/fetchMessages/fulfilled',
+      payload: { next: 'http://api.test/messages/?cursor=abc', previous: null, results: [{ id: 3 }, { id: 2 }] },
+    };
+    const next = reducer(initialState, action);
+    expect(next.messages.map(m => m.id)).toEqual([2, 3]);
+    expect(next.olderCursor).toBe('abc');
+  });
+
+  it('prepends older messages', () => {
+    const state = { ...initialState, messages: [{ id: 2 }, { id: 3 }], olderCursor: 'abc' };
+    const action = {
+      type: 'messages/fetchOlderMessages/fulfilled',
+      payload: { next: null, previous: 'http://api.test/messages/?cursor=def', results: [{ id: 1 }] },
+    };
+    const next = reducer(state, action);
+    expect(next.messages.map(m => m.id)).toEqual([1, 2, 3]);
+    expect(next.olderCursor).toBeNull();
+  });
+
+  it('clears the unread count of a conversation read to the end', () => {
+    const state = { ...initialState, conversations: [{ id: 4, unread_count: 3 }] };
+    const action = { type: 'messages/markConversationRead/fulfilled', payload: { conversationId: 4 } };
+    expect(reducer(state, action).conversations[0].unread_count).toBe(0);
+  });
+});
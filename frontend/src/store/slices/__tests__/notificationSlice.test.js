@@ -0,0 +1,41 @@
+// Mock the API module so importing the slice doesn't pull in axios (ESM) during Jest run
+jest.mock('../../../services/api', () => ({
+  messageAPI: {
+    getNotifications: jest.fn(),
+    markNotificationRead: jest.fn(),
+    markNotificationsRead: jest.fn(),
+    markAllNotificationsRead: jest.fn(),
+  },
+}));
+
+import reducer from '../notificationSlice';
+
+describe('notificationSlice reducers', () => {
+  const initialState = {
+    notifications: [{ id: 1, is_read: false }, { id: 2, is_read: false }],
+    unreadCount: 5,
+    loading: false,
+    error: null,
+  };
+
+  it('takes the unread count from the server', () => {
+    const action = {
+      type: 'notifications/fetchNotifications/fulfilled',
+      payload: { next: null, previous: null, results: [{ id: 1, is_read: false }], unread_count: 7 },
+    };
+    expect(reducer(initialState, action).unreadCount).toBe(7);
+  });
+
+  it('marks several notifications read', () => {
+    const action = { type: 'notifications/markManyRead/fulfilled', payload: { ids: [1, 9], updated: 2 } };
+    const next = reducer(initialState, action);
+    expect(next.notifications.map(n => n.is_read)).toEqual([true, false]);
+    expect(next.unreadCount).toBe(3);
+  });
+
+  it('marks every notification read', () => {
+    const next = reducer(initialState, { type: 'notifications/markAllRead/fulfilled', payload: null });
+    expect(next.notifications.every(n => n.is_read)).toBe(true);
+    expect(next.unreadCount).toBe(0);
+  });
+});
@@ -5,6 +5,8 @@ const initialState = {
   conversations: [],
   currentConversation: null,
   messages: [],
+  // Cursor for the page of older messages, or null when the oldest is loaded.
+  olderCursor: null,
   loading: false,
   error: null,
 };
@@ -24,9 +26,11 @@ export const fetchConversations = createAsyncThunk(
 
 export const fetchMessages = createAsyncThunk(
   'messages/fetchMessages',
-  async (conversationId, { rejectWithValue }) => {
+  async (conversationId, { dispatch, rejectWithValue }) => {
     try {
       const response = await messageAPI.getMessages(conversationId);
+      // Opening a conversation reads it up to its latest message.
+      dispatch(markConversationRead({ conversationId }));
       return response.data;
     } catch (error) {
       return rejectWithValue(error.response?.data || 'Failed to fetch messages');
@@ -34,6 +38,28 @@ export const fetchMessages = createAsyncThunk(
   }
 );
 
+// Messages arrive newest first, one page at a time; `next` points further back.
+const cursorOf = (link) => (link ? new URL(link).searchParams.get('cursor') : null);
+
+const oldestFirst = (payload) =>
+  (Array.isArray(payload) ? payload : Array.isArray(payload?.results) ? payload.results : []).slice().reverse();
+
+export const fetchOlderMessages = createAsyncThunk(
+  'messages/fetchOlderMessages',
+  async (conversationId, { getState, rejectWithValue }) => {
+    try {
+      const cursor = getState().messages.olderCursor;
+      const response = await messageAPI.getMessages(conversationId, { cursor });
+      return response.data;
+    } catch (error) {
+      return rejectWithValue(error.response?.data || 'Failed to fetch messages');
+    }
+  },
+  {
+    condition: (_, { getState }) => Boolean(getState().messages.olderCursor),
+  }
+);
+
 export const sendMessage = createAsyncThunk(
   'messages/sendMessage',
   async (messageData, { rejectWithValue }) => {
@@ -46,6 +72,19 @@ export const sendMessage = createAsyncThunk(
   }
 );
 
+// Moves the read pointer to `messageId`, or to the latest message when omitted.
+export const markConversationRead = createAsyncThunk(
+  'messages/markConversationRead',
+  async ({ conversationId, messageId }, { rejectWithValue }) => {
+    try {
+      await messageAPI.markConversationRead(conversationId, messageId);
+      return { conversationId, messageId };
+    } catch (error) {
+      return rejectWithValue(error.response?.data || 'Failed to mark conversation as read');
+    }
+  }
+);
+
 const messageSlice = createSlice({
   name: 'messages',
   initialState,
@@ -64,7 +103,9 @@ const messageSlice = createSlice({
     builder
       // Fetch conversations
       .addCase(fetchConversations.fulfilled, (state, action) => {
-        state.conversations = action.payload;
+        state.conversations = Array.isArray(action.payload) ? action.payload :
+                              Array.isArray(action.payload?.results) ? action.payload.results :
+                              [];
       })
       // Fetch messages
       .addCase(fetchMessages.pending, (state) => {
@@ -72,15 +113,38 @@ const messageSlice = createSlice({
       })
       .addCase(fetchMessages.fulfilled, (state, action) => {
         state.loading = false;
-        state.messages = action.payload;
+        state.messages = oldestFirst(action.payload);
+        state.olderCursor = cursorOf(action.payload?.next);
       })
       .addCase(fetchMessages.rejected, (state, action) => {
         state.loading = false;
         state.error = action.payload;
       })
+      // Fetch older messages
+      .addCase(fetchOlderMessages.pending, (state) => {
+        state.loading = true;
+      })
+      .addCase(fetchOlderMessages.fulfilled, (state, action) => {
+        state.loading = false;
+        state.messages = [...oldestFirst(action.payload), ...state.messages];
+        state.olderCursor = cursorOf(action.payload?.next);
+      })
+      .addCase(fetchOlderMessages.rejected, (state, action) => {
+        state.loading = false;
+        state.error = action.payload;
+      })
       // Send message
       .addCase(sendMessage.fulfilled, (state, action) => {
         state.messages.push(action.payload);
+      })
+      // Mark conversation read
+      .addCase(markConversationRead.fulfilled, (state, action) => {
+        const { conversationId, messageId } = action.payload;
+        const conversation = state.conversations.find(c => c.id === conversationId);
+        // A partial read leaves a count only the server can work out; refetch for it.
+        if (conversation && !messageId) {
+          conversation.unread_count = 0;
+        }
       });
   },
 });
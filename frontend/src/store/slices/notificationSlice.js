@@ -33,6 +33,30 @@ export const markNotificationRead = createAsyncThunk(
   }
 );
 
+export const markNotificationsRead = createAsyncThunk(
+  'notifications/markManyRead',
+  async (notificationIds, { rejectWithValue }) => {
+    try {
+      const response = await messageAPI.markNotificationsRead(notificationIds);
+      return { ids: notificationIds, updated: response.data.updated };
+    } catch (error) {
+      return rejectWithValue(error.response?.data || 'Failed to mark notifications as read');
+    }
+  }
+);
+
+export const markAllNotificationsRead = createAsyncThunk(
+  'notifications/markAllRead',
+  async (_, { rejectWithValue }) => {
+    try {
+      await messageAPI.markAllNotificationsRead();
+      return null;
+    } catch (error) {
+      return rejectWithValue(error.response?.data || 'Failed to mark notifications as read');
+    }
+  }
+);
+
 const notificationSlice = createSlice({
   name: 'notifications',
   initialState,
@@ -55,8 +79,11 @@ const notificationSlice = createSlice({
       })
       .addCase(fetchNotifications.fulfilled, (state, action) => {
         state.loading = false;
-        state.notifications = action.payload;
-        state.unreadCount = action.payload.filter(n => !n.is_read).length;
+        state.notifications = Array.isArray(action.payload) ? action.payload :
+                              Array.isArray(action.payload?.results) ? action.payload.results :
+                              [];
+        // The server counts unread notifications across all pages.
+        state.unreadCount = action.payload?.unread_count ?? state.notifications.filter(n => !n.is_read).length;
       })
       .addCase(fetchNotifications.rejected, (state, action) => {
         state.loading = false;
@@ -69,6 +96,24 @@ const notificationSlice = createSlice({
           notification.is_read = true;
           state.unreadCount -= 1;
         }
+      })
+      // Mark several notifications as read
+      .addCase(markNotificationsRead.fulfilled, (state, action) => {
+        const ids = new Set(action.payload.ids);
+        state.notifications.forEach((notification) => {
+          if (ids.has(notification.id)) {
+            notification.is_read = true;
+          }
+        });
+        // The server reports how many were unread, including ones not loaded here.
+        state.unreadCount = Math.max(0, state.unreadCount - action.payload.updated);
+      })
+      // Mark all notifications as read
+      .addCase(markAllNotificationsRead.fulfilled, (state) => {
+        state.notifications.forEach((notification) => {
+          notification.is_read = true;
+        });
+        state.unreadCount = 0;
       });
   },
 });